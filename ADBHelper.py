@@ -1,4 +1,33 @@
-import os, time
+import os, time, subprocess, threading, queue, atexit
+import numpy, cv2
+
+# 是否通过持久化的adb shell会话发送输入命令，关闭后每条命令都单独启动一个adb进程
+useShellSession = True
+
+# 每台设备最多同时打开的shell会话数（同时进行的长按/滑动各占用一个会话）
+maxShellSessions = 4
+
+# 等待空闲会话和命令完成的默认超时时间，单位秒
+shellTimeout = 5
+
+# 等待画面稳定的最长时间，单位秒
+stableTimeout = 3
+
+# 画面稳定判定：相邻两帧降采样后的平均像素差低于该值视为画面未变化
+stableThreshold = 2.0
+
+# 画面稳定判定的降采样步长（每隔多少像素取一个点）
+stableStep = 8
+
+# 画面稳定判定只读取屏幕中间的一条横带（占屏幕高度的比例范围），在设备端裁剪后只传输这部分字节
+# 2412x1080的完整帧约10MB，默认横带约为完整帧的30%
+stableBand = (0.35, 0.65)
+
+# 等待画面稳定的最短时间，单位秒：操作刚发出时界面可能还没开始变化，过早比较会误判为已稳定
+stableMinWait = 0.15
+
+# 每台设备截取一次横带的平均耗时，单位秒 {deviceID: 秒}，等待画面稳定时据此判断剩余时间是否还够再截一帧
+_bandCaptureTime = {}
 
 # 获取设备列表，每一个为deviceID
 def getDevicesList():
@@ -28,21 +57,289 @@ def screenCapture(deviceID, capPath):
     else:
         return False
 
+# 设备屏幕截图（内存版），通过exec-out直接读取原始帧缓冲，返回BGR格式的numpy数组，失败返回None
+# 不经过设备存储、PNG编解码和本地临时文件
+def screenCaptureArray(deviceID, timeout=5):
+    return decodeRawScreenCap(screenCaptureRaw(deviceID, timeout))
+
+# 设备屏幕截图（原始字节版），只读取screencap的原始输出不做解码，失败返回None
+# 用于把解码工作交给其他线程，调用方拿到字节后即可继续操作设备
+def screenCaptureRaw(deviceID, timeout=5):
+    try:
+        result = subprocess.run(["adb", "-s", deviceID, "exec-out", "screencap"],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        print("【截图】exec-out截图失败: {0}".format(e))
+        return None
+    return result.stdout or None
+
+# 解析screencap原始输出：头部为宽、高、像素格式（Android 12起追加色彩空间字段），之后为RGBA_8888像素数据
+def decodeRawScreenCap(data):
+    rgba = rawFrameView(data)
+    if rgba is None:
+        return None
+    return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
+
+# 返回screencap原始输出中像素数据的RGBA视图（不复制数据），格式无法解析时返回None
+def rawFrameView(data):
+    if data is None or len(data) < 12:
+        return None
+    w, h, fmt = numpy.frombuffer(data, dtype="<u4", count=3)
+    payload = int(w) * int(h) * 4
+    header = len(data) - payload
+    if fmt != 1 or header not in (12, 16):
+        print("【截图】无法解析的帧缓冲格式: {0}x{1} format={2} size={3}".format(w, h, fmt, len(data)))
+        return None
+    return numpy.frombuffer(data, dtype=numpy.uint8, count=payload, offset=header).reshape(int(h), int(w), 4)
+
+# 画面的低分辨率签名：直接在原始帧缓冲上按步长取绿色通道，不做完整解码，用于快速比较画面是否变化
+def screenSignature(data, step=None):
+    rgba = rawFrameView(data)
+    if rgba is None:
+        return None
+    step = step or stableStep
+    return rgba[::step, ::step, 1].astype(numpy.int16)
+
+# 设备帧缓冲的几何信息缓存 {deviceID: (宽, 高, 头部字节数)}
+_frameGeometry = {}
+
+# 读取设备帧缓冲的宽、高和头部长度（每台设备只读取一次），失败返回None
+def screenGeometry(deviceID):
+    if deviceID not in _frameGeometry:
+        data = screenCaptureRaw(deviceID)
+        if rawFrameView(data) is None:
+            return None
+        w, h = numpy.frombuffer(data, dtype="<u4", count=2)
+        _frameGeometry[deviceID] = (int(w), int(h), len(data) - int(w) * int(h) * 4)
+    return _frameGeometry[deviceID]
+
+# 截取屏幕上从第top行开始的rows行（原始RGBA字节，不含头部），在设备端用head/tail裁剪，只传输这部分数据
+# 失败返回None
+def screenCaptureBand(deviceID, top, rows, timeout=5):
+    geometry = screenGeometry(deviceID)
+    if geometry is None:
+        return None
+    w, h, header = geometry
+    top = max(0, min(top, h - 1))
+    size = min(rows, h - top) * w * 4
+    end = header + top * w * 4 + size
+    try:
+        result = subprocess.run(["adb", "-s", deviceID, "exec-out",
+                                 "screencap | head -c {0} | tail -c {1}".format(end, size)],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        print("【截图】横带截图失败: {0}".format(e))
+        return None
+    if len(result.stdout) != size:
+        return None
+    return numpy.frombuffer(result.stdout, dtype=numpy.uint8).reshape(-1, w, 4)
+
+# 等待画面稳定：连续截取屏幕中间的横带（stableBand）并比较相邻两帧的低分辨率签名，
+# 至少等待minWait秒，之后画面不再变化且isLoading回调判断不在加载中时立即返回
+# timeout为等待的上限（通常就是被代替的固定延时）：剩余时间不够再截一帧时直接睡到上限，
+# 上限短于一次稳定判定（minWait和两次截图）时不截图，只等待timeout秒，因此最多比固定延时多出一次截图的耗时
+# isLoading接收BGR图像，返回True表示仍在加载，只有提供isLoading时才会截取完整帧
+# 返回(是否稳定, 最后一帧完整截图的原始字节)，没有截取完整帧时为None；超时返回(False, ...)
+def waitForStableScreen(deviceID, timeout=None, isLoading=None, minWait=None):
+    timeout = stableTimeout if timeout is None else timeout
+    minWait = stableMinWait if minWait is None else minWait
+    start = time.time()
+    if timeout < max(minWait, 2 * _bandCaptureTime.get(deviceID, 0)):
+        time.sleep(timeout)
+        return False, None
+    geometry = screenGeometry(deviceID)
+    height = geometry[1] if geometry else 0
+    top, rows = int(height * stableBand[0]), max(1, int(height * (stableBand[1] - stableBand[0])))
+    last, lastSignature = None, None
+    while True:
+        remaining = timeout - (time.time() - start)
+        if remaining < _bandCaptureTime.get(deviceID, 0):
+            time.sleep(max(0, remaining))
+            print("【等待稳定】等待 {0} 秒后画面仍未稳定".format(timeout))
+            return False, last
+        captureStart = time.time()
+        band = screenCaptureBand(deviceID, top, rows) if geometry else None
+        if band is not None:
+            elapsed = time.time() - captureStart
+            previous = _bandCaptureTime.get(deviceID)
+            _bandCaptureTime[deviceID] = elapsed if previous is None else previous * 0.8 + elapsed * 0.2
+        signature = None if band is None else band[::stableStep, ::stableStep, 1].astype(numpy.int16)
+        if signature is None:
+            time.sleep(0.05)
+        else:
+            if lastSignature is not None and lastSignature.shape == signature.shape \
+                    and numpy.abs(signature - lastSignature).mean() < stableThreshold \
+                    and time.time() - start >= minWait:
+                if isLoading is not None:
+                    last = screenCaptureRaw(deviceID)
+                if isLoading is None or (last is not None and not isLoading(decodeRawScreenCap(last))):
+                    print("【等待稳定】画面已稳定，用时 {0:.2f} 秒".format(time.time() - start))
+                    return True, last
+            lastSignature = signature
+
+# 持久化的adb shell会话，保持一个打开的shell管道，命令写入stdin后以回显标记确认执行完成
+# 单个会话同一时间只能被一个调用者使用，多线程共享请通过ShellSessionPool
+class ShellSession:
+    def __init__(self, deviceID):
+        self.deviceID = deviceID
+        self.proc = None
+        self.lines = None
+        self.seq = 0
+
+    def connect(self):
+        self.close()
+        self.proc = subprocess.Popen(["adb", "-s", self.deviceID, "shell"], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.proc, self.lines), daemon=True).start()
+
+    # 后台读取shell输出，进程退出时放入None作为断开标记
+    @staticmethod
+    def _read(proc, lines):
+        for line in iter(proc.stdout.readline, b""):
+            lines.put(line)
+        lines.put(None)
+
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    # 执行一条命令并等待完成；命令未能送达时抛出OSError，已送达但未确认时抛出TimeoutError
+    def execute(self, cmd, timeout):
+        if not self.alive():
+            self.connect()
+        self.seq += 1
+        # 标记拆成两段引号拼接，避免shell回显命令本身时被误判为完成
+        marker = "__RSH_DONE_{0}__".format(self.seq)
+        line = '{0}; echo "__RSH_"DONE_{1}__\n'.format(cmd, self.seq)
+        self.proc.stdin.write(line.encode())
+        self.proc.stdin.flush()
+
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError("命令超时: {0}".format(cmd))
+            try:
+                out = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError("命令超时: {0}".format(cmd))
+            if out is None:
+                raise TimeoutError("shell会话已断开: {0}".format(cmd))
+            if marker in out.decode("utf-8", errors="ignore"):
+                return True
+
+    def close(self):
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except Exception:
+                pass
+            try:
+                self.proc.kill()
+            except Exception:
+                pass
+        self.proc = None
+
+# 单台设备的shell会话池：空闲会话排队复用，全部繁忙时新建会话（不超过maxShellSessions），否则排队等待
+class ShellSessionPool:
+    def __init__(self, deviceID, maxSessions=None):
+        self.deviceID = deviceID
+        self.maxSessions = maxSessions or maxShellSessions
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, timeout):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.maxSessions:
+                self.created += 1
+                return ShellSession(self.deviceID)
+        return self.idle.get(timeout=timeout)
+
+    def release(self, session):
+        self.idle.put(session)
+
+    # 执行命令：返回True表示成功，False表示已送达但超时未确认（不可重发，避免重复点击），None表示无法送达
+    def run(self, cmd, timeout=None):
+        timeout = timeout or shellTimeout
+        try:
+            session = self.acquire(timeout)
+        except queue.Empty:
+            print("【ADB会话】等待空闲会话超时: {0}".format(cmd))
+            return None
+        try:
+            for attempt in range(2):
+                try:
+                    return session.execute(cmd, timeout)
+                except TimeoutError as e:
+                    print("【ADB会话】{0}，重新建立会话".format(e))
+                    session.close()
+                    return False
+                except OSError as e:
+                    # 管道已断开，命令尚未执行，重连后重发一次
+                    print("【ADB会话】会话断开({0})，正在重连...".format(e))
+                    session.close()
+            return None
+        finally:
+            self.release(session)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_shellPools = {}
+_shellPoolsLock = threading.Lock()
+
+# 获取设备对应的shell会话池，不存在时创建
+def getShellPool(deviceID):
+    with _shellPoolsLock:
+        pool = _shellPools.get(deviceID)
+        if pool is None:
+            pool = ShellSessionPool(deviceID)
+            _shellPools[deviceID] = pool
+        return pool
+
+# 关闭所有设备的shell会话
+def closeShellSessions():
+    with _shellPoolsLock:
+        pools = list(_shellPools.values())
+        _shellPools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(closeShellSessions)
+
+# 在设备上执行shell命令，优先使用持久化会话，会话不可用时退回到单独启动adb进程
+def shell(deviceID, cmd, timeout=None):
+    if useShellSession:
+        result = getShellPool(deviceID).run(cmd, timeout)
+        if result is not None:
+            return result
+    return os.system("adb -s " + deviceID + " shell " + cmd) == 0
+
 # 模拟点击屏幕，参数pos为目标坐标(x, y)
 def touch(deviceID, pos):
     x, y = pos
-    a = "adb -s " + deviceID + " shell input touchscreen tap {0} {1}".format(x, y)
-    os.system(a)
+    shell(deviceID, "input touchscreen tap {0} {1}".format(x, y))
 
 # 模拟滑动屏幕，posStart为起始坐标(x, y)，posStop为终点坐标(x, y)，time为滑动时间
 def slide(deviceID, posStart, posStop, time):
     x1, y1 = posStart
     x2, y2 = posStop
-    a = "adb -s " + deviceID + " shell input swipe {0} {1} {2} {3} {4}".format(x1, y1, x2, y2, time)
-    os.system(a)
+    shell(deviceID, "input swipe {0} {1} {2} {3} {4}".format(x1, y1, x2, y2, time), shellTimeout + time / 1000)
 
 # 模拟长按屏幕，参数pos为目标坐标(x, y)，time为长按时间
 def longTouch(deviceID, pos, time):
     x, y = pos
-    a = "adb -s " + deviceID + " shell input swipe {0} {1} {2} {3} {4}".format(x, y, x, y, time)
-    os.system(a)
+    shell(deviceID, "input swipe {0} {1} {2} {3} {4}".format(x, y, x, y, time), shellTimeout + time / 1000)
+
+# 发送按键事件，例如keycode=4为返回键
+def keyEvent(deviceID, keycode):
+    shell(deviceID, "input keyevent {0}".format(keycode))
@@ -1,10 +1,24 @@
 import subprocess
+import threading
+import queue
+import atexit
 import time
 import re
+import numpy as np
+import cv2
 
 # 记录活跃的长按操作
 _active_long_presses = {}
 
+# 持久化shell会话设置
+USE_SHELL_SESSION = True  # 是否通过持久化的adb shell会话发送输入命令
+MAX_SHELL_SESSIONS = 4    # 每台设备最多同时打开的会话数（并发的长按/滑动各占一个）
+SHELL_TIMEOUT = 2         # 等待空闲会话和命令完成的默认超时(秒)
+
+# 设备ID -> ShellSessionPool
+_shell_pools = {}
+_shell_pools_lock = threading.Lock()
+
 def getDevicesList():
     """获取连接的设备列表"""
     try:
@@ -22,17 +36,179 @@ def getDevicesList():
         print(f"获取设备列表失败: {str(e)}")
         return []
 
+class ShellSession:
+    """持久化的adb shell会话 - 命令写入打开的shell管道，以回显标记确认执行完成
+    
+    单个会话同一时间只能由一个调用者使用，多线程共享请通过ShellSessionPool
+    """
+    
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.proc = None
+        self.lines = None
+        self.seq = 0
+    
+    def connect(self):
+        """建立(或重建)shell管道，并启动后台读取线程"""
+        self.close()
+        self.proc = subprocess.Popen(['adb', '-s', self.device_id, 'shell'], stdin=subprocess.PIPE,
+                                     stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=0)
+        self.lines = queue.Queue()
+        threading.Thread(target=self._read, args=(self.proc, self.lines), daemon=True).start()
+    
+    @staticmethod
+    def _read(proc, lines):
+        """读取shell输出，进程退出时放入None作为断开标记"""
+        for line in iter(proc.stdout.readline, b''):
+            lines.put(line)
+        lines.put(None)
+    
+    def alive(self):
+        return self.proc is not None and self.proc.poll() is None
+    
+    def execute(self, cmd, timeout):
+        """执行命令并等待完成 - 未能送达时抛出OSError，已送达但未确认时抛出TimeoutError"""
+        if not self.alive():
+            self.connect()
+        self.seq += 1
+        # 标记拆成两段引号拼接，避免shell回显命令本身时被误判为完成
+        marker = f"__RSH_DONE_{self.seq}__"
+        self.proc.stdin.write(f'{cmd}; echo "__RSH_"DONE_{self.seq}__\n'.encode())
+        self.proc.stdin.flush()
+        
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"命令超时: {cmd}")
+            try:
+                out = self.lines.get(timeout=remaining)
+            except queue.Empty:
+                raise TimeoutError(f"命令超时: {cmd}")
+            if out is None:
+                raise TimeoutError(f"shell会话已断开: {cmd}")
+            if marker in out.decode('utf-8', errors='ignore'):
+                return True
+    
+    def close(self):
+        if self.proc is not None:
+            try:
+                self.proc.stdin.close()
+            except Exception:
+                pass
+            try:
+                self.proc.kill()
+            except Exception:
+                pass
+        self.proc = None
+
+class ShellSessionPool:
+    """单台设备的shell会话池 - 空闲会话排队复用，全部繁忙时新建会话，达到上限后排队等待"""
+    
+    def __init__(self, device_id, max_sessions=None):
+        self.device_id = device_id
+        self.max_sessions = max_sessions or MAX_SHELL_SESSIONS
+        self.idle = queue.LifoQueue()
+        self.created = 0
+        self.lock = threading.Lock()
+    
+    def acquire(self, timeout):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.max_sessions:
+                self.created += 1
+                return ShellSession(self.device_id)
+        return self.idle.get(timeout=timeout)
+    
+    def release(self, session):
+        self.idle.put(session)
+    
+    def run(self, cmd, timeout=None):
+        """执行命令
+        
+        Returns:
+            True: 执行成功
+            False: 已送达但超时未确认（不重发，避免重复点击）
+            None: 无法送达
+        """
+        timeout = timeout or SHELL_TIMEOUT
+        try:
+            session = self.acquire(timeout)
+        except queue.Empty:
+            print(f"等待空闲ADB会话超时: {cmd}")
+            return None
+        try:
+            for attempt in range(2):
+                try:
+                    return session.execute(cmd, timeout)
+                except TimeoutError as e:
+                    print(f"ADB会话{e}，重新建立会话")
+                    session.close()
+                    return False
+                except OSError as e:
+                    # 管道已断开，命令尚未执行，重连后重发一次
+                    print(f"ADB会话断开({e})，正在重连...")
+                    session.close()
+            return None
+        finally:
+            self.release(session)
+    
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+def getShellPool(device_id):
+    """获取设备对应的shell会话池，不存在时创建"""
+    with _shell_pools_lock:
+        pool = _shell_pools.get(device_id)
+        if pool is None:
+            pool = ShellSessionPool(device_id)
+            _shell_pools[device_id] = pool
+        return pool
+
+def closeShellSessions():
+    """关闭所有设备的shell会话"""
+    with _shell_pools_lock:
+        pools = list(_shell_pools.values())
+        _shell_pools.clear()
+    for pool in pools:
+        pool.close()
+
+atexit.register(closeShellSessions)
+
+def shell(device_id, cmd, timeout=None):
+    """执行shell命令 - 优先使用持久化会话，会话不可用时退回到单独启动adb进程"""
+    timeout = timeout or SHELL_TIMEOUT
+    if USE_SHELL_SESSION:
+        result = getShellPool(device_id).run(cmd, timeout)
+        if result is not None:
+            return result
+    result = subprocess.run(f"adb -s {device_id} shell {cmd}", shell=True, capture_output=True, timeout=timeout)
+    return result.returncode == 0
+
 def touch(device_id, pos):
     """模拟点击"""
     try:
         x, y = pos
-        cmd = f"adb -s {device_id} shell input tap {x} {y}"
-        subprocess.run(cmd, shell=True, capture_output=True, timeout=2)
-        return True
+        return shell(device_id, f"input tap {x} {y}")
     except Exception as e:
         print(f"点击失败: {str(e)}")
         return False
 
+def keyEvent(device_id, keycode):
+    """发送按键事件，例如keycode=4为返回键"""
+    try:
+        return shell(device_id, f"input keyevent {keycode}")
+    except Exception as e:
+        print(f"发送按键失败: {str(e)}")
+        return False
+
 def startLongPress(device_id, pos):
     """开始长按 - 记录开始时间"""
     try:
@@ -70,8 +246,7 @@ def endLongPress(device_id, pos):
         del _active_long_presses[key]
         
         # 执行对应时长的长按操作
-        cmd = f"adb -s {device_id} shell input swipe {x} {y} {x} {y} {duration_ms}"
-        subprocess.run(cmd, shell=True, capture_output=True, timeout=max(2, duration + 1))
+        shell(device_id, f"input swipe {x} {y} {x} {y} {duration_ms}", max(2, duration + 1))
         
         print(f"ADB执行长按: {pos}, 持续时间: {duration*1000:.0f}ms")
         return True
@@ -84,9 +259,7 @@ def slide(device_id, start_pos, end_pos, duration):
     try:
         x1, y1 = start_pos
         x2, y2 = end_pos
-        cmd = f"adb -s {device_id} shell input swipe {x1} {y1} {x2} {y2} {duration}"
-        subprocess.run(cmd, shell=True, capture_output=True, timeout=max(2, duration/1000 + 1))
-        return True
+        return shell(device_id, f"input swipe {x1} {y1} {x2} {y2} {duration}", max(2, duration/1000 + 1))
     except Exception as e:
         print(f"滑动失败: {str(e)}")
         return False
@@ -107,6 +280,29 @@ def screenCapture(device_id, save_path):
         print(f"截屏失败: {str(e)}")
         return False
 
+def screenCaptureArray(device_id, timeout=5):
+    """截屏到内存 - 通过exec-out读取原始帧缓冲，返回BGR图像数组，失败返回None"""
+    try:
+        result = subprocess.run(['adb', '-s', device_id, 'exec-out', 'screencap'],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=timeout)
+        data = result.stdout
+        if result.returncode != 0 or len(data) < 12:
+            return None
+        
+        # 头部: 宽、高、像素格式(1=RGBA_8888)，Android 12起追加4字节色彩空间
+        w, h, fmt = np.frombuffer(data, dtype='<u4', count=3)
+        payload = int(w) * int(h) * 4
+        header = len(data) - payload
+        if fmt != 1 or header not in (12, 16):
+            print(f"无法解析的帧缓冲格式: {w}x{h} format={fmt} size={len(data)}")
+            return None
+        
+        rgba = np.frombuffer(data, dtype=np.uint8, count=payload, offset=header).reshape(int(h), int(w), 4)
+        return cv2.cvtColor(rgba, cv2.COLOR_RGBA2BGR)
+    except Exception as e:
+        print(f"内存截屏失败: {str(e)}")
+        return None
+
 def isDeviceConnected(device_id):
     """检查设备是否连接"""
     devices = getDevicesList()
@@ -11,6 +11,7 @@ import os
 import threading
 from datetime import datetime
 import ADBHelper
+import TemplateCache
 from game_config import WEAPON_CONTROLS, SCREEN_CENTER
 
 class AutoFireSystem:
@@ -285,7 +286,7 @@ class AutoFireSystem:
                 print("船体模板不存在，跳过船体检测")
                 return None
             
-            template = cv2.imread(hull_template_path)
+            template = TemplateCache.get(hull_template_path)
             if template is None:
                 print("无法读取船体模板")
                 return None
@@ -317,7 +318,7 @@ class AutoFireSystem:
                 print("敌方阵营模板不存在，跳过阵营检测")
                 return None
             
-            template = cv2.imread(faction_template_path)
+            template = TemplateCache.get(faction_template_path)
             if template is None:
                 print("无法读取敌方阵营模板")
                 return None
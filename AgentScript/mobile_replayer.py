@@ -9,6 +9,7 @@ import os
 import subprocess
 from datetime import datetime
 import ADBHelper
+import TemplateCache
 import cv2
 import numpy as np
 
@@ -69,6 +70,11 @@ class MobileReplayer:
     def capture_screen_for_detection(self):
         """为图色识别截取屏幕"""
         try:
+            # 优先直接读取到内存，失败时退回到截图文件方式
+            img = ADBHelper.screenCaptureArray(self.device_id)
+            if img is not None:
+                return img
+            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
             cache_dir = os.path.join(os.path.dirname(__file__), "cache")
             os.makedirs(cache_dir, exist_ok=True)
@@ -111,7 +117,7 @@ class MobileReplayer:
                 if not os.path.exists(template_path):
                     continue
                     
-                template = cv2.imread(template_path)
+                template = TemplateCache.get(template_path)
                 if template is None:
                     continue
                 
@@ -401,8 +407,8 @@ class MobileReplayer:
                         compensated_duration = duration + self.long_press_compensation
                         # 使用与录制时相同的ADB命令执行方式
                         x, y = position
-                        cmd = f"adb -s {self.device_id} shell input swipe {x} {y} {x} {y} {compensated_duration}"
-                        subprocess.run(cmd, shell=True, capture_output=True, timeout=max(2, compensated_duration/1000 + 1))
+                        ADBHelper.shell(self.device_id, f"input swipe {x} {y} {x} {y} {compensated_duration}",
+                                        max(2, compensated_duration/1000 + 1))
                         print(f"执行长按: {action_info} -> {position}, 原时长: {duration}ms, 补偿后: {compensated_duration}ms")
                     else:
                         # 普通点击（与录制时一致）
@@ -419,8 +425,8 @@ class MobileReplayer:
                     compensated_duration = duration + self.long_press_compensation
                     # 使用与录制时相同的ADB命令执行方式
                     x, y = position
-                    cmd = f"adb -s {self.device_id} shell input swipe {x} {y} {x} {y} {compensated_duration}"
-                    subprocess.run(cmd, shell=True, capture_output=True, timeout=max(2, compensated_duration/1000 + 1))
+                    ADBHelper.shell(self.device_id, f"input swipe {x} {y} {x} {y} {compensated_duration}",
+                                    max(2, compensated_duration/1000 + 1))
                     print(f"执行长按: {action_info} -> {position}, 原时长: {duration}ms, 补偿后: {compensated_duration}ms")
                 
             elif action_type == 'long_press_start':
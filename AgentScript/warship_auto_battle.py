@@ -29,6 +29,8 @@ from PyQt5.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, QHBoxLayout
 from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt
 from PyQt5.QtGui import QFont, QIcon
 import ADBHelper
+import OcrEngine
+import TemplateCache
 from mobile_replayer import MobileReplayer
 from auto_fire_system import AutoFireSystem
 import glob
@@ -52,10 +54,17 @@ class ImageMatcher:
         self.device_id = device_id
         self.game_mode = game_mode
         self.templates_dir = os.path.join(SCRIPT_DIR, "templates")
+        # 预加载所有模板图片，之后的匹配不再读取磁盘
+        TemplateCache.preload([self.templates_dir])
         
     def capture_screen(self):
         """截取屏幕"""
         try:
+            # 优先直接读取到内存，失败时退回到截图文件方式
+            screen = ADBHelper.screenCaptureArray(self.device_id)
+            if screen is not None:
+                return screen
+            
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             cache_dir = os.path.join(SCRIPT_DIR, "cache")
             os.makedirs(cache_dir, exist_ok=True)
@@ -76,7 +85,7 @@ class ImageMatcher:
                 print("模板文件不存在: %s" % template_path)
                 return False, None
                 
-            template = cv2.imread(template_path)
+            template = TemplateCache.get(template_path)
             if template is None:
                 print("无法读取模板文件: %s" % template_path)
                 return False, None
@@ -110,7 +119,7 @@ class ImageMatcher:
                 
                 new_w = int(template.shape[1] * scale)
                 new_h = int(template.shape[0] * scale)
-                template = cv2.resize(template, (new_w, new_h))
+                template = TemplateCache.get(template_path, (new_w, new_h))
                 print("已将模板缩放到 %dx%d" % (new_w, new_h))
             
             # 执行模板匹配
@@ -206,39 +215,28 @@ class ImageMatcher:
     
     def recognize_reward_text(self, region_img):
         """使用OCR识别奖励文本"""
+        return self.recognize_reward_texts([region_img])[0]
+    
+    def recognize_reward_texts(self, region_imgs):
+        """使用共享OCR引擎批量识别奖励文本（一次前向计算）"""
         # 检查OCR库是否可用
         if CnOcr is None:
-            return "OCR库不可用"
+            return ["OCR库不可用"] * len(region_imgs)
         
         try:
-            # 保存区域图像到临时文件
-            temp_path = os.path.join(SCRIPT_DIR, "cache", "temp_reward_%s.png" % datetime.now().strftime('%Y%m%d_%H%M%S_%f'))
-            os.makedirs(os.path.dirname(temp_path), exist_ok=True)
-            cv2.imwrite(temp_path, region_img)
-            
-            # 初始化OCR模型
-            ocr = CnOcr(rec_model_name='en_PP-OCRv3')
-            
-            # 识别文本
-            result = ocr.ocr_for_single_line(temp_path)
-            
-            # 删除临时文件
-            try:
-                os.remove(temp_path)
-            except:
-                pass
-            
-            # 处理识别结果
-            reward_text = result.get("text", "0")
+            texts = OcrEngine.recognize_texts(region_imgs)
+        except Exception as e:
+            print("识别奖励文本时出错: %s" % str(e))
+            return ["0"] * len(region_imgs)
+        
+        results = []
+        for reward_text in texts:
             cleaned_text = reward_text.replace(',', '').replace(' ', '')
             
             # 只保留数字
             numbers_only = ''.join(c for c in cleaned_text if c.isdigit())
-            return numbers_only if numbers_only else "0"
-            
-        except Exception as e:
-            print("识别奖励文本时出错: %s" % str(e))
-            return "0"
+            results.append(numbers_only if numbers_only else "0")
+        return results
     
     def recognize_battle_rewards(self):
         """识别战斗结算奖励"""
@@ -258,29 +256,23 @@ class ImageMatcher:
                 "has_vip": has_vip
             }
             
-            # 识别基础奖励
-            for reward_type in ["dollar_base", "gold_base"]:
+            # 识别基础奖励，如果有VIP同时识别额外奖励（所有区域一次批量识别）
+            reward_types = ["dollar_base", "gold_base"]
+            if has_vip:
+                reward_types += ["dollar_extra", "gold_extra"]
+            
+            region_imgs = []
+            for reward_type in reward_types:
                 x1, y1, x2, y2 = REWARD_REGIONS[reward_type]
-                region_img = screen[y1:y2, x1:x2]
-                reward_text = self.recognize_reward_text(region_img)
+                region_imgs.append(screen[y1:y2, x1:x2])
+            
+            for reward_type, reward_text in zip(reward_types, self.recognize_reward_texts(region_imgs)):
                 try:
                     rewards[reward_type] = int(reward_text) if reward_text.isdigit() else 0
                 except:
                     rewards[reward_type] = 0
                 print("识别%s奖励: %d" % (reward_type, rewards[reward_type]))
             
-            # 如果有VIP，识别额外奖励
-            if has_vip:
-                for reward_type in ["dollar_extra", "gold_extra"]:
-                    x1, y1, x2, y2 = REWARD_REGIONS[reward_type]
-                    region_img = screen[y1:y2, x1:x2]
-                    reward_text = self.recognize_reward_text(region_img)
-                    try:
-                        rewards[reward_type] = int(reward_text) if reward_text.isdigit() else 0
-                    except:
-                        rewards[reward_type] = 0
-                    print("识别%s奖励: %d" % (reward_type, rewards[reward_type]))
-            
             return rewards
             
         except Exception as e:
@@ -825,9 +817,7 @@ class AutoBattleWorker(QThread):
     def send_back_key(self):
         """发送安卓返回键"""
         try:
-            import subprocess
-            cmd = "adb -s %s shell input keyevent 4" % self.device_id
-            subprocess.run(cmd, shell=True, capture_output=True, timeout=2)
+            ADBHelper.keyEvent(self.device_id, 4)
             self.log_message.emit("已发送返回键")
         except Exception as e:
             self.log_message.emit("发送返回键失败: %s" % str(e))
@@ -9,6 +9,9 @@ import json
 import pandas as pd
 from datetime import datetime
 import glob
+import PriceStore
+import TrackerModel
+import threading
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTabWidget, QWidget, 
                              QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, 
                              QLineEdit, QPushButton, QTableWidget, QTableWidgetItem,
@@ -21,6 +24,10 @@ from PyQt5.QtGui import QFont
 # BidTracker模块将会导入此模块，避免循环导入
 BIDTRACKER_AVAILABLE = False
 
+# 报价追踪卡片设置
+CARD_HISTORY_ROWS = 20  # 卡片详情中显示的最近记录行数，更早的记录点击按钮后按页加载
+CARD_MATERIALIZE_MARGIN = 400  # 卡片在可视区域上下该距离(像素)以内时才构建详细记录
+
 # 尝试导入BidTracker模块
 try:
     import BidTracker
@@ -39,6 +46,8 @@ class TrackingSignals(QObject):
     tracking_started = pyqtSignal()
     tracking_stopped = pyqtSignal()
     data_refresh_requested = pyqtSignal()
+    tracker_data_ready = pyqtSignal(object, bool)  # 有变化的物品卡片数据, 是否为完整重新加载
+    error_occurred = pyqtSignal(str)
 
 class AutoTradeMainWindow(QMainWindow):
     def __init__(self):
@@ -74,6 +83,13 @@ class AutoTradeMainWindow(QMainWindow):
         self.tracking_signals.tracking_started.connect(self.on_tracking_started_safe)
         self.tracking_signals.tracking_stopped.connect(self.on_tracking_stopped_safe)
         self.tracking_signals.data_refresh_requested.connect(self.refresh_bid_tracker)
+        self.tracking_signals.tracker_data_ready.connect(self.on_tracker_data_ready)
+        self.tracking_signals.error_occurred.connect(lambda message: QMessageBox.critical(self, "追踪错误", message))
+        
+        # 报价追踪数据模型：在工作线程中增量读取新增记录，界面只更新有变化的物品
+        self.tracker_model = TrackerModel.TrackerModel("./market_data/报价追踪.csv")
+        self.tracker_refresh_running = False
+        self.tracker_refresh_pending = False
         
         # 初始化界面
         self.init_ui()
@@ -296,6 +312,14 @@ class AutoTradeMainWindow(QMainWindow):
         
         scroll_area.setWidget(self.cards_widget)
         layout.addWidget(scroll_area)
+        self.cards_scroll = scroll_area
+        
+        # 只为可视区域附近的卡片构建详细记录，滚动时合并请求后再构建
+        self.card_materialize_timer = QTimer(self)
+        self.card_materialize_timer.setSingleShot(True)
+        self.card_materialize_timer.setInterval(50)
+        self.card_materialize_timer.timeout.connect(self.materialize_visible_cards)
+        scroll_area.verticalScrollBar().valueChanged.connect(self.schedule_card_materialize)
         
         # 底部日志区域
         log_label = QLabel("追踪日志:")
@@ -308,7 +332,7 @@ class AutoTradeMainWindow(QMainWindow):
         
         # 存储卡片状态和数据
         self.item_cards = {}  # {item_name: card_widget}
-        self.card_states = {}  # {item_name: {'expanded': True, 'last_record_count': 0}}
+        self.card_states = {}  # {item_name: {'expanded': True, 'last_record_count': 0, 'item_data': ..., 详情控件和已显示的记录范围}}
         
         # 自动刷新数据（当标签被激活时）
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
@@ -404,17 +428,17 @@ class AutoTradeMainWindow(QMainWindow):
             
             print(f"使用价格数据文件: {latest_file}")
             
-            # 读取价格数据
-            df = pd.read_csv(latest_file)
-            
             # 获取筛选条件
             max_buy_price = self.max_buy_price_spin.value()
             min_spread = self.min_spread_spin.value()
             min_profit_rate = self.min_profit_rate_spin.value()
             min_bid_count = self.min_bid_count_spin.value()
             
-            # 筛选数据
-            filtered_df = self.filter_targets(df, max_buy_price, min_spread, min_profit_rate, min_bid_count)
+            # 价格数据库中有该文件的完整数据时直接查询，否则读取CSV逐行解析筛选
+            filtered_df = self.query_targets_from_store(latest_file, max_buy_price, min_spread, min_profit_rate, min_bid_count)
+            if filtered_df is None:
+                df = pd.read_csv(latest_file)
+                filtered_df = self.filter_targets(df, max_buy_price, min_spread, min_profit_rate, min_bid_count)
             
             # 排序
             sort_method = self.sort_combo.currentText()
@@ -438,6 +462,28 @@ class AutoTradeMainWindow(QMainWindow):
             QMessageBox.critical(self, "错误", f"获取标的时出错: {str(e)}")
             print(f"获取标的时出错: {str(e)}")
 
+    def query_targets_from_store(self, price_file, max_buy_price, min_spread, min_profit_rate, min_bid_count):
+        """
+        从价格数据库中筛选标的
+        
+        返回:
+            与filter_targets结果列名一致的DataFrame，数据库中没有该文件的完整数据时返回None
+        """
+        try:
+            source = PriceStore.source_from_path(price_file)
+            with open(price_file, 'r', encoding='utf-8') as f:
+                csv_rows = sum(1 for _ in f) - 1
+            if csv_rows <= 0 or PriceStore.count_rows(source) != csv_rows:
+                return None
+            rows = PriceStore.query(source=source, max_buy_price=max_buy_price, min_spread=min_spread,
+                                    min_profit_rate=min_profit_rate, min_bid_count=min_bid_count)
+            print(f"从价格数据库筛选出 {len(rows)} 个标的")
+            return pd.DataFrame([PriceStore.to_csv_record(row) for row in rows],
+                                columns=PriceStore.CSV_COLUMNS + ['最高购买价格'])
+        except Exception as e:
+            print(f"查询价格数据库失败: {str(e)}，改为读取CSV")
+            return None
+
     def filter_targets(self, df, max_buy_price, min_spread, min_profit_rate, min_bid_count):
         """筛选标的"""
         filtered_df = df.copy()
@@ -983,73 +1029,66 @@ class AutoTradeMainWindow(QMainWindow):
             self.refresh_bid_tracker()
 
     def refresh_bid_tracker(self):
-        """刷新报价追踪数据"""
+        """刷新报价追踪数据：在工作线程中读取新增记录，读取完成后在界面线程中更新有变化的卡片"""
+        if self.tracker_refresh_running:
+            # 正在读取时只记录一次待刷新，读取完成后再刷新一次
+            self.tracker_refresh_pending = True
+            return
+        self.tracker_refresh_running = True
+        self.tracker_refresh_pending = False
+        self.tracker_status_label.setText("状态: 正在加载数据...")
+        self.tracker_progress.setVisible(True)
+        self.tracker_progress.setRange(0, 0)  # 无限进度条
+        threading.Thread(target=self.load_tracker_updates, daemon=True).start()
+
+    def load_tracker_updates(self):
+        """工作线程中执行：读取报价追踪文件的新增记录并更新统计信息"""
         try:
-            print(f"[DEBUG] 开始刷新报价追踪数据...")
-            self.tracker_status_label.setText("状态: 正在加载数据...")
-            self.tracker_progress.setVisible(True)
-            self.tracker_progress.setRange(0, 0)  # 无限进度条
-            
-            # 检查报价追踪文件是否存在
-            tracker_file = "./market_data/报价追踪.csv"
-            if not os.path.exists(tracker_file):
-                print(f"[DEBUG] 报价追踪文件不存在: {tracker_file}")
-                self.tracker_status_label.setText("状态: 未找到报价追踪文件")
-                self.tracker_progress.setVisible(False)
-                return
-            
-            print(f"[DEBUG] 读取报价追踪文件: {tracker_file}")
-            # 读取报价追踪数据
-            df = pd.read_csv(tracker_file)
-            print(f"[DEBUG] 读取到数据形状: {df.shape}")
-            
-            if df.empty:
-                print(f"[DEBUG] 报价追踪文件为空")
-                self.tracker_status_label.setText("状态: 报价追踪文件为空")
-                self.tracker_progress.setVisible(False)
-                # 清空现有卡片
-                self.clear_all_cards()
+            changed_items, reloaded = self.tracker_model.poll()
+        except Exception as e:
+            print(f"[ERROR] 读取报价追踪数据时出错: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            changed_items, reloaded = e, False
+        self.tracking_signals.tracker_data_ready.emit(changed_items, reloaded)
+
+    def on_tracker_data_ready(self, changed_items, reloaded):
+        """界面线程中执行：根据有变化的物品更新卡片"""
+        try:
+            if isinstance(changed_items, Exception):
+                timestamp = datetime.now().strftime("%H:%M:%S")
+                self.tracking_signals.log_added.emit(f"[{timestamp}] 刷新失败: {str(changed_items)}")
+                self.tracker_status_label.setText(f"状态: 刷新失败 - {str(changed_items)}")
                 return
             
-            # 按物品名称分组，获取每个物品的历史数据
-            print(f"[DEBUG] 开始处理数据分组...")
-            grouped_data = self.process_tracker_data_for_cards(df)
-            print(f"[DEBUG] 分组完成，共 {len(grouped_data)} 个物品")
-            
-            if not grouped_data:
-                print(f"[DEBUG] 警告: 分组数据为空")
-                self.tracker_status_label.setText("状态: 没有有效的追踪数据")
-                self.tracker_progress.setVisible(False)
-                # 清空现有卡片
+            if reloaded and not changed_items:
+                # 文件不存在、为空或被改写后没有有效数据
                 self.clear_all_cards()
+                if os.path.exists(self.tracker_model.path):
+                    self.tracker_status_label.setText("状态: 没有有效的追踪数据")
+                else:
+                    self.tracker_status_label.setText("状态: 未找到报价追踪文件")
                 return
             
-            # 更新或创建卡片
-            print(f"[DEBUG] 开始更新卡片...")
-            self.update_tracking_cards_safe(grouped_data)
-            print(f"[DEBUG] 卡片更新完成")
-            
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            success_msg = f"[{timestamp}] 数据刷新完成，共 {len(grouped_data)} 个物品"
-            print(f"[DEBUG] {success_msg}")
-            self.tracking_signals.log_added.emit(success_msg)
-            
+            if changed_items:
+                self.update_tracking_cards_safe(changed_items, remove_missing=reloaded)
+                timestamp = datetime.now().strftime("%H:%M:%S")
+                self.tracking_signals.log_added.emit(
+                    f"[{timestamp}] 数据刷新完成，{len(changed_items)} 个物品有更新，共 {len(self.item_cards)} 个物品")
+            else:
+                self.tracker_status_label.setText(f"状态: 已加载 {len(getattr(self, 'item_cards', {}))} 个追踪物品")
         except Exception as e:
             error_msg = f"刷新报价追踪数据时出错: {str(e)}"
             print(f"[ERROR] {error_msg}")
             import traceback
             traceback.print_exc()
-            
-            timestamp = datetime.now().strftime("%H:%M:%S")
-            self.tracking_signals.log_added.emit(f"[{timestamp}] 刷新失败: {str(e)}")
-            
-            # 确保界面状态正确
             self.tracker_status_label.setText(f"状态: 刷新失败 - {str(e)}")
-            self.tracker_progress.setVisible(False)
-        
         finally:
             # 确保进度条总是被隐藏
             self.tracker_progress.setVisible(False)
+            self.tracker_refresh_running = False
+            if self.tracker_refresh_pending:
+                self.refresh_bid_tracker()
 
     def clear_all_cards(self):
         """清空所有卡片"""
@@ -1083,223 +1122,34 @@ class AutoTradeMainWindow(QMainWindow):
             import traceback
             traceback.print_exc()
 
-    def process_tracker_data_for_cards(self, df):
-        """处理报价追踪数据用于卡片显示"""
-        grouped_data = []
-        
-        # 按物品名称分组
-        for item_name, item_group in df.groupby('物品名称'):
-            # 按时间戳排序
-            item_group = item_group.sort_values('时间戳')
-            
-            if len(item_group) < 1:
-                continue
-            
-            # 获取所有历史记录用于计算被竞价次数
-            item_records = []
-            for _, row in item_group.iterrows():
-                record = self.parse_price_record(row)
-                item_records.append(record)
-            
-            # 获取最新数据
-            latest_record = item_records[-1] if item_records else None
-            
-            # 计算被竞价次数和其他统计信息
-            competition_stats = self.calculate_competition_stats(item_records)
-            
-            grouped_data.append({
-                'item_name': item_name,
-                'category': item_records[0]['category'] if item_records else '',
-                'latest_record': latest_record,
-                'all_records': item_records,
-                'competition_stats': competition_stats,
-                'record_count': len(item_records)
-            })
-        
-        return grouped_data
-
     def parse_price_record(self, row):
         """解析价格记录"""
-        record = {
-            'category': row['物品分类'],
-            'timestamp': row['时间戳'],
-            'spread': row.get('低买低卖溢价', 'N/A'),
-            'profit_rate': row.get('利润率', 'N/A'),
-            'bid_count': row.get('出价数量', 0),
-            'listing_count': row.get('上架数量', 0),
-            'buying_prices': [],
-            'selling_prices': [],
-            'own_buying_price': row.get('本人购买价格', ''),
-            'own_selling_price': row.get('本人售出价格', '')
-        }
-        
-        # 解析购买价格 - 添加空值检查
-        buying_price_data = row.get('购买价格', '')
-        if pd.notna(buying_price_data) and buying_price_data and str(buying_price_data).strip():
-            for price in str(buying_price_data).split(';'):
-                clean_price = price.strip().replace(',', '')
-                if clean_price:
-                    try:
-                        record['buying_prices'].append(int(clean_price))
-                    except ValueError:
-                        print(f"无法解析购买价格: {price}")
-        
-        # 解析出售价格 - 添加空值检查
-        selling_price_data = row.get('出售价格', '')
-        if pd.notna(selling_price_data) and selling_price_data and str(selling_price_data).strip():
-            for price in str(selling_price_data).split(';'):
-                clean_price = price.strip().replace(',', '')
-                if clean_price:
-                    try:
-                        record['selling_prices'].append(int(clean_price))
-                    except ValueError:
-                        print(f"无法解析出售价格: {price}")
-        
-        # 排序价格
-        record['buying_prices'].sort()
-        record['selling_prices'].sort()
-        
-        return record
+        return TrackerModel.parse_price_record(row)
 
     def calculate_row_competition(self, record, previous_record=None):
         """计算单行的被竞价次数：相比上一行新增的竞价数量"""
         try:
-            # 获取本行的本人购买价格
-            own_buying_price_str = record.get('own_buying_price', '')
-            if not own_buying_price_str or own_buying_price_str == '':
-                # 如果没有本人购买价格，返回0
-                return 0
-            
-            # 解析本行的本人购买价格
-            try:
-                own_buying_price = float(str(own_buying_price_str).replace(',', '').strip())
-            except:
-                return 0
-            
-            # 获取本行中大于本人购买价格的购买价格集合
-            current_competing_prices = set()
-            buying_prices = record.get('buying_prices', [])
-            
-            for price in buying_prices:
-                if price > own_buying_price:
-                    current_competing_prices.add(price)
-            
-            # 如果没有上一行，直接返回当前行的竞价数量
-            if not previous_record:
-                return len(current_competing_prices)
-            
-            # 获取上一行的本人购买价格
-            prev_own_buying_price_str = previous_record.get('own_buying_price', '')
-            if not prev_own_buying_price_str or prev_own_buying_price_str == '':
-                # 如果上一行没有本人购买价格，返回当前行的竞价数量
-                return len(current_competing_prices)
-            
-            # 解析上一行的本人购买价格
-            try:
-                prev_own_buying_price = float(str(prev_own_buying_price_str).replace(',', '').strip())
-            except:
-                # 如果上一行本人购买价格解析失败，返回当前行的竞价数量
-                return len(current_competing_prices)
-            
-            # 获取上一行中大于上一行本人购买价格的购买价格集合
-            previous_competing_prices = set()
-            prev_buying_prices = previous_record.get('buying_prices', [])
-            
-            for price in prev_buying_prices:
-                if price > prev_own_buying_price:
-                    previous_competing_prices.add(price)
-            
-            # 计算新增的竞价：当前行的竞价价格集合 - 上一行的竞价价格集合
-            new_competing_prices = current_competing_prices - previous_competing_prices
-            
-            print(f"[DEBUG] 竞价计算 - 当前竞价价格: {current_competing_prices}, 上一行竞价价格: {previous_competing_prices}, 新增: {new_competing_prices}")
-            
-            return len(new_competing_prices)
-            
+            return TrackerModel.calculate_row_competition(record, previous_record)
         except Exception as e:
             print(f"[ERROR] 计算行被竞价时出错: {str(e)}")
             return 0
 
     def calculate_competition_stats(self, item_records):
         """计算竞争统计信息"""
-        try:
-            if not item_records:
-                return {
-                    'latest_competitions': 0,
-                    'spread_trend': 'stable',
-                    'profit_trend': 'stable',
-                    'total_competitions': 0
-                }
-            
-            # 计算每行的被竞价并加总
-            total_competitions = 0
-            for i, record in enumerate(item_records):
-                # 传递上一行记录用于计算新增竞价
-                previous_record = item_records[i-1] if i > 0 else None
-                row_competition = self.calculate_row_competition(record, previous_record)
-                total_competitions += row_competition
-            
-            # 获取最新记录的竞争次数
-            if len(item_records) >= 2:
-                latest_competitions = self.calculate_row_competition(item_records[-1], item_records[-2])
-            elif len(item_records) == 1:
-                latest_competitions = self.calculate_row_competition(item_records[-1], None)
-            else:
-                latest_competitions = 0
-            
-            # 计算趋势
-            spread_trend = 'stable'
-            profit_trend = 'stable'
-            
-            if len(item_records) >= 2:
-                current_spread = self.parse_numeric_value(item_records[-1]['spread'])
-                previous_spread = self.parse_numeric_value(item_records[-2]['spread'])
-                
-                if current_spread is not None and previous_spread is not None:
-                    if current_spread > previous_spread:
-                        spread_trend = 'up'
-                    elif current_spread < previous_spread:
-                        spread_trend = 'down'
-                
-                current_profit = self.parse_numeric_value(item_records[-1]['profit_rate'])
-                previous_profit = self.parse_numeric_value(item_records[-2]['profit_rate'])
-                
-                if current_profit is not None and previous_profit is not None:
-                    if current_profit > previous_profit:
-                        profit_trend = 'up'
-                    elif current_profit < previous_profit:
-                        profit_trend = 'down'
-            
-            return {
-                'latest_competitions': latest_competitions,
-                'spread_trend': spread_trend,
-                'profit_trend': profit_trend,
-                'total_competitions': total_competitions  # 使用计算出的总竞价数
-            }
-        except Exception as e:
-            print(f"[ERROR] 计算竞争统计信息时出错: {str(e)}")
-            return {
-                'latest_competitions': 0,
-                'spread_trend': 'stable',
-                'profit_trend': 'stable',
-                'total_competitions': 0
-            }
+        return TrackerModel.calculate_competition_stats(item_records)
 
     def parse_numeric_value(self, value):
         """解析数值"""
-        try:
-            # 处理百分比
-            if isinstance(value, str) and '%' in value:
-                return float(value.replace('%', ''))
-            # 处理逗号分隔的数字
-            if isinstance(value, str):
-                value = value.replace(',', '').replace(' ', '')
-            return float(value)
-        except:
-            return None
+        return TrackerModel.parse_numeric_value(value)
 
-    def update_tracking_cards_safe(self, grouped_data):
-        """安全地更新追踪卡片，加强异常处理"""
+    def update_tracking_cards_safe(self, grouped_data, remove_missing=True):
+        """
+        安全地更新追踪卡片，加强异常处理
+        
+        参数:
+            grouped_data: 物品卡片数据列表
+            remove_missing: 为True时删除不在列表中的物品卡片（完整数据），增量更新时为False
+        """
         try:
             print(f"[DEBUG] 进入update_tracking_cards_safe，数据量: {len(grouped_data)}")
             
@@ -1312,11 +1162,8 @@ class AutoTradeMainWindow(QMainWindow):
             existing_items = set(self.item_cards.keys())
             current_items = set([item['item_name'] for item in grouped_data])
             
-            print(f"[DEBUG] 现有物品: {existing_items}")
-            print(f"[DEBUG] 当前物品: {current_items}")
-            
             # 删除不再存在的物品卡片
-            items_to_remove = existing_items - current_items
+            items_to_remove = existing_items - current_items if remove_missing else set()
             for item_name in items_to_remove:
                 try:
                     print(f"[DEBUG] 删除卡片: {item_name}")
@@ -1335,25 +1182,23 @@ class AutoTradeMainWindow(QMainWindow):
             for item_data in grouped_data:
                 try:
                     item_name = item_data['item_name']
-                    print(f"[DEBUG] 处理物品: {item_name}")
                     
                     if item_name in self.item_cards:
                         # 更新现有卡片
-                        print(f"[DEBUG] 更新现有卡片: {item_name}")
                         self.update_existing_card_safe(item_name, item_data)
                     else:
-                        # 创建新卡片
+                        # 创建新卡片（只创建头部，详细记录在卡片可见时再构建）
                         print(f"[DEBUG] 创建新卡片: {item_name}")
+                        self.card_states[item_name] = {
+                            'expanded': True, 
+                            'last_record_count': len(item_data['all_records'])
+                        }
                         card = self.create_item_card_safe(item_data)
                         if card:
                             self.item_cards[item_name] = card
-                            self.card_states[item_name] = {
-                                'expanded': True, 
-                                'last_record_count': len(item_data['all_records'])
-                            }
                             self.cards_layout.addWidget(card)
-                            print(f"[DEBUG] 新卡片已添加到布局: {item_name}")
                         else:
+                            del self.card_states[item_name]
                             print(f"[ERROR] 创建卡片失败: {item_name}")
                             
                 except Exception as e:
@@ -1368,10 +1213,8 @@ class AutoTradeMainWindow(QMainWindow):
             self.tracker_status_label.setText(status_text)
             self.tracker_progress.setVisible(False)
             
-            # 强制刷新布局
-            if hasattr(self, 'cards_widget') and self.cards_widget:
-                self.cards_widget.update()
-                self.cards_widget.repaint()
+            # 布局变化后构建进入可视区域的卡片详情
+            self.schedule_card_materialize()
             
         except Exception as e:
             print(f"[ERROR] update_tracking_cards_safe 出错: {str(e)}")
@@ -1381,7 +1224,7 @@ class AutoTradeMainWindow(QMainWindow):
             self.tracker_progress.setVisible(False)
 
     def update_existing_card_safe(self, item_name, item_data):
-        """安全地更新现有卡片"""
+        """安全地更新现有卡片：头部原地更新，新记录只追加对应的数据行"""
         try:
             if item_name not in self.item_cards:
                 print(f"[DEBUG] 卡片不存在，跳过更新: {item_name}")
@@ -1392,120 +1235,131 @@ class AutoTradeMainWindow(QMainWindow):
                 print(f"[DEBUG] 卡片对象为空，跳过更新: {item_name}")
                 return
                 
-            state = self.card_states.get(item_name, {'expanded': True, 'last_record_count': 0})
+            state = self.card_states.setdefault(item_name, {'expanded': True, 'last_record_count': 0})
+            state['item_data'] = item_data
             
             # 检查是否有新记录
             new_record_count = len(item_data['all_records'])
             last_record_count = state['last_record_count']
             
-            print(f"[DEBUG] 更新卡片 {item_name}: 新记录数={new_record_count}, 上次记录数={last_record_count}")
+            self.update_card_header_safe(card, item_data)
             
-            if new_record_count > last_record_count:
-                # 有新记录，重建卡片
-                print(f"[DEBUG] 有新记录，重建卡片内容: {item_name}")
-                self.rebuild_card_content_safe(card, item_data)
+            if new_record_count != last_record_count:
+                print(f"[DEBUG] 更新卡片 {item_name}: 新记录数={new_record_count}, 上次记录数={last_record_count}")
+                self.append_card_rows_safe(item_name)
                 state['last_record_count'] = new_record_count
                 
-                # 显示新数据提示
-                timestamp = datetime.now().strftime("%H:%M:%S")
-                self.tracking_signals.log_added.emit(f"[{timestamp}] {item_name} 新增 {new_record_count - last_record_count} 条记录")
-            else:
-                # 只更新头部信息
-                print(f"[DEBUG] 只更新头部信息: {item_name}")
-                self.update_card_header_safe(card, item_data)
+                if new_record_count > last_record_count:
+                    # 显示新数据提示
+                    timestamp = datetime.now().strftime("%H:%M:%S")
+                    self.tracking_signals.log_added.emit(f"[{timestamp}] {item_name} 新增 {new_record_count - last_record_count} 条记录")
                 
         except Exception as e:
             print(f"[ERROR] 更新现有卡片 {item_name} 时出错: {str(e)}")
             import traceback
             traceback.print_exc()
 
+    def append_card_rows_safe(self, item_name):
+        """把新增记录追加为数据行，超出显示行数时移除最早的行；记录顺序有变化时重建详情"""
+        state = self.card_states[item_name]
+        if not state.get('detail_built'):
+            return  # 详情尚未构建，展开或滚动到时再构建
+        
+        records = state['item_data']['all_records']
+        rendered_end = state['rendered_end']
+        if rendered_end > len(records) or (rendered_end and records[rendered_end - 1]['timestamp'] != state['last_rendered_timestamp']):
+            self.rebuild_card_content_safe(self.item_cards[item_name], state['item_data'])
+            return
+        
+        for index in range(rendered_end, len(records)):
+            row_widget = self.create_data_row(records[index], records[index - 1] if index > 0 else None, state['widths'])
+            state['detail_layout'].addWidget(row_widget)
+            state['row_widgets'].append(row_widget)
+        state['rendered_end'] = len(records)
+        state['last_rendered_timestamp'] = records[-1]['timestamp'] if records else None
+        
+        # 保持显示的行数不变，更早的记录通过按钮加载
+        while len(state['row_widgets']) > state['row_limit']:
+            row_widget = state['row_widgets'].pop(0)
+            row_widget.setParent(None)
+            row_widget.deleteLater()
+            state['rendered_start'] += 1
+        self.update_more_button(state)
+
     def rebuild_card_content_safe(self, card, item_data):
-        """安全地重建卡片内容"""
+        """安全地重建卡片内容：头部原地更新，详情清空后在可见时重新构建"""
         try:
-            print(f"[DEBUG] 重建卡片内容: {item_data['item_name']}")
-            
-            # 获取现有布局
-            layout = card.layout()
-            if layout:
-                print(f"[DEBUG] 清理现有布局...")
-                
-                # 递归删除所有子widget和子布局
-                def clear_layout_recursive(layout_to_clear):
-                    if not layout_to_clear:
-                        return
-                    while layout_to_clear.count():
-                        child = layout_to_clear.takeAt(0)
-                        if child.widget():
-                            widget = child.widget()
-                            widget.setParent(None)
-                            widget.deleteLater()
-                        elif child.layout():
-                            clear_layout_recursive(child.layout())
-                
-                # 清理布局内容
-                clear_layout_recursive(layout)
-                
-                # 不要删除布局本身，只是清空内容
-                print(f"[DEBUG] 布局内容已清空，准备重新构建...")
+            item_name = item_data['item_name']
+            print(f"[DEBUG] 重建卡片内容: {item_name}")
+            
+            state = self.card_states.get(item_name)
+            if not state or 'detail_layout' not in state:
+                # 卡片结构不完整，重新构建整个卡片内容
+                layout = card.layout() or QVBoxLayout(card)
+                while layout.count():
+                    child = layout.takeAt(0)
+                    if child.widget():
+                        child.widget().setParent(None)
+                        child.widget().deleteLater()
+                self.build_card_content_with_layout(layout, item_data)
             else:
-                # 如果没有布局，创建一个新的
-                print(f"[DEBUG] 创建新布局...")
-                layout = QVBoxLayout(card)
+                state['item_data'] = item_data
+                self.update_card_header_safe(card, item_data)
+                self.clear_card_detail(state)
             
-            # 重新构建卡片内容
-            self.build_card_content_with_layout(layout, item_data)
-            print(f"[DEBUG] 卡片内容重建完成: {item_data['item_name']}")
+            self.schedule_card_materialize()
                 
         except Exception as e:
             print(f"[ERROR] 重建卡片内容时出错: {str(e)}")
             import traceback
             traceback.print_exc()
-            
-            # 如果重建失败，尝试创建一个全新的卡片
-            try:
-                print(f"[DEBUG] 重建失败，尝试创建全新卡片...")
-                # 移除所有现有内容
-                if card.layout():
-                    layout = card.layout()
-                    while layout.count():
-                        child = layout.takeAt(0)
-                        if child.widget():
-                            child.widget().deleteLater()
-                
-                # 创建简单的错误显示
-                error_layout = QVBoxLayout(card)
-                error_label = QLabel(f"重建失败: {item_data['item_name']}")
-                error_label.setStyleSheet("color: red;")
-                error_layout.addWidget(error_label)
-                
-            except Exception as fatal_error:
-                print(f"[FATAL] 创建错误卡片也失败: {str(fatal_error)}")
+
+    def clear_card_detail(self, state):
+        """清空卡片详情中的数据行，标记为未构建"""
+        detail_layout = state['detail_layout']
+        while detail_layout.count():
+            child = detail_layout.takeAt(0)
+            if child.widget():
+                child.widget().setParent(None)
+                child.widget().deleteLater()
+        state.update({'detail_built': False, 'row_widgets': [], 'more_btn': None,
+                      'rendered_start': 0, 'rendered_end': 0, 'last_rendered_timestamp': None})
 
     def build_card_content_with_layout(self, layout, item_data):
-        """使用指定布局构建卡片内容"""
+        """使用指定布局构建卡片内容：只构建头部和空的详情区域，详细记录在卡片可见时构建"""
         try:
-            print(f"[DEBUG] 开始构建卡片内容: {item_data['item_name']}")
+            item_name = item_data['item_name']
+            print(f"[DEBUG] 开始构建卡片内容: {item_name}")
+            state = self.card_states.setdefault(item_name, {
+                'expanded': True, 
+                'last_record_count': len(item_data['all_records'])
+            })
+            state['item_data'] = item_data
             
             # 卡片头部
             header_widget = QWidget()
             header_layout = QHBoxLayout(header_widget)
             header_layout.setContentsMargins(0, 0, 0, 0)
             
-            self.build_card_header(header_layout, item_data)
+            state['header_labels'] = self.build_card_header(header_layout, item_data)
+            
+            # 展开/收起按钮
+            toggle_btn = QPushButton("收起详情" if state['expanded'] else "展开详情")
+            header_layout.addWidget(toggle_btn)
             
             layout.addWidget(header_widget)
             
-            # 详细信息区域（始终显示）
+            # 详细信息区域
             detail_widget = QWidget()
             detail_layout = QVBoxLayout(detail_widget)
             detail_layout.setContentsMargins(0, 10, 0, 0)
-            
-            # 创建详细信息内容
-            self.build_detail_content(detail_layout, item_data)
-            
+            detail_widget.setVisible(state['expanded'])
             layout.addWidget(detail_widget)
             
-            print(f"[DEBUG] 卡片内容构建完成: {item_data['item_name']}")
+            toggle_btn.clicked.connect(lambda: self.toggle_card_detail(item_name, detail_widget, toggle_btn))
+            state.update({'card': layout.parentWidget(), 'detail_widget': detail_widget, 'detail_layout': detail_layout,
+                          'toggle_btn': toggle_btn, 'row_limit': CARD_HISTORY_ROWS})
+            self.clear_card_detail(state)
             
         except Exception as e:
             print(f"[ERROR] 构建卡片内容时出错: {str(e)}")
@@ -1521,41 +1375,65 @@ class AutoTradeMainWindow(QMainWindow):
                 pass
 
     def update_card_header_safe(self, card, item_data):
-        """安全地更新卡片头部信息"""
+        """安全地更新卡片头部信息（原地修改头部标签的文字和颜色）"""
         try:
-            print(f"[DEBUG] 更新卡片头部: {item_data['item_name']}")
+            state = self.card_states.get(item_data['item_name'], {})
+            labels = state.get('header_labels')
+            if not labels:
+                return
             
-            # 找到头部布局并更新
-            layout = card.layout()
-            if layout and layout.count() > 0:
-                header_widget = layout.itemAt(0).widget()
-                if header_widget:
-                    # 重建头部
-                    header_layout = header_widget.layout()
-                    if header_layout:
-                        # 安全地清空头部
-                        while header_layout.count():
-                            child = header_layout.takeAt(0)
-                            if child.widget():
-                                widget = child.widget()
-                                widget.setParent(None)
-                                widget.deleteLater()
-                        
-                        # 重建头部内容
-                        self.build_card_header(header_layout, item_data)
-                        print(f"[DEBUG] 卡片头部更新完成: {item_data['item_name']}")
-                    else:
-                        print(f"[ERROR] 头部布局为空: {item_data['item_name']}")
-                else:
-                    print(f"[ERROR] 头部widget为空: {item_data['item_name']}")
-            else:
-                print(f"[ERROR] 卡片布局为空或无内容: {item_data['item_name']}")
+            latest_record = item_data['latest_record']
+            competition_stats = item_data.get('competition_stats', {})
+            if not latest_record:
+                return
+            
+            spread_color = self.get_trend_color(competition_stats.get('spread_trend', 'stable'))
+            labels['spread'].setText(f"{latest_record['spread']}")
+            labels['spread'].setStyleSheet(f"color: {spread_color}; font-weight: bold; font-size: 14px;")
+            
+            profit_color = self.get_trend_color(competition_stats.get('profit_trend', 'stable'))
+            labels['profit'].setText(f"{latest_record['profit_rate']}")
+            labels['profit'].setStyleSheet(f"color: {profit_color}; font-weight: bold; font-size: 14px;")
+            
+            labels['competition'].setText(f"{competition_stats.get('total_competitions', 0)}")
                 
         except Exception as e:
             print(f"[ERROR] 更新卡片头部时出错: {str(e)}")
             import traceback
             traceback.print_exc()
 
+    def schedule_card_materialize(self):
+        """合并短时间内的多次请求，稍后构建进入可视区域的卡片详情"""
+        if hasattr(self, 'card_materialize_timer'):
+            self.card_materialize_timer.start()
+
+    def materialize_visible_cards(self):
+        """为展开且位于可视区域附近的卡片构建详细记录，其余卡片保持只有头部"""
+        try:
+            if not self.item_cards:
+                return
+            scroll_bar = self.cards_scroll.verticalScrollBar()
+            visible_top = scroll_bar.value() - CARD_MATERIALIZE_MARGIN
+            visible_bottom = scroll_bar.value() + self.cards_scroll.viewport().height() + CARD_MATERIALIZE_MARGIN
+            
+            # 按布局顺序用sizeHint累加卡片位置（构建详情后卡片变高，后面卡片的位置随之变化）
+            card_names = {id(card): name for name, card in self.item_cards.items()}
+            y = self.cards_layout.contentsMargins().top()
+            for index in range(self.cards_layout.count()):
+                card = self.cards_layout.itemAt(index).widget()
+                if card is None:
+                    continue
+                state = self.card_states.get(card_names.get(id(card)))
+                if state and state['expanded'] and not state['detail_built'] and y <= visible_bottom and y + card.sizeHint().height() >= visible_top:
+                    self.build_detail_content(state['detail_layout'], state['item_data'])
+                y += card.sizeHint().height() + self.cards_layout.spacing()
+                if y > visible_bottom:
+                    break
+        except Exception as e:
+            print(f"[ERROR] 构建可见卡片详情时出错: {str(e)}")
+            import traceback
+            traceback.print_exc()
+
     def create_item_card_safe(self, item_data):
         """安全地创建物品卡片"""
         try:
@@ -1579,12 +1457,10 @@ class AutoTradeMainWindow(QMainWindow):
             
             # 创建布局 - 注意：不要在build_card_content中再次创建布局
             layout = QVBoxLayout(card)
-            print(f"[DEBUG] 为新卡片创建了布局")
             
             # 构建卡片内容，传入已经创建的布局
             self.build_card_content_with_layout(layout, item_data)
             
-            print(f"[DEBUG] 物品卡片创建完成: {item_data['item_name']}")
             return card
             
         except Exception as e:
@@ -1650,7 +1526,11 @@ class AutoTradeMainWindow(QMainWindow):
         self.tracking_signals.log_added.emit(f"[{timestamp}] 报价追踪已停止")
 
     def on_tracking_callback(self, event_type, data):
-        """处理BidTracker的回调事件"""
+        """
+        处理BidTracker的回调事件（在事件总线线程中调用，只通过信号更新界面）
+        
+        data_updated和data_unchanged是合并后的事件，data为 {'events': [...], 'items': [...], 'count': n}
+        """
         try:
             if event_type == 'tracking_started':
                 self.tracking_signals.tracking_started.emit()
@@ -1673,13 +1553,14 @@ class AutoTradeMainWindow(QMainWindow):
                 
             elif event_type == 'data_updated':
                 timestamp = datetime.now().strftime("%H:%M:%S")
-                self.tracking_signals.log_added.emit(f"[{timestamp}] ✓ {data['item_name']} 数据已更新 ({data['timestamp']})")
-                # 刷新表格显示
+                self.tracking_signals.log_added.emit("\n".join(
+                    f"[{timestamp}] ✓ {event['item_name']} 数据已更新 ({event['timestamp']})" for event in data['events']))
+                # 一批更新只刷新一次表格显示
                 self.tracking_signals.data_refresh_requested.emit()
                 
             elif event_type == 'data_unchanged':
                 timestamp = datetime.now().strftime("%H:%M:%S")
-                self.tracking_signals.log_added.emit(f"[{timestamp}] - {data['item_name']} 数据无变化")
+                self.tracking_signals.log_added.emit(f"[{timestamp}] - {'、'.join(data['items'])} 数据无变化")
                 
             elif event_type == 'item_not_found':
                 timestamp = datetime.now().strftime("%H:%M:%S")
@@ -1700,7 +1581,7 @@ class AutoTradeMainWindow(QMainWindow):
                 timestamp = datetime.now().strftime("%H:%M:%S")
                 self.tracking_signals.log_added.emit(f"[{timestamp}] 错误: {data['message']}")
                 # 错误消息框需要在主线程中显示
-                QMessageBox.critical(self, "追踪错误", data['message'])
+                self.tracking_signals.error_occurred.emit(data['message'])
                 
         except Exception as e:
             timestamp = datetime.now().strftime("%H:%M:%S")
@@ -1950,6 +1831,13 @@ class AutoTradeMainWindow(QMainWindow):
             if removed_count > 0:
                 # 保存更新后的CSV
                 df_filtered.to_csv(tracker_file, index=False, encoding='utf-8')
+                # 文件被改写，下次刷新时重新读取
+                self.tracker_model.reset()
+                # 追踪中时去重索引仍保存着被删除的最新记录，一并删除，否则相同的读数不会再写入
+                if BIDTRACKER_AVAILABLE:
+                    BidTracker.forget_latest_record(item_name)
+                # 价格数据库中的报价追踪记录同步删除，保持与CSV一致
+                PriceStore.delete_item(item_name, item_category, PriceStore.TRACKER_SOURCE)
                 print(f"已从报价追踪文件中删除 {removed_count} 条 '{item_name}' 记录")
             else:
                 print(f"报价追踪文件中未找到物品 '{item_name}' 的记录")
@@ -2011,7 +1899,12 @@ class AutoTradeMainWindow(QMainWindow):
             traceback.print_exc()
 
     def build_card_header(self, header_layout, item_data):
-        """构建卡片头部"""
+        """
+        构建卡片头部
+        
+        返回:
+            {'spread', 'profit', 'competition'} 头部数值标签，更新时原地修改
+        """
         # 物品名称（大标题）
         title_label = QLabel(item_data['item_name'])
         title_label.setStyleSheet("font-size: 18px; font-weight: bold; color: #333;")
@@ -2020,34 +1913,37 @@ class AutoTradeMainWindow(QMainWindow):
         header_layout.addStretch()
         
         # 右侧信息
-        latest_record = item_data['latest_record']
+        latest_record = item_data['latest_record'] or {}
         competition_stats = item_data.get('competition_stats', {})
         
-        if latest_record:
-            # 溢价信息
-            spread_color = self.get_trend_color(competition_stats.get('spread_trend', 'stable'))
-            spread_label = QLabel(f"{latest_record['spread']}")
-            spread_label.setStyleSheet(f"color: {spread_color}; font-weight: bold; font-size: 14px;")
-            header_layout.addWidget(QLabel("溢价:"))
-            header_layout.addWidget(spread_label)
-            
-            # 利润率信息
-            profit_color = self.get_trend_color(competition_stats.get('profit_trend', 'stable'))
-            profit_label = QLabel(f"{latest_record['profit_rate']}")
-            profit_label.setStyleSheet(f"color: {profit_color}; font-weight: bold; font-size: 14px;")
-            header_layout.addWidget(QLabel("利润率:"))
-            header_layout.addWidget(profit_label)
-            
-            # 被竞价次数（使用总竞价数）
-            total_competition = competition_stats.get('total_competitions', 0)
-            competition_label = QLabel(f"{total_competition}")
-            competition_label.setStyleSheet("color: #e74c3c; font-weight: bold; font-size: 14px;")
-            header_layout.addWidget(QLabel("被竞价:"))
-            header_layout.addWidget(competition_label)
+        # 溢价信息
+        spread_color = self.get_trend_color(competition_stats.get('spread_trend', 'stable'))
+        spread_label = QLabel(f"{latest_record.get('spread', '')}")
+        spread_label.setStyleSheet(f"color: {spread_color}; font-weight: bold; font-size: 14px;")
+        header_layout.addWidget(QLabel("溢价:"))
+        header_layout.addWidget(spread_label)
+        
+        # 利润率信息
+        profit_color = self.get_trend_color(competition_stats.get('profit_trend', 'stable'))
+        profit_label = QLabel(f"{latest_record.get('profit_rate', '')}")
+        profit_label.setStyleSheet(f"color: {profit_color}; font-weight: bold; font-size: 14px;")
+        header_layout.addWidget(QLabel("利润率:"))
+        header_layout.addWidget(profit_label)
+        
+        # 被竞价次数（使用总竞价数）
+        total_competition = competition_stats.get('total_competitions', 0)
+        competition_label = QLabel(f"{total_competition}")
+        competition_label.setStyleSheet("color: #e74c3c; font-weight: bold; font-size: 14px;")
+        header_layout.addWidget(QLabel("被竞价:"))
+        header_layout.addWidget(competition_label)
+        
+        return {'spread': spread_label, 'profit': profit_label, 'competition': competition_label}
 
     def build_detail_content(self, detail_layout, item_data):
-        """构建详细信息内容"""
+        """构建详细信息内容：表头和最近的CARD_HISTORY_ROWS条记录，更早的记录点击按钮后按页加载"""
         records = item_data['all_records']
+        state = self.card_states[item_data['item_name']]
+        state['detail_built'] = True
         
         if not records:
             detail_layout.addWidget(QLabel("暂无数据"))
@@ -2073,10 +1969,48 @@ class AutoTradeMainWindow(QMainWindow):
         
         detail_layout.addWidget(header_widget)
         
-        # 创建数据行
-        for row_idx, record in enumerate(records):
-            row_widget = self.create_data_row(record, records[row_idx-1] if row_idx > 0 else None, widths)
+        # 加载更早记录的按钮
+        more_btn = QPushButton()
+        more_btn.setStyleSheet("color: #007acc; border: none; padding: 3px;")
+        more_btn.clicked.connect(lambda: self.load_earlier_rows(item_data['item_name']))
+        detail_layout.addWidget(more_btn)
+        
+        # 只创建最近的数据行
+        start = max(0, len(records) - state['row_limit'])
+        state.update({'widths': widths, 'more_btn': more_btn, 'rendered_start': start, 'rendered_end': len(records),
+                      'last_rendered_timestamp': records[-1]['timestamp'], 'row_widgets': []})
+        for row_idx in range(start, len(records)):
+            row_widget = self.create_data_row(records[row_idx], records[row_idx-1] if row_idx > 0 else None, widths)
             detail_layout.addWidget(row_widget)
+            state['row_widgets'].append(row_widget)
+        self.update_more_button(state)
+
+    def update_more_button(self, state):
+        """更新“显示更早的记录”按钮"""
+        more_btn = state.get('more_btn')
+        if more_btn is None:
+            return
+        hidden_count = state['rendered_start']
+        more_btn.setText(f"显示更早的记录（还有 {hidden_count} 条）")
+        more_btn.setVisible(hidden_count > 0)
+
+    def load_earlier_rows(self, item_name):
+        """在卡片详情顶部加载前一页历史记录"""
+        state = self.card_states.get(item_name)
+        if not state or not state.get('detail_built') or state['rendered_start'] <= 0:
+            return
+        records = state['item_data']['all_records']
+        start = max(0, state['rendered_start'] - CARD_HISTORY_ROWS)
+        insert_at = state['detail_layout'].indexOf(state['more_btn']) + 1
+        new_rows = []
+        for row_idx in range(start, state['rendered_start']):
+            row_widget = self.create_data_row(records[row_idx], records[row_idx-1] if row_idx > 0 else None, state['widths'])
+            state['detail_layout'].insertWidget(insert_at + len(new_rows), row_widget)
+            new_rows.append(row_widget)
+        state['row_widgets'] = new_rows + state['row_widgets']
+        state['row_limit'] += len(new_rows)
+        state['rendered_start'] = start
+        self.update_more_button(state)
 
     def create_data_row(self, record, previous_record, widths):
         """创建数据行"""
@@ -2276,18 +2210,22 @@ class AutoTradeMainWindow(QMainWindow):
             return ""
 
     def toggle_card_detail(self, item_name, detail_widget, toggle_btn):
-        """切换卡片详细信息显示状态"""
+        """切换卡片详细信息显示状态，第一次展开时才构建详细记录"""
         if item_name in self.card_states:
-            current_state = self.card_states[item_name]['expanded']
-            new_state = not current_state
-            self.card_states[item_name]['expanded'] = new_state
+            state = self.card_states[item_name]
+            new_state = not state['expanded']
+            state['expanded'] = new_state
             
             if new_state:
+                if not state.get('detail_built'):
+                    self.build_detail_content(state['detail_layout'], state['item_data'])
                 detail_widget.show()
                 toggle_btn.setText("收起详情")
             else:
                 detail_widget.hide()
                 toggle_btn.setText("展开详情")
+            # 卡片高度变化后，其他卡片可能进入可视区域
+            self.schedule_card_materialize()
 
     def toggle_auto_collection(self):
         """切换自动化采集状态"""
@@ -21,13 +21,22 @@ except ImportError as e:
 import sys
 import os
 import glob
+import cv2
+import numpy as np
 import pandas as pd
 from datetime import datetime
 import re
 import time
 import RaphaelScriptHelper as rsh
+import TemplateCache
+import OcrEngine
+import RecognitionPool
+import ItemAttributes
+import PriceStore
+import EventBus
 import argparse
 import concurrent.futures
+import threading
 from templates.modern_warship.category_mapping import CATEGORY_DICT, ITEM_DICT, get_category_name, get_item_name
 import json
 import csv
@@ -64,6 +73,7 @@ TEMPLATE_DIR = mwm.TEMPLATE_DIR
 DEFAULT_DELAY = mwm.DEFAULT_DELAY
 SCREENSHOT_DELAY = mwm.SCREENSHOT_DELAY
 SCREENSHOT_DIR = "./cache/market_screenshots/"  # 截图保存目录
+SAVE_SCREENSHOTS = False  # 是否把详情页截图保存为PNG；关闭时内存中的截图直接交给识别（多进程后端经共享内存传递）
 
 # 特定坐标点
 MARKET_ENTRY_POINT = ((203, 362))  # 进入报价界面的坐标
@@ -71,13 +81,30 @@ BUY_ICON_POINT = (330, 143)      # 购买图标的坐标
 
 # 价格识别相关设置
 MAX_RECOGNITION_WORKERS = 4  # 最大同时运行的价格识别线程数
+RECOGNITION_BACKEND = "thread"  # 价格识别后端："thread" 在线程中识别，"process" 在多个识别进程中识别
+RECOGNITION_PROCESSES = RecognitionPool.RECOGNITION_PROCESSES  # 多进程后端的识别进程数
+
+# 画面指纹相关设置：物品详情页的价格面板与上一轮完全相同时跳过识别和保存
+FRAME_FINGERPRINT_SKIP = True  # 是否启用画面指纹比较
+PRICE_PANEL_REGION = (0, 180, 2340, 1080)  # 价格面板区域 (x1, y1, x2, y2)，包含稀有度、出价/上架数量、价格列和编辑按钮
+FINGERPRINT_SCALE = 4  # 指纹降采样倍数（按区域平均，单个数字的变化仍能保留下来）
+FINGERPRINT_PIXEL_DIFF = 24  # 降采样后任一像素灰度差超过该值即视为画面有变化
 
 # 创建线程池
 price_executor = None
+recognition_pool = None  # 多进程识别后端，追踪开始时初始化
 
 # GUI控制变量
 is_tracking_active = False
 tracking_gui_callback = None
+tracking_event_bus = None  # GUI模式下的事件总线，tracking_gui_callback为其publish方法
+
+# 每个物品上一次成功识别时的价格面板指纹 {物品名称: 指纹}
+panel_fingerprints = {}
+
+# 报价追踪文件中每个物品的最新记录 {物品名称: (时间戳, 去重关键字段)}，追踪开始时加载
+latest_records = None
+latest_records_lock = threading.Lock()
 
 # 确保截图目录存在
 if not os.path.exists(SCREENSHOT_DIR):
@@ -270,12 +297,49 @@ def find_and_click_item(item_name, item_category):
         print(f"跳过物品 '{item_name}'，继续处理下一个")
         return False
 
-def take_stable_screenshot(filename_prefix):
+def panel_fingerprint(screen):
+    """
+    计算价格面板的画面指纹：灰度图按区域平均降采样
+
+    参数:
+        screen: BGR截图
+
+    返回:
+        uint8灰度小图，截图为空时返回None
+    """
+    if screen is None:
+        return None
+    x1, y1, x2, y2 = PRICE_PANEL_REGION
+    panel = screen[y1:y2, x1:x2]
+    if panel.size == 0:
+        return None
+    gray = cv2.cvtColor(panel, cv2.COLOR_BGR2GRAY)
+    size = (max(1, gray.shape[1] // FINGERPRINT_SCALE), max(1, gray.shape[0] // FINGERPRINT_SCALE))
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+def is_panel_unchanged(item_name, fingerprint):
+    """
+    判断物品的价格面板与上一次成功识别时是否相同
+
+    参数:
+        item_name: 物品名称
+        fingerprint: panel_fingerprint返回的指纹
+
+    返回:
+        True表示画面没有变化，可以跳过识别
+    """
+    previous = panel_fingerprints.get(item_name)
+    if previous is None or fingerprint is None or previous.shape != fingerprint.shape:
+        return False
+    return int(cv2.absdiff(previous, fingerprint).max()) <= FINGERPRINT_PIXEL_DIFF
+
+def take_stable_screenshot(filename_prefix, screen=None):
     """
     获取稳定的屏幕截图（确保没有loading图标）
     
     参数:
         filename_prefix: 文件名前缀
+        screen: 可选，已经获取到的截图，提供时第一次尝试直接保存该截图
     
     返回:
         稳定截图的路径或None
@@ -291,12 +355,19 @@ def take_stable_screenshot(filename_prefix):
             # 获取截图
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
             screenshot_path = f"{SCREENSHOT_DIR}{filename_prefix}_{timestamp}.png"
-            rsh.ADBHelper.screenCapture(rsh.deviceID, screenshot_path)
+            if screen is None:
+                screen = rsh.ADBHelper.screenCaptureArray(rsh.deviceID)
+            if screen is not None:
+                # 内存截图成功，直接写出，省去设备端存储和adb pull
+                cv2.imwrite(screenshot_path, screen)
+            else:
+                rsh.ADBHelper.screenCapture(rsh.deviceID, screenshot_path)
             
             # 检查是否有loading图标（简化版检查）
             if os.path.exists(screenshot_path):
                 print(f"获取到截图: {screenshot_path}")
                 return screenshot_path
+            screen = None
             
             print(f"截图失败，将重试...")
             # 额外等待一段时间再尝试
@@ -309,13 +380,30 @@ def take_stable_screenshot(filename_prefix):
         return None
 
 # 修改process_price_recognition函数
-def process_price_recognition(screenshot_path, item_name, item_category, detect_own_prices=False):
-    """处理价格识别"""
+def process_price_recognition(screenshot, item_name, item_category, detect_own_prices=False, fingerprint=None, image_name=None):
+    """
+    处理价格识别，识别出购买价格时记录该截图的价格面板指纹，供下一轮比较
+    screenshot可以是截图路径或内存中的BGR截图，image_name为保存调试图像时使用的截图名称
+    """
     try:
         # 调用价格识别，根据参数决定是否启用本人价格检测，禁用自动保存避免重复保存
-        price_img_paths, markup_img_path, price_data = mpr.process_screenshot(
-            screenshot_path, item_name, item_category, detect_own_prices, auto_save=False
-        )
+        # 截图只解码一次，识别在内存中完成，调试图像仅在mpr.KEEP_DEBUG_IMAGES开启时保存
+        if isinstance(screenshot, np.ndarray):
+            img = screenshot
+        else:
+            img = cv2.imread(screenshot)
+            image_name = image_name or screenshot
+        if img is None:
+            print(f"无法读取截图: {screenshot}")
+            return [], None, {}
+        screenshot_path = image_name or "frame.png"
+        if recognition_pool is not None:
+            result = recognition_pool.recognize(img, item_name, item_category, detect_own_prices,
+                                                keep_images=mpr.KEEP_DEBUG_IMAGES, image_name=screenshot_path)
+        else:
+            result = mpr.process_frame(img, item_name, item_category, detect_own_prices, auto_save=False,
+                                       image_name=screenshot_path)
+        price_img_paths, markup_img_path, price_data = result['price_img_paths'], result['markup_img_path'], result['price_data']
         
         # 如果是BidTracker调用且检测到数据，进行自定义溢价计算
         if detect_own_prices and price_data:
@@ -329,6 +417,10 @@ def process_price_recognition(screenshot_path, item_name, item_category, detect_
             # 保存到报价追踪文件
             save_bid_tracker_data(item_name, item_category, price_data)
         
+        # 只有识别出有效数据时才记录指纹，识别失败的画面下一轮仍会重新识别
+        if fingerprint is not None and any('buying' in key and value for key, value in price_data.items()):
+            panel_fingerprints[item_name] = fingerprint
+        
         return price_img_paths, markup_img_path, price_data
     except Exception as e:
         print("价格识别出错: %s" % str(e))
@@ -473,6 +565,61 @@ def get_purchase_price_from_selling_list(item_name, item_category):
         print(f"获取进货价时出错: {str(e)}")
         return None
 
+def normalize_number_str(s):
+    """标准化数字字符串，去掉不必要的.0（CSV中的数字可能被pandas写成浮点数）"""
+    s = str(s).strip()
+    if s and s.lower() != 'nan':
+        try:
+            num = float(s)
+            if num == int(num):
+                return str(int(num))
+            return str(num)
+        except:
+            pass
+    return '' if s.lower() == 'nan' else s
+
+def tracker_record_key(buying_price_str, selling_price_str, own_buying_price, own_selling_price, bid_count, listing_count):
+    """去重比较用的关键字段：购买/出售价格、本人价格、出价/上架数量"""
+    return (str(buying_price_str).strip(), str(selling_price_str).strip(),
+            normalize_number_str(own_buying_price or ''), normalize_number_str(own_selling_price or ''),
+            normalize_number_str(bid_count), normalize_number_str(listing_count))
+
+def load_latest_records():
+    """
+    从报价追踪文件读取每个物品的最新记录，建立去重用的内存索引（追踪开始时读取一次，之后随写入更新）
+    """
+    global latest_records
+    records = {}
+    if os.path.exists(BID_TRACKER_FILE):
+        try:
+            with open(BID_TRACKER_FILE, 'r', newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    item_name = row.get('物品名称')
+                    timestamp = row.get('时间戳') or ''
+                    if not item_name:
+                        continue
+                    latest = records.get(item_name)
+                    # 时间戳格式为 %Y-%m-%d %H:%M:%S，按字符串比较即按时间比较；时间相同时后写入的为准
+                    if latest is None or timestamp >= latest[0]:
+                        records[item_name] = (timestamp, tracker_record_key(
+                            row.get('购买价格', ''), row.get('出售价格', ''), row.get('本人购买价格', ''),
+                            row.get('本人售出价格', ''), row.get('出价数量', ''), row.get('上架数量', '')))
+        except Exception as e:
+            print(f"读取报价追踪文件时出错: {str(e)}")
+    latest_records = records
+    print(f"已加载 {len(records)} 个物品的最新报价记录")
+
+def forget_latest_record(item_name):
+    """
+    从去重索引中删除物品的最新记录（物品的记录被从报价追踪文件中删除后调用），下一次识别结果一定会写入
+
+    参数:
+        item_name: 物品名称
+    """
+    with latest_records_lock:
+        if latest_records is not None:
+            latest_records.pop(item_name, None)
+
 def save_bid_tracker_data(item_name, category_name, price_data):
     """
     保存数据到报价追踪文件（自定义格式）
@@ -536,113 +683,63 @@ def save_bid_tracker_data(item_name, category_name, price_data):
         spread = price_data.get('低买低卖溢价', 'N/A')
         profit_rate = price_data.get('利润率', '')
         
-        # 检查是否需要写入（去重逻辑）
-        if os.path.exists(BID_TRACKER_FILE):
-            # 读取现有数据
-            existing_df = pd.read_csv(BID_TRACKER_FILE)
+        # 检查是否需要写入（去重逻辑）：与内存中该物品的最新记录比较，不读取文件
+        record_key = tracker_record_key(buying_price_str, selling_price_str, own_buying_price,
+                                        own_selling_price, bid_count, listing_count)
+        with latest_records_lock:
+            if latest_records is None:
+                load_latest_records()
+            latest = latest_records.get(item_name)
+            if latest is not None and latest[1] == record_key:
+                print(f"[去重] 物品 '{item_name}' 的数据与最新记录（{latest[0]}）完全相同，跳过写入")
+                # 如果有GUI回调，通知数据未变化
+                if tracking_gui_callback:
+                    tracking_gui_callback('data_unchanged', {
+                        'item_name': item_name,
+                        'category': category_name,
+                        'reason': '数据无变化'
+                    })
+                return False
+            if latest is not None:
+                print(f"[去重] 物品 '{item_name}' 的数据有变化，将写入新记录")
             
-            # 查找该物品的最新记录
-            item_records = existing_df[existing_df['物品名称'] == item_name]
-            if not item_records.empty:
-                # 按时间戳排序，获取最新记录
-                item_records_sorted = item_records.sort_values('时间戳')
-                latest_record = item_records_sorted.iloc[-1]
-                
-                # 获取最新记录的各字段值，处理NaN值
-                latest_buying = str(latest_record.get('购买价格', '')) if pd.notna(latest_record.get('购买价格')) else ''
-                latest_selling = str(latest_record.get('出售价格', '')) if pd.notna(latest_record.get('出售价格')) else ''
-                latest_own_buying = str(latest_record.get('本人购买价格', '')) if pd.notna(latest_record.get('本人购买价格')) else ''
-                latest_own_selling = str(latest_record.get('本人售出价格', '')) if pd.notna(latest_record.get('本人售出价格')) else ''
-                latest_bid_count = str(latest_record.get('出价数量', '')) if pd.notna(latest_record.get('出价数量')) else ''
-                latest_listing_count = str(latest_record.get('上架数量', '')) if pd.notna(latest_record.get('上架数量')) else ''
-                
-                # 当前要写入的数据
-                current_own_buying = own_buying_price if own_buying_price else ''
-                current_own_selling = own_selling_price if own_selling_price else ''
-                
-                # 标准化数字字符串的比较函数（处理浮点数.0问题）
-                def normalize_number_str(s):
-                    """标准化数字字符串，去掉不必要的.0"""
-                    s = str(s).strip()
-                    if s and s != '':
-                        try:
-                            # 尝试转换为浮点数再转回字符串，去掉.0
-                            num = float(s)
-                            if num == int(num):
-                                return str(int(num))
-                            else:
-                                return str(num)
-                        except:
-                            pass
-                    return s
-                
-                # 标准化比较字段
-                latest_own_buying_norm = normalize_number_str(latest_own_buying)
-                current_own_buying_norm = normalize_number_str(current_own_buying)
-                latest_own_selling_norm = normalize_number_str(latest_own_selling)
-                current_own_selling_norm = normalize_number_str(current_own_selling)
+            # 检查CSV文件是否存在，不存在则创建并写入表头
+            file_exists = os.path.exists(BID_TRACKER_FILE)
+            
+            with open(BID_TRACKER_FILE, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
                 
-                print(f"[去重检查] {item_name}")
-                print(f"  最新记录购买价格: '{latest_buying}' vs 当前: '{buying_price_str}'")
-                print(f"  最新记录出售价格: '{latest_selling}' vs 当前: '{selling_price_str}'")
-                print(f"  最新记录本人购买: '{latest_own_buying}' -> '{latest_own_buying_norm}' vs 当前: '{current_own_buying}' -> '{current_own_buying_norm}'")
-                print(f"  最新记录本人出售: '{latest_own_selling}' -> '{latest_own_selling_norm}' vs 当前: '{current_own_selling}' -> '{current_own_selling_norm}'")
-                print(f"  最新记录出价数量: '{latest_bid_count}' vs 当前: '{bid_count}'")
-                print(f"  最新记录上架数量: '{latest_listing_count}' vs 当前: '{listing_count}'")
+                # 写入表头（如果文件不存在）
+                if not file_exists:
+                    writer.writerow(['物品名称', '物品分类', '购买价格', '出售价格', '本人购买价格', '本人售出价格', '低买低卖溢价', '利润率', '时间戳', '出价数量', '上架数量', '稀有度'])
                 
-                # 比较关键数据是否完全相同（使用标准化后的数字）
-                data_identical = (
-                    latest_buying == buying_price_str and
-                    latest_selling == selling_price_str and
-                    latest_own_buying_norm == current_own_buying_norm and
-                    latest_own_selling_norm == current_own_selling_norm and
-                    latest_bid_count == str(bid_count) and
-                    latest_listing_count == str(listing_count)
-                )
+                # 获取当前时间
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                 
-                if data_identical:
-                    print(f"[去重] 物品 '{item_name}' 的数据与最新记录完全相同，跳过写入")
-                    # 如果有GUI回调，通知数据未变化
-                    if tracking_gui_callback:
-                        tracking_gui_callback('data_unchanged', {
-                            'item_name': item_name,
-                            'category': category_name,
-                            'reason': '数据无变化'
-                        })
-                    return False
-                else:
-                    print(f"[去重] 物品 '{item_name}' 的数据有变化，将写入新记录")
-        
-        # 检查CSV文件是否存在，不存在则创建并写入表头
-        file_exists = os.path.exists(BID_TRACKER_FILE)
-        
-        with open(BID_TRACKER_FILE, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            
-            # 写入表头（如果文件不存在）
-            if not file_exists:
-                writer.writerow(['物品名称', '物品分类', '购买价格', '出售价格', '本人购买价格', '本人售出价格', '低买低卖溢价', '利润率', '时间戳', '出价数量', '上架数量', '稀有度'])
-            
-            # 获取当前时间
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                # 写入数据行
+                writer.writerow([
+                    item_name, 
+                    category_name, 
+                    buying_price_str, 
+                    selling_price_str,
+                    own_buying_price if own_buying_price else '',
+                    own_selling_price if own_selling_price else '',
+                    spread,
+                    profit_rate,  # 添加利润率列
+                    timestamp,
+                    bid_count,
+                    listing_count,
+                    rarity
+                ])
             
-            # 写入数据行
-            writer.writerow([
-                item_name, 
-                category_name, 
-                buying_price_str, 
-                selling_price_str,
-                own_buying_price if own_buying_price else '',
-                own_selling_price if own_selling_price else '',
-                spread,
-                profit_rate,  # 添加利润率列
-                timestamp,
-                bid_count,
-                listing_count,
-                rarity
-            ])
+            latest_records[item_name] = (timestamp, record_key)
         
         print(f"价格数据已保存到报价追踪文件: {BID_TRACKER_FILE}")
+        PriceStore.record(PriceStore.TRACKER_SOURCE, item_name, category_name, buying_prices, selling_prices,
+                          own_buying=own_buying_price, own_selling=own_selling_price, spread=spread,
+                          profit_rate=profit_rate, bid_count=bid_count, listing_count=listing_count,
+                          rarity=rarity, timestamp=timestamp)
+        ItemAttributes.update(item_name, category_name, rarity=rarity)
         
         # 如果有GUI回调，通知数据已更新
         if tracking_gui_callback:
@@ -659,10 +756,10 @@ def save_bid_tracker_data(item_name, category_name, price_data):
 
 def process_tracked_items_gui_loop():
     """GUI控制的循环追踪模式 - 直接遍历物品，不需要打开界面"""
-    global price_executor, is_tracking_active
+    global price_executor, recognition_pool, is_tracking_active
     
-    # 初始化价格识别线程池
-    price_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_RECOGNITION_WORKERS)
+    # 预加载所有模板图片，之后的匹配不再读取磁盘
+    TemplateCache.preload()
     
     # 从JSON购物清单加载正在购买的物品
     shopping_items = get_items_from_shopping_list()
@@ -675,6 +772,16 @@ def process_tracked_items_gui_loop():
             })
         return
     
+    # 初始化价格识别线程池（多进程后端下线程只负责把截图交给识别进程并保存结果）
+    recognition_threads = MAX_RECOGNITION_WORKERS
+    if RECOGNITION_BACKEND == "process":
+        recognition_pool = RecognitionPool.RecognitionPool(RECOGNITION_PROCESSES, settings={
+            'OUTPUT_DIR': mpr.OUTPUT_DIR,
+            'USE_GLYPH_OCR': mpr.USE_GLYPH_OCR,
+        })
+        recognition_threads = recognition_pool.processes
+    price_executor = concurrent.futures.ThreadPoolExecutor(max_workers=recognition_threads)
+    
     print(f"开始GUI循环追踪模式，共 {len(shopping_items)} 个物品")
     
     # 通知GUI开始追踪
@@ -687,6 +794,9 @@ def process_tracked_items_gui_loop():
     # 设置追踪状态为活跃
     is_tracking_active = True
     cycle_count = 0
+    panel_fingerprints.clear()
+    with latest_records_lock:
+        load_latest_records()
     
     # 循环追踪
     while is_tracking_active:
@@ -724,47 +834,64 @@ def process_tracked_items_gui_loop():
             
             # 查找并点击物品
             if find_and_click_item(item_name, item_category):
-                # 点击后等待充分的时间以确保界面已切换
+                # 点击后等待界面切换完成：画面静止且loading消失（关闭自适应等待时固定等待2秒+SCREENSHOT_DELAY）
                 print("等待界面加载...")
-                time.sleep(2.0)  # 等待2秒确保界面完全加载
-                                            
-                # 额外等待界面完全稳定
-                print(f"等待界面完全稳定 {SCREENSHOT_DELAY} 秒...")
-                time.sleep(SCREENSHOT_DELAY)
+                raw = mwm.wait_for_screen(2.0 + SCREENSHOT_DELAY, mwm.check_loading_indicator)
+                
+                # 等待时拿到的最后一帧就是稳定画面，直接用于比较指纹和保存
+                screen = rsh.ADBHelper.decodeRawScreenCap(raw) if raw is not None else None
+                if screen is None and (FRAME_FINGERPRINT_SKIP or not SAVE_SCREENSHOTS):
+                    screen = rsh.ADBHelper.screenCaptureArray(rsh.deviceID)
+                fingerprint = panel_fingerprint(screen) if FRAME_FINGERPRINT_SKIP else None
                 
                 # 获取物品的英文键名用于截图命名
                 item_key = get_item_key_from_name(item_name)
                 if not item_key:
                     item_key = "unknown_item"  # 如果找不到键名，使用默认名称
                 
-                # 使用take_stable_screenshot获取截图，学习ModernWarshipMarket.py的命名方式
-                screenshot_path = take_stable_screenshot(f"bid_item_detail_{item_key}")
-                
-                if screenshot_path:
-                    print(f"已保存物品详情页截图: {screenshot_path}")
-                    
-                    # 启动价格识别，启用本人价格检测
+                if is_panel_unchanged(item_name, fingerprint):
+                    # 价格面板与上一次识别时完全相同，跳过截图保存、识别和写入
+                    print(f"[画面未变化] 物品 '{item_name}' 的价格面板与上一轮相同，跳过识别")
+                    if tracking_gui_callback:
+                        tracking_gui_callback('data_unchanged', {
+                            'item_name': item_name,
+                            'category': item_category,
+                            'reason': '画面无变化'
+                        })
+                elif screen is not None and not SAVE_SCREENSHOTS:
+                    # 截图已在内存中，直接交给识别，不写PNG
+                    screenshot_path = f"{SCREENSHOT_DIR}bid_item_detail_{item_key}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.png"
                     if price_executor is not None:
                         print(f"提交价格识别任务: {item_name}")
-                        price_executor.submit(
-                            process_price_recognition, 
-                            screenshot_path, 
-                            item_name, 
-                            item_category,
-                            True  # 启用本人价格检测
-                        )
+                        price_executor.submit(process_price_recognition, screen, item_name, item_category,
+                                              True, fingerprint, screenshot_path)
                 else:
-                    print("无法获取物品详情页截图")
+                    # 使用take_stable_screenshot获取截图，学习ModernWarshipMarket.py的命名方式
+                    screenshot_path = take_stable_screenshot(f"bid_item_detail_{item_key}", screen)
+                    if screenshot_path:
+                        print(f"已保存物品详情页截图: {screenshot_path}")
+                        
+                        # 启动价格识别，启用本人价格检测
+                        if price_executor is not None:
+                            print(f"提交价格识别任务: {item_name}")
+                            price_executor.submit(
+                                process_price_recognition, 
+                                screenshot_path, 
+                                item_name, 
+                                item_category,
+                                True,  # 启用本人价格检测
+                                fingerprint
+                            )
+                    else:
+                        print("无法获取物品详情页截图")
                 
                 # 执行第一次返回
                 print("执行第一次返回操作")
-                mwm.go_back()
-                time.sleep(1.5)  # 等待1.5秒
+                mwm.go_back(1.5)  # 等待画面稳定（关闭自适应等待时固定等待1.5秒）
                 
                 # 执行第二次返回
                 print("执行第二次返回操作")
-                mwm.go_back()
-                time.sleep(1.5)  # 再等待1.5秒确保返回到列表界面
+                mwm.go_back(1.5)  # 确保返回到列表界面
                 
                 print(f"已完成物品 '{item_name}' 的处理")
             else:
@@ -777,6 +904,7 @@ def process_tracked_items_gui_loop():
         
         # 完成一轮追踪
         print(f"======== 完成第 {cycle_count} 轮追踪 ========")
+        print(OcrEngine.memo_summary())
         
         # 通知GUI一轮完成
         if tracking_gui_callback:
@@ -801,6 +929,9 @@ def process_tracked_items_gui_loop():
         print("等待所有价格识别任务完成...")
         price_executor.shutdown(wait=True)
         print("所有价格识别任务已完成")
+    if recognition_pool is not None:
+        recognition_pool.close()
+        recognition_pool = None
     
     # 通知GUI追踪结束
     if tracking_gui_callback:
@@ -812,18 +943,37 @@ def process_tracked_items_gui_loop():
     print("GUI循环追踪模式已结束")
 
 def start_gui_tracking(gui_callback=None):
-    """启动GUI控制的追踪模式"""
-    global tracking_gui_callback
-    tracking_gui_callback = gui_callback
+    """
+    启动GUI控制的追踪模式
+    
+    参数:
+        gui_callback: GUI回调 gui_callback(事件类型, 数据)，经事件总线在单独的线程中调用，
+                      高频事件按EventBus.COALESCE_TOPICS合并后交付
+    """
+    global tracking_gui_callback, tracking_event_bus
+    if tracking_event_bus is not None:
+        tracking_event_bus.close()
+    tracking_event_bus = EventBus.EventBus(gui_callback) if gui_callback else None
+    tracking_gui_callback = tracking_event_bus.publish if tracking_event_bus else None
     
     # 在新线程中启动追踪，避免阻塞GUI
-    import threading
-    tracking_thread = threading.Thread(target=process_tracked_items_gui_loop, daemon=True)
+    tracking_thread = threading.Thread(target=_run_gui_tracking, args=(tracking_event_bus,), daemon=True)
     tracking_thread.start()
     return tracking_thread
 
+def _run_gui_tracking(event_bus):
+    """追踪线程：执行追踪循环，结束后（tracking_stopped已发布）交付剩余事件并关闭本次追踪的事件总线"""
+    global tracking_gui_callback, tracking_event_bus
+    try:
+        process_tracked_items_gui_loop()
+    finally:
+        if event_bus is not None:
+            event_bus.close()
+            if tracking_event_bus is event_bus:
+                tracking_event_bus = tracking_gui_callback = None
+
 def stop_gui_tracking():
-    """停止GUI控制的追踪模式"""
+    """停止GUI控制的追踪模式（不阻塞），追踪线程发布tracking_stopped后关闭事件总线"""
     global is_tracking_active
     is_tracking_active = False
     print("正在停止追踪...")
@@ -0,0 +1,116 @@
+"""
+追踪事件总线
+
+报价追踪线程和识别线程通过publish发布事件，publish只把事件放入队列，不会阻塞发布方。
+事件由总线线程按顺序交给处理函数（GUI回调），其中高频事件按类型合并：
+在合并时间窗口内同一类型的多个事件只交付一次，例如一批识别结果只触发一次界面刷新。
+非合并事件交付前会先交付已经排队的合并事件，保证事件的先后顺序不乱。
+"""
+
+import time
+import queue
+import threading
+
+# 事件类型
+TOPICS = ('tracking_started', 'cycle_started', 'processing_item', 'data_updated', 'data_unchanged',
+          'data_invalid', 'item_not_found', 'cycle_completed', 'tracking_stopped', 'error')
+
+# 合并交付的事件 {事件类型: (合并时间窗口(秒), 合并方式)}
+# "latest": 只交付窗口内最后一个事件的数据
+# "batch": 交付 {'events': [每个事件的数据], 'items': [涉及的物品名称], 'count': 事件数}
+COALESCE_TOPICS = {
+    'processing_item': (0.2, 'latest'),
+    'data_updated': (0.5, 'batch'),
+    'data_unchanged': (0.5, 'batch'),
+}
+
+class TrackerEvent:
+    """
+    追踪事件
+
+    参数:
+        topic: 事件类型，必须是TOPICS之一
+        data: 事件数据字典
+    """
+    __slots__ = ('topic', 'data', 'time')
+
+    def __init__(self, topic, data=None):
+        if topic not in TOPICS:
+            raise ValueError(f"未知的事件类型: {topic}")
+        self.topic = topic
+        self.data = data or {}
+        self.time = time.time()
+
+class EventBus:
+    """
+    事件总线
+
+    参数:
+        handler: 处理函数 handler(事件类型, 数据)，在总线线程中调用
+        coalesce: 合并设置，格式同COALESCE_TOPICS
+    """
+
+    def __init__(self, handler, coalesce=None):
+        self.handler = handler
+        self.coalesce = dict(COALESCE_TOPICS if coalesce is None else coalesce)
+        self.queue = queue.SimpleQueue()
+        self.pending = {}  # {事件类型: (交付时间, [事件])}
+        self.thread = threading.Thread(target=self._run, name="tracker-events", daemon=True)
+        self.thread.start()
+
+    def publish(self, topic, data=None):
+        """发布事件（不阻塞，可在任意线程中调用）"""
+        self.queue.put(TrackerEvent(topic, data))
+
+    __call__ = publish  # 可以直接作为回调函数使用
+
+    def close(self, timeout=2.0):
+        """交付所有排队的事件后停止总线线程"""
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _dispatch(self, topic, data):
+        try:
+            self.handler(topic, data)
+        except Exception as e:
+            print(f"处理追踪事件 {topic} 时出错: {str(e)}")
+
+    def _flush(self, topic):
+        """交付一个类型的合并事件"""
+        _, events = self.pending.pop(topic)
+        if self.coalesce[topic][1] == 'latest':
+            self._dispatch(topic, events[-1].data)
+            return
+        items = list(dict.fromkeys(e.data['item_name'] for e in events if 'item_name' in e.data))
+        self._dispatch(topic, {'events': [e.data for e in events], 'items': items, 'count': len(events)})
+
+    def _flush_due(self, now=None):
+        """按交付时间顺序交付到期的合并事件，now为None时交付全部"""
+        for topic, (due, _) in sorted(self.pending.items(), key=lambda entry: entry[1][0]):
+            if now is None or due <= now:
+                self._flush(topic)
+
+    def _run(self):
+        while True:
+            timeout = None
+            if self.pending:
+                timeout = max(0.0, min(due for due, _ in self.pending.values()) - time.time())
+            try:
+                event = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                event = False
+
+            if event is None:
+                self._flush_due()
+                return
+            if event:
+                if event.topic in self.coalesce:
+                    entry = self.pending.get(event.topic)
+                    if entry is None:
+                        self.pending[event.topic] = (event.time + self.coalesce[event.topic][0], [event])
+                    else:
+                        entry[1].append(event)
+                else:
+                    self._flush_due()
+                    self._dispatch(event.topic, event.data)
+            self._flush_due(time.time())
@@ -0,0 +1,117 @@
+"""
+共享内存截图环形缓冲区
+
+固定数量的槽位放在一块multiprocessing.shared_memory中，每个槽位保存一帧BGR截图。
+截图方把截图写入空闲槽位一次，识别进程按槽位号直接在共享内存上读取（不复制、不经过PNG编解码和磁盘）。
+每个槽位带有引用计数，所有读取方释放后槽位才会被复用；没有空闲槽位时写入方等待，
+因此无论识别落后导航多少，占用的内存都固定为 槽位数 × 每帧大小。
+"""
+
+import threading
+from multiprocessing import shared_memory
+import numpy as np
+
+RING_SLOTS = 8  # 默认槽位数
+FRAME_SLOT_BYTES = 2560 * 1440 * 3  # 默认每个槽位的字节数，足够容纳2560x1440的BGR截图
+
+class FrameRing:
+    """
+    截图环形缓冲区（创建方）
+
+    参数:
+        slots: 槽位数
+        slot_bytes: 每个槽位的字节数
+    """
+
+    def __init__(self, slots=RING_SLOTS, slot_bytes=FRAME_SLOT_BYTES):
+        self.slots = max(1, slots)
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=self.slots * self.slot_bytes)
+        self.name = self.shm.name
+        self.refs = [0] * self.slots
+        self.cursor = 0
+        self.cond = threading.Condition()
+
+    def fits(self, img):
+        """截图能否放入一个槽位"""
+        return img.nbytes <= self.slot_bytes
+
+    def publish(self, img, refs=1, timeout=None):
+        """
+        把截图写入下一个空闲槽位，没有空闲槽位时等待
+
+        参数:
+            img: BGR截图
+            refs: 读取方数量，每个读取方读取完毕后调用一次release
+            timeout: 最长等待时间(秒)，为None时一直等待
+
+        返回:
+            (槽位号, 形状, dtype字符串)，等待超时返回None
+        """
+        if not self.fits(img):
+            raise ValueError(f"截图大小 {img.nbytes} 超过槽位大小 {self.slot_bytes}")
+        with self.cond:
+            if not self.cond.wait_for(lambda: 0 in self.refs, timeout):
+                return None
+            # 从上次写入位置之后开始找空闲槽位，尽量按顺序轮流使用
+            slot = next(i % self.slots for i in range(self.cursor, self.cursor + self.slots) if self.refs[i % self.slots] == 0)
+            self.refs[slot] = refs
+            self.cursor = slot + 1
+        view = frame_view(self.shm, self.slot_bytes, slot, img.shape, img.dtype)
+        view[...] = img
+        del view
+        return slot, img.shape, img.dtype.str
+
+    def retain(self, slot):
+        """增加一个读取方"""
+        with self.cond:
+            self.refs[slot] += 1
+
+    def release(self, slot):
+        """读取方读取完毕，引用计数归零后槽位可以被复用"""
+        with self.cond:
+            self.refs[slot] = max(0, self.refs[slot] - 1)
+            if self.refs[slot] == 0:
+                self.cond.notify_all()
+
+    def view(self, slot, shape, dtype):
+        """在创建方进程中读取槽位中的截图（共享内存视图，不复制）"""
+        return frame_view(self.shm, self.slot_bytes, slot, shape, dtype)
+
+    def close(self):
+        """释放共享内存，调用前需要确保所有读取方已经结束"""
+        self.shm.close()
+        self.shm.unlink()
+
+def frame_view(shm, slot_bytes, slot, shape, dtype):
+    """
+    返回共享内存中某个槽位上的截图视图
+
+    参数:
+        shm: SharedMemory对象
+        slot_bytes: 每个槽位的字节数
+        slot: 槽位号
+        shape: 截图形状
+        dtype: 截图数据类型
+
+    返回:
+        numpy数组视图，不复制数据；使用完毕后需要删除引用，否则共享内存无法关闭
+    """
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=slot * slot_bytes)
+
+_attached = {}  # 读取方进程中已打开的环形缓冲区 {共享内存名称: SharedMemory}
+
+def attach(name):
+    """
+    在读取方进程中打开环形缓冲区，同一个缓冲区只打开一次
+
+    参数:
+        name: FrameRing.name
+
+    返回:
+        SharedMemory对象
+    """
+    shm = _attached.get(name)
+    if shm is None:
+        shm = _attached[name] = shared_memory.SharedMemory(name=name)
+    return shm
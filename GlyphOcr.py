@@ -0,0 +1,312 @@
+"""
+游戏字体数字识别（价格OCR的快速通道）
+
+价格、出价数量和上架数量都以固定的游戏字体显示在固定的背景上。
+这里把区域图像二值化后按列投影切分出单个字符，缩放到固定尺寸后与字形库中的样本做最近邻匹配，
+每个区域只需要几十微秒到几百微秒。
+
+字形库不需要手工标注：CnOcr识别过的区域只要置信度足够、文本是合法的数字格式，
+并且切分出的字符数与识别出的数字个数一致，就会自动加入字形库；
+也可以用 python GlyphOcr.py --train ./market_data/price_images/ 从已有的价格区域图像批量生成。
+字形库中0-9每个数字都有足够的样本之前recognize返回的置信度为0，匹配置信度不足时同样为0，
+由调用方退回到CnOcr。
+"""
+
+import os
+import re
+import sys
+import glob
+import atexit
+import argparse
+import threading
+import numpy as np
+import cv2
+
+GLYPH_BANK_FILE = "./cache/digit_glyphs.npz"  # 字形库文件（运行时学习生成，与OCR缓存放在一起，不放在模板目录）
+GLYPH_SIZE = (10, 16)  # 字符归一化尺寸 (宽, 高)
+MIN_SIMILARITY = 0.85  # 每个字符与最佳样本的最低相似度
+MIN_MARGIN = 0.04  # 最佳数字与次佳数字相似度的最小差距
+MAX_SAMPLES_PER_DIGIT = 40  # 每个数字最多保存的样本数
+MIN_SAMPLES_PER_DIGIT = 2  # 0-9每个数字至少有该数量的样本后才使用字形库识别
+LEARN_MIN_SCORE = 0.9  # CnOcr识别置信度不低于该值的结果才加入字形库
+LEARN_TEXT_PATTERN = re.compile(r"^(\d+|\d{1,3}(,\d{3})+)$")  # 可以加入字形库的文本格式（纯数字或千分位分隔的数字）
+COMMA_HEIGHT_RATIO = 0.55  # 高度低于最高字符该比例、且位于基线附近的字符视为逗号/小数点
+MIN_GLYPH_PIXELS = 3  # 少于该像素数的连通区域视为噪点
+
+_vectors = None  # 字形库样本矩阵 (N, 宽*高)，每行为零均值单位长度向量
+_labels = None   # 样本对应的数字字符数组
+_unsaved = []  # 本进程加载或上次保存后新加入的样本 [(向量矩阵, 数字数组)]，保存时并入磁盘上的字形库
+_learned = []  # 本进程新学习的样本 [(向量矩阵, 数字数组)]，识别进程通过take_learned交给主进程保存
+_lock = threading.Lock()
+
+def binarize(img):
+    """
+    将区域图像二值化，字符为白色(255)、背景为黑色(0)
+
+    参数:
+        img: BGR或灰度图像
+
+    返回:
+        二值图像
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # 字符像素总是少数，多数为白色时说明背景比字符亮，取反
+    if cv2.countNonZero(binary) > binary.size // 2:
+        binary = cv2.bitwise_not(binary)
+    return binary
+
+def segment(binary):
+    """
+    按列投影切分字符
+
+    参数:
+        binary: binarize返回的二值图像
+
+    返回:
+        [(字符图像, 是否为逗号), ...]，从左到右排列
+    """
+    columns = np.flatnonzero(binary.any(axis=0))
+    if not columns.size:
+        return []
+
+    # 相邻的有像素列组成一个字符
+    breaks = np.flatnonzero(np.diff(columns) > 1)
+    starts = np.concatenate(([columns[0]], columns[breaks + 1]))
+    ends = np.concatenate((columns[breaks], [columns[-1]])) + 1
+
+    boxes = []
+    for x0, x1 in zip(starts, ends):
+        rows = np.flatnonzero(binary[:, x0:x1].any(axis=1))
+        y0, y1 = rows[0], rows[-1] + 1
+        glyph = binary[y0:y1, x0:x1]
+        if cv2.countNonZero(glyph) >= MIN_GLYPH_PIXELS:
+            boxes.append((glyph, y0, y1))
+    if not boxes:
+        return []
+
+    max_height = max(y1 - y0 for _, y0, y1 in boxes)
+    baseline = max(y1 for _, _, y1 in boxes)
+    glyphs = []
+    for glyph, y0, y1 in boxes:
+        if y1 - y0 < max_height * COMMA_HEIGHT_RATIO:
+            # 矮字符：位于基线附近的是逗号或小数点，其余为噪点
+            if baseline - y1 <= max_height * 0.25:
+                glyphs.append((glyph, True))
+            continue
+        glyphs.append((glyph, False))
+    return glyphs
+
+def _vectorize(glyph_imgs):
+    """字符图像缩放到统一尺寸并转为零均值单位长度的向量矩阵"""
+    vectors = np.stack([cv2.resize(g, GLYPH_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32).ravel()
+                        for g in glyph_imgs])
+    vectors -= vectors.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-6)
+
+def _read_bank():
+    """读取磁盘上的字形库，文件不存在或无法读取时返回空字形库"""
+    if os.path.exists(GLYPH_BANK_FILE):
+        try:
+            data = np.load(GLYPH_BANK_FILE)
+            return data["vectors"].astype(np.float32), data["labels"].astype("<U1")
+        except Exception as e:
+            print(f"加载字形库失败: {str(e)}")
+    return np.zeros((0, GLYPH_SIZE[0] * GLYPH_SIZE[1]), np.float32), np.zeros(0, dtype="<U1")
+
+def _load_bank():
+    global _vectors, _labels
+    if _vectors is not None:
+        return
+    _vectors, _labels = _read_bank()
+    if len(_labels):
+        print(f"已加载字形库: {len(_labels)} 个样本")
+
+def _append(vectors, labels, new_vectors, new_labels):
+    """
+    把新样本加入字形库，每个数字最多保留MAX_SAMPLES_PER_DIGIT个样本
+
+    返回:
+        (新的向量矩阵, 新的数字数组, 实际加入的向量矩阵, 实际加入的数字数组)
+    """
+    counts = {d: int((labels == d).sum()) for d in set(new_labels.tolist())}
+    keep = []
+    for i, d in enumerate(new_labels.tolist()):
+        if counts[d] < MAX_SAMPLES_PER_DIGIT:
+            counts[d] += 1
+            keep.append(i)
+    kept_vectors, kept_labels = new_vectors[keep].astype(np.float32), new_labels[keep].astype("<U1")
+    if keep:
+        vectors, labels = np.vstack([vectors, kept_vectors]), np.concatenate([labels, kept_labels])
+    return vectors, labels, kept_vectors, kept_labels
+
+def is_complete(labels):
+    """字形库中0-9每个数字的样本数是否都达到MIN_SAMPLES_PER_DIGIT"""
+    if len(labels) < 10 * MIN_SAMPLES_PER_DIGIT:
+        return False
+    digits, counts = np.unique(labels, return_counts=True)
+    return len(digits) == 10 and int(counts.min()) >= MIN_SAMPLES_PER_DIGIT
+
+def recognize(img):
+    """
+    识别区域图像中的数字
+
+    参数:
+        img: BGR区域图像
+
+    返回:
+        (文本, 置信度)，文本只包含数字和逗号；字形库中某个数字的样本少于MIN_SAMPLES_PER_DIGIT、
+        字符无法可靠匹配或没有字符时置信度为0
+    """
+    with _lock:
+        _load_bank()
+        vectors, labels = _vectors, _labels
+    glyphs = segment(binarize(img))
+    digit_glyphs = [g for g, is_comma in glyphs if not is_comma]
+    if not digit_glyphs or not is_complete(labels):
+        return "", 0.0
+
+    scores = _vectorize(digit_glyphs) @ vectors.T
+    best = scores.argmax(axis=1)
+    best_scores = scores[np.arange(len(best)), best]
+    best_labels = labels[best]
+    # 次佳：与最佳样本数字不同的样本中的最高相似度（字形库包含全部数字，即与其他每个数字的差距都不小于MIN_MARGIN）
+    other_scores = np.where(labels[None, :] != best_labels[:, None], scores, -1.0).max(axis=1)
+
+    confidence = float(best_scores.min())
+    if confidence < MIN_SIMILARITY or float((best_scores - other_scores).min()) < MIN_MARGIN:
+        confidence = 0.0
+
+    text = []
+    digits = iter(best_labels)
+    for _, is_comma in glyphs:
+        text.append(',' if is_comma else next(digits))
+    return ''.join(text), confidence
+
+def learn(img, text, score=None):
+    """
+    用已知文本（通常为CnOcr的识别结果）学习区域图像中的字形
+
+    参数:
+        img: BGR区域图像
+        text: 图像中的文本，只使用其中的数字
+        score: 可选，CnOcr给出的置信度，低于LEARN_MIN_SCORE时不学习
+
+    返回:
+        是否学习成功（置信度足够、文本格式合法且切分出的字符数与数字个数一致）
+    """
+    global _vectors, _labels
+    if score is not None and score < LEARN_MIN_SCORE:
+        return False
+    if not LEARN_TEXT_PATTERN.match(text.strip()):
+        return False
+    digits = [c for c in text if c.isdigit()]
+    glyphs = [g for g, is_comma in segment(binarize(img)) if not is_comma]
+    if not digits or len(glyphs) != len(digits):
+        return False
+
+    new_vectors = _vectorize(glyphs)
+    with _lock:
+        _load_bank()
+        _vectors, _labels, kept_vectors, kept_labels = _append(_vectors, _labels, new_vectors,
+                                                               np.array(digits, dtype="<U1"))
+        if len(kept_labels):
+            _learned.append((kept_vectors, kept_labels))
+            _unsaved.append((kept_vectors, kept_labels))
+    return True
+
+def take_learned():
+    """
+    取出本进程上次调用以来新学习的样本（识别进程中调用，结果交给主进程的add_samples）
+
+    返回:
+        (向量矩阵, 数字数组)，没有新样本时返回None
+    """
+    global _learned
+    with _lock:
+        learned, _learned = _learned, []
+    if not learned:
+        return None
+    return np.vstack([v for v, _ in learned]), np.concatenate([l for _, l in learned])
+
+def add_samples(samples):
+    """
+    把识别进程学习到的样本并入本进程的字形库，由本进程负责保存
+
+    参数:
+        samples: take_learned的返回值，为None时不做任何事
+    """
+    global _vectors, _labels
+    if samples is None:
+        return
+    vectors, labels = samples
+    with _lock:
+        _load_bank()
+        _vectors, _labels, kept_vectors, kept_labels = _append(_vectors, _labels, vectors, labels)
+        if len(kept_labels):
+            _unsaved.append((kept_vectors, kept_labels))
+
+def save_bank():
+    """
+    字形库有新样本时写回磁盘：重新读取磁盘上的字形库（其他进程可能已经保存过新样本），
+    只并入本进程新加入的样本后写回（先写临时文件再替换，避免写入中断时损坏）；多进程识别时只由主进程调用
+    """
+    global _vectors, _labels
+    with _lock:
+        if not _unsaved:
+            return
+        vectors, labels = _read_bank()
+        for new_vectors, new_labels in _unsaved:
+            vectors, labels, _, _ = _append(vectors, labels, new_vectors, new_labels)
+        os.makedirs(os.path.dirname(GLYPH_BANK_FILE), exist_ok=True)
+        tmp_path = f"{GLYPH_BANK_FILE}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, vectors=vectors, labels=labels)
+        os.replace(tmp_path, GLYPH_BANK_FILE)
+        _vectors, _labels = vectors, labels
+        _unsaved.clear()
+    print(f"字形库已保存: {len(labels)} 个样本")
+
+atexit.register(save_bank)
+
+def train(images_dir):
+    """
+    使用CnOcr识别目录中的价格区域图像，批量生成字形库
+
+    参数:
+        images_dir: 价格区域图像目录
+
+    返回:
+        成功学习的图像数量
+    """
+    import OcrEngine
+    paths = [p for p in glob.glob(os.path.join(images_dir, "*.png")) if "_markup" not in p]
+    learned = 0
+    for start in range(0, len(paths), OcrEngine.OCR_BATCH_SIZE):
+        batch = [(p, cv2.imread(p)) for p in paths[start:start + OcrEngine.OCR_BATCH_SIZE]]
+        batch = [(p, img) for p, img in batch if img is not None]
+        results = OcrEngine.recognize_texts([img for _, img in batch], with_scores=True)
+        for (_, img), (text, score) in zip(batch, results):
+            if learn(img, text, score):
+                learned += 1
+    save_bank()
+    print(f"共 {len(paths)} 张图像，成功学习 {learned} 张")
+    return learned
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='游戏字体数字识别')
+    parser.add_argument('--train', type=str, default=None, help='从价格区域图像目录生成字形库')
+    parser.add_argument('--test', type=str, nargs='*', default=None, help='识别指定的图像')
+    args = parser.parse_args()
+
+    if args.train:
+        train(args.train)
+    for path in args.test or []:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"无法读取图像: {path}")
+            continue
+        print(f"{path}: {recognize(image)}")
+    if not args.train and not args.test:
+        parser.print_help()
+        sys.exit(1)
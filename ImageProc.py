@@ -1,10 +1,58 @@
 import cv2, numpy
+import TemplateCache
+
+# 读取图片，source既可以是图片路径，也可以是已解码的numpy数组（内存截图）
+def load(source):
+    if isinstance(source, numpy.ndarray):
+        return source
+    return cv2.imread(source)
+
+# 读取模板图片，路径形式的模板从模板缓存中获取，避免每次匹配都从磁盘解码
+def load_template(wanted):
+    if isinstance(wanted, numpy.ndarray):
+        return wanted
+    return TemplateCache.get(wanted)
+
+# 金字塔粗匹配的置信度余量：缩小后的图像细节变少，粗匹配的阈值相应放宽
+PYRAMID_ACCURACY_MARGIN = 0.15
 
 # 从source图片中查找wanted图片所在的位置，当置信度大于accuracy时返回找到的最大置信度位置的左上角坐标
-def locate(source, wanted, accuracy=0.90):
-    screen_cv2 = cv2.imread(source)
-    wanted_cv2 = cv2.imread(wanted)
+# region为搜索区域(x, y, w, h)，只在该区域内匹配；scale小于1时先在缩小的图像上粗匹配，再在原分辨率的邻域内精确定位
+def locate(source, wanted, accuracy=0.90, region=None, scale=1.0):
+    return locate_batch(source, [wanted], accuracy, region, scale)[0]
+
+# 在同一张source图片中查找多个wanted图片，搜索区域的裁剪和缩小只做一次
+# 返回与wanted_list顺序一致的左上角坐标列表，未找到的为None
+def locate_batch(source, wanted_list, accuracy=0.90, region=None, scale=1.0):
+    screen_cv2 = load(source)
+
+    offset_x, offset_y = 0, 0
+    if region is not None:
+        x, y, w, h = region
+        offset_x, offset_y = max(0, x), max(0, y)
+        screen_cv2 = screen_cv2[offset_y:y + h, offset_x:x + w]
+
+    small_screen = cv2.resize(screen_cv2, None, fx=scale, fy=scale) if scale < 1.0 else None
+
+    positions = []
+    for wanted in wanted_list:
+        wanted_cv2 = load_template(wanted)
+        if wanted_cv2 is None or screen_cv2.shape[0] < wanted_cv2.shape[0] or screen_cv2.shape[1] < wanted_cv2.shape[1]:
+            positions.append(None)
+            continue
+
+        if small_screen is not None:
+            pos = _locate_pyramid(screen_cv2, small_screen, wanted, wanted_cv2, accuracy, scale)
+            if pos is False:
+                # 粗匹配命中但精确定位失败，退回到原分辨率的完整匹配
+                pos = _locate_full(screen_cv2, wanted_cv2, accuracy)
+        else:
+            pos = _locate_full(screen_cv2, wanted_cv2, accuracy)
 
+        positions.append(None if pos is None else (pos[0] + offset_x, pos[1] + offset_y))
+    return positions
+
+def _locate_full(screen_cv2, wanted_cv2, accuracy):
     result = cv2.matchTemplate(screen_cv2, wanted_cv2, cv2.TM_CCOEFF_NORMED)
     min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
 
@@ -13,28 +61,97 @@ def locate(source, wanted, accuracy=0.90):
     else:
         return None
 
+# 缩小图像粗匹配 + 原分辨率邻域精确定位；粗匹配未命中返回None，精确定位失败返回False
+def _locate_pyramid(screen_cv2, small_screen, wanted, wanted_cv2, accuracy, scale):
+    th, tw = wanted_cv2.shape[:2]
+    small_size = (max(1, int(tw * scale)), max(1, int(th * scale)))
+    if isinstance(wanted, str):
+        small_wanted = TemplateCache.get(wanted, small_size)
+    else:
+        small_wanted = cv2.resize(wanted_cv2, small_size)
+    if small_screen.shape[0] < small_wanted.shape[0] or small_screen.shape[1] < small_wanted.shape[1]:
+        return _locate_full(screen_cv2, wanted_cv2, accuracy)
+
+    result = cv2.matchTemplate(small_screen, small_wanted, cv2.TM_CCOEFF_NORMED)
+    min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(result)
+    if max_val < accuracy - PYRAMID_ACCURACY_MARGIN:
+        return None
+
+    # 在粗匹配位置附近的原分辨率窗口内精确匹配
+    margin = int(2 / scale) + 2
+    cx, cy = int(max_loc[0] / scale), int(max_loc[1] / scale)
+    x0, y0 = max(0, cx - margin), max(0, cy - margin)
+    x1 = min(screen_cv2.shape[1], cx + tw + margin)
+    y1 = min(screen_cv2.shape[0], cy + th + margin)
+    pos = _locate_full(screen_cv2[y0:y1, x0:x1], wanted_cv2, accuracy)
+    if pos is None:
+        return False
+    return (pos[0] + x0, pos[1] + y0)
+
 # 从source图片中查找wanted图片所在的位置，当置信度大于accuracy时返回找到的所有位置的左上角坐标（自动去重）
+# 去重使用峰值提取 + 非极大值抑制，结果按从上到下、从左到右的顺序返回
 def locate_all(source, wanted, accuracy=0.90):
-    loc_pos = []
-    screen_cv2 = cv2.imread(source)
-    wanted_cv2 = cv2.imread(wanted)
+    screen_cv2 = load(source)
+    wanted_cv2 = load_template(wanted)
+    h, w = wanted_cv2.shape[:2]
 
     result = cv2.matchTemplate(screen_cv2, wanted_cv2, cv2.TM_CCOEFF_NORMED)
-    location = numpy.where(result >= accuracy)
+    matches = match_nms(result, w, h, accuracy)
+    return [[x, y] for x, y, _ in sorted(matches, key=lambda m: (m[1], m[0]))]
 
-    ex, ey = 0, 0
-    for pt in zip(*location[::-1]):
-        x = pt[0]
-        y = pt[1]
-
-        if (x - ex) + (y - ey) < 15:  # 去掉邻近重复的点
-            continue
-        ex, ey = x, y
+# 从matchTemplate的结果中提取峰值：取值不低于threshold且是window邻域内的局部极大值（等价于膨胀后值不变的点）
+# 只在超过阈值的候选点上比较邻域，不对整张结果图做膨胀
+# 返回 (Nx2的[x, y]坐标数组, 置信度数组)，按置信度从高到低排序
+def match_peaks(result, threshold, window=3):
+    # 先找出含有候选点的行，只在这些行上取坐标（整张结果图上的nonzero开销远大于比较本身）
+    mask = result >= threshold
+    rows = numpy.flatnonzero(mask.any(axis=1))
+    row_index, xs = numpy.nonzero(mask[rows])
+    ys = rows[row_index]
+    scores = result[ys, xs]
+    r = window // 2
+    is_peak = numpy.ones(len(scores), dtype=bool)
+    for dy in range(-r, r + 1):
+        for dx in range(-r, r + 1):
+            if dy or dx:
+                ny = numpy.clip(ys + dy, 0, result.shape[0] - 1)
+                nx = numpy.clip(xs + dx, 0, result.shape[1] - 1)
+                is_peak &= scores >= result[ny, nx]
+    ys, xs, scores = ys[is_peak], xs[is_peak], scores[is_peak]
+    order = numpy.argsort(-scores, kind="stable")
+    return numpy.stack([xs[order], ys[order]], axis=1), scores[order]
 
-        loc_pos.append([int(x), int(y)])
+# 计算box与boxes中每个矩形的重叠程度：重叠面积占两者中较小矩形面积的比例，矩形格式为(x, y, w, h)
+def overlap_ratios(box, boxes):
+    boxes = numpy.asarray(boxes, dtype=numpy.float64).reshape(-1, 4)
+    x, y, w, h = [float(v) for v in box]
+    x_overlap = numpy.clip(numpy.minimum(x + w, boxes[:, 0] + boxes[:, 2]) - numpy.maximum(x, boxes[:, 0]), 0, None)
+    y_overlap = numpy.clip(numpy.minimum(y + h, boxes[:, 1] + boxes[:, 3]) - numpy.maximum(y, boxes[:, 1]), 0, None)
+    min_area = numpy.minimum(w * h, boxes[:, 2] * boxes[:, 3])
+    return numpy.divide(x_overlap * y_overlap, min_area, out=numpy.zeros(len(boxes)), where=min_area > 0)
 
+# 非极大值抑制：按置信度从高到低依次保留矩形，并抑制与其重叠程度超过overlap的其余矩形
+# boxes为Nx4的(x, y, w, h)数组，返回保留下来的索引数组（按置信度从高到低）
+def nms(boxes, scores, overlap=0.5):
+    boxes = numpy.asarray(boxes, dtype=numpy.float64).reshape(-1, 4)
+    order = numpy.argsort(-numpy.asarray(scores), kind="stable")
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        order = rest[overlap_ratios(boxes[i], boxes[rest]) <= overlap]
+    return numpy.array(keep, dtype=numpy.intp)
 
-    return loc_pos
+# 模板匹配结果的去重：峰值提取后对模板大小(w, h)的矩形做非极大值抑制
+# 返回[(x, y, 置信度), ...]，按置信度从高到低排序
+def match_nms(result, w, h, threshold, overlap=0.5):
+    points, scores = match_peaks(result, threshold)
+    if not len(points):
+        return []
+    boxes = numpy.column_stack([points, numpy.full(len(points), w), numpy.full(len(points), h)])
+    keep = nms(boxes, scores, overlap)
+    return [(int(points[i][0]), int(points[i][1]), float(scores[i])) for i in keep]
 
 # 给定目标尺寸大小和目标左上角顶点坐标，即可给出目标中心的坐标
 def centerOfTouchArea(wantedSize, topLeftPos):
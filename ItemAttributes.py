@@ -0,0 +1,162 @@
+"""
+物品属性索引
+
+稀有度等不随时间变化的物品属性保存在一个常驻内存的索引中（物品名称+分类 → 属性），
+查询为O(1)，不再随历史价格CSV的数量增长而变慢。
+索引保存在 ./market_data/item_attributes.json：
+第一次使用时从已有的 price_data_*.csv 建立，之后每写入一行价格数据就增量更新；
+同时记录每个CSV已读取到的位置，其他进程追加的新行在下次加载时补读。
+"""
+
+import os
+import csv
+import glob
+import json
+import threading
+
+INDEX_FILE = "./market_data/item_attributes.json"  # 索引文件
+PRICE_DATA_PATTERN = "./market_data/price_data_*.csv"  # 建立索引时读取的价格数据文件
+UNKNOWN_VALUES = ("", "未知", "N/A")  # 这些值不写入索引
+
+# CSV列名与属性名的对应
+ATTRIBUTE_COLUMNS = {'稀有度': 'rarity'}
+
+_items = None  # {"物品名称|分类": {属性名: 值}}
+_offsets = {}  # {CSV文件名: 已读取到的字节位置}
+_lock = threading.Lock()
+
+def _key(item_name, category_name):
+    return f"{item_name}|{category_name}"
+
+def _set(item_name, category_name, attributes):
+    """更新内存中的属性，返回是否有变化"""
+    changed = False
+    entry = _items.setdefault(_key(item_name, category_name), {})
+    for name, value in attributes.items():
+        if value in UNKNOWN_VALUES or value is None:
+            continue
+        if entry.get(name) != value:
+            entry[name] = value
+            changed = True
+    return changed
+
+def _scan_csv(path):
+    """从上次读取的位置开始读取CSV中的新行，返回是否有属性变化"""
+    name = os.path.basename(path)
+    offset = _offsets.get(name, 0)
+    size = os.path.getsize(path)
+    if size < offset:
+        offset = 0  # 文件被重写，重新读取
+    if size == offset:
+        return False
+
+    changed = False
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = next(csv.reader([f.readline()]), [])
+        if offset:
+            f.seek(offset)
+        else:
+            offset = f.tell()
+        while True:
+            line = f.readline()
+            if not line.endswith("\n"):
+                break  # 最后一行可能正在写入，下次再读
+            offset = f.tell()
+            row = dict(zip(header, next(csv.reader([line]), [])))
+            if '物品名称' in row and '物品分类' in row:
+                attributes = {attr: row.get(column, '') for column, attr in ATTRIBUTE_COLUMNS.items()}
+                changed |= _set(row['物品名称'], row['物品分类'], attributes)
+    _offsets[name] = offset
+    return changed
+
+def _save(data=None):
+    """原子写入索引文件，data默认为内存中的索引"""
+    os.makedirs(os.path.dirname(INDEX_FILE), exist_ok=True)
+    tmp_path = f"{INDEX_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data or {'items': _items, 'offsets': _offsets}, f, ensure_ascii=False)
+    os.replace(tmp_path, INDEX_FILE)
+
+def _load():
+    """加载索引并补读各价格CSV中的新行（按文件名即时间顺序，新数据覆盖旧数据）"""
+    global _items, _offsets
+    if _items is not None:
+        return
+    _items, _offsets = {}, {}
+    if os.path.exists(INDEX_FILE):
+        try:
+            with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            _items, _offsets = data.get('items', {}), data.get('offsets', {})
+        except (OSError, ValueError) as e:
+            print(f"读取物品属性索引失败: {str(e)}，将重新建立")
+
+    changed = False
+    for path in sorted(glob.glob(PRICE_DATA_PATTERN)):
+        try:
+            changed |= _scan_csv(path)
+        except Exception as e:
+            print(f"读取价格数据文件时出错: {path}, 错误: {str(e)}")
+    if changed or not os.path.exists(INDEX_FILE):
+        _save()
+        print(f"物品属性索引已更新: {len(_items)} 个物品")
+
+def forget_file(path):
+    """
+    丢弃某个CSV的已读取位置（文件被改写后调用），下次加载时重新读取整个文件
+
+    参数:
+        path: CSV路径
+    """
+    name = os.path.basename(path)
+    with _lock:
+        if _items is not None:
+            data = {'items': _items, 'offsets': _offsets}
+        elif os.path.exists(INDEX_FILE):
+            # 尚未加载时直接修改索引文件，不能先加载（加载会按旧位置读取改写后的文件）
+            try:
+                with open(INDEX_FILE, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                return
+        else:
+            return
+        if data.get('offsets', {}).pop(name, None) is not None:
+            try:
+                _save(data)
+            except OSError as e:
+                print(f"保存物品属性索引失败: {str(e)}")
+
+def get(item_name, category_name, attribute='rarity', default="未知"):
+    """
+    查询物品属性
+
+    参数:
+        item_name: 物品名称
+        category_name: 物品分类
+        attribute: 属性名
+        default: 没有记录时的返回值
+
+    返回:
+        属性值
+    """
+    with _lock:
+        _load()
+        return _items.get(_key(item_name, category_name), {}).get(attribute, default)
+
+def update(item_name, category_name, **attributes):
+    """
+    记录物品属性（写入价格数据时调用），有变化时写回索引文件
+
+    参数:
+        item_name: 物品名称
+        category_name: 物品分类
+        attributes: 属性，如 rarity="稀有"
+    """
+    with _lock:
+        _load()
+        if _set(item_name, category_name, attributes):
+            try:
+                _save()
+            except OSError as e:
+                print(f"保存物品属性索引失败: {str(e)}")
@@ -0,0 +1,144 @@
+"""
+市场爬取流水线
+
+导航 → 截图 → 解码 → 识别 → 保存 各阶段之间通过有界队列连接：
+导航线程只负责操作设备并读取截图的原始字节，拿到字节后立即提交并返回列表点击下一个物品；
+解码与loading检测、价格识别、数据保存分别在后台线程中完成。
+队列有容量上限，后台处理跟不上时导航线程会在提交时等待，避免内存中堆积过多截图。
+"""
+
+import queue
+import threading
+import time
+import ADBHelper
+
+PIPELINE_QUEUE_SIZE = 8  # 每个阶段之间队列的最大长度
+
+class CrawlPipeline:
+    """
+    截图处理流水线
+
+    参数:
+        recognize_func: 识别函数 recognize_func(screen, context)，返回识别结果，返回None表示不需要保存
+        persist_func: 保存函数 persist_func(context, result)，只在单个保存线程中调用
+        is_loading: 可选，loading检测函数 is_loading(screen)，返回True的截图会被放入重试列表
+        recognize_workers: 识别线程数
+        queue_size: 阶段之间队列的最大长度
+    """
+
+    def __init__(self, recognize_func, persist_func, is_loading=None, recognize_workers=4, queue_size=PIPELINE_QUEUE_SIZE):
+        self.recognize_func = recognize_func
+        self.persist_func = persist_func
+        self.is_loading = is_loading
+        self.recognize_workers = max(1, recognize_workers)
+        self.decode_queue = queue.Queue(maxsize=queue_size)
+        self.recognize_queue = queue.Queue(maxsize=queue_size)
+        self.persist_queue = queue.Queue(maxsize=queue_size)
+        self.retries = []
+        self.retries_lock = threading.Lock()
+        self.stats = {'submitted': 0, 'loading': 0, 'recognized': 0, 'saved': 0, 'failed': 0}
+        self.stats_lock = threading.Lock()
+        self.start_time = None
+
+    def start(self):
+        """启动所有后台阶段线程"""
+        self.start_time = time.time()
+        self.decode_thread = threading.Thread(target=self._decode_loop, name="pipeline-decode", daemon=True)
+        self.recognize_threads = [threading.Thread(target=self._recognize_loop, name=f"pipeline-recognize-{i}", daemon=True)
+                                  for i in range(self.recognize_workers)]
+        self.persist_thread = threading.Thread(target=self._persist_loop, name="pipeline-persist", daemon=True)
+        for thread in [self.decode_thread, self.persist_thread] + self.recognize_threads:
+            thread.start()
+        return self
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def submit(self, raw, context):
+        """
+        提交一帧截图的原始字节，队列已满时阻塞等待
+
+        参数:
+            raw: screencap原始输出字节
+            context: 与该帧相关的信息，原样传给识别和保存函数
+        """
+        self._count('submitted')
+        self.decode_queue.put((raw, context))
+
+    def _decode_loop(self):
+        while True:
+            task = self.decode_queue.get()
+            try:
+                if task is None:
+                    return
+                raw, context = task
+                screen = ADBHelper.decodeRawScreenCap(raw)
+                if screen is None or (self.is_loading is not None and self.is_loading(screen)):
+                    # 截图无法解析或仍在加载，交给导航线程重新访问
+                    self._count('loading')
+                    with self.retries_lock:
+                        self.retries.append(context)
+                    continue
+                self.recognize_queue.put((screen, context))
+            except Exception as e:
+                print(f"[流水线] 解码截图时出错: {str(e)}")
+                self._count('failed')
+            finally:
+                self.decode_queue.task_done()
+
+    def _recognize_loop(self):
+        while True:
+            task = self.recognize_queue.get()
+            if task is None:
+                return
+            screen, context = task
+            try:
+                result = self.recognize_func(screen, context)
+                self._count('recognized')
+                if result is not None:
+                    self.persist_queue.put((context, result))
+            except Exception as e:
+                print(f"[流水线] 识别截图时出错: {str(e)}")
+                self._count('failed')
+
+    def _persist_loop(self):
+        while True:
+            task = self.persist_queue.get()
+            if task is None:
+                return
+            context, result = task
+            try:
+                self.persist_func(context, result)
+                self._count('saved')
+            except Exception as e:
+                print(f"[流水线] 保存数据时出错: {str(e)}")
+                self._count('failed')
+
+    def take_retries(self):
+        """
+        等待已提交的截图全部完成解码检测，取出需要重新访问的任务
+
+        返回:
+            需要重新访问的context列表
+        """
+        self.decode_queue.join()
+        with self.retries_lock:
+            retries, self.retries = self.retries, []
+        return retries
+
+    def close(self):
+        """按阶段顺序结束流水线，等待所有已提交的截图处理并保存完毕"""
+        self.decode_queue.put(None)
+        self.decode_thread.join()
+        for _ in self.recognize_threads:
+            self.recognize_queue.put(None)
+        for thread in self.recognize_threads:
+            thread.join()
+        self.persist_queue.put(None)
+        self.persist_thread.join()
+
+        elapsed = time.time() - self.start_time if self.start_time else 0
+        print(f"[流水线] 已提交 {self.stats['submitted']} 帧，识别 {self.stats['recognized']} 帧，"
+              f"保存 {self.stats['saved']} 条，加载中重试 {self.stats['loading']} 帧，失败 {self.stats['failed']} 次，"
+              f"耗时 {elapsed:.1f} 秒")
@@ -5,6 +5,13 @@ import sys
 import time
 import csv
 from datetime import datetime
+import OcrEngine
+import TemplateCache
+import ImageProc
+import GlyphOcr
+import ItemAttributes
+import PriceStore
+import PriceWriter
 
 # 价格区域相关参数
 PRICE_OFFSET_X = 590  # 价格区域相对于标签右侧的水平偏移量
@@ -25,8 +32,10 @@ EDIT_BUTTON_THRESHOLD = 0.7  # 编辑按钮匹配阈值
 TEMPLATE_DIR = "./templates/modern_warship/market_tags/"  # 模板目录
 RARITY_TEMPLATE_DIR = "./templates/modern_warship/rarity/"  # 稀有度模板目录
 OUTPUT_DIR = "./market_data/price_images/"  # 价格图像输出目录
+KEEP_DEBUG_IMAGES = False  # process_frame默认是否保存价格区域图像和带标记的原图（调试用）
 DEVICE_SCREENSHOT_DIR = "./cache/test/"  # 设备截图保存目录
 PRICE_DATA_FILE = "./market_data/price_data.csv"  # 价格数据CSV文件
+USE_GLYPH_OCR = True  # 是否先用游戏字体字形匹配识别价格和数量，置信度不足时再交给CnOcr
 
 # 标签模板文件名
 LABEL_TEMPLATES = ["buying.png", "selling.png"]  # 移除了lowest_price.png
@@ -52,35 +61,6 @@ if not os.path.exists(OUTPUT_DIR):
 if not os.path.exists(DEVICE_SCREENSHOT_DIR):
     os.makedirs(DEVICE_SCREENSHOT_DIR)
 
-# 计算两个矩形的重叠程度
-def calculate_overlap(rect1, rect2):
-    """
-    计算两个矩形的重叠程度
-    
-    参数:
-        rect1: 第一个矩形 (x, y, w, h)
-        rect2: 第二个矩形 (x, y, w, h)
-        
-    返回:
-        重叠面积占较小矩形面积的比例
-    """
-    x1, y1, w1, h1 = rect1
-    x2, y2, w2, h2 = rect2
-    
-    # 计算重叠区域
-    x_overlap = max(0, min(x1 + w1, x2 + w2) - max(x1, x2))
-    y_overlap = max(0, min(y1 + h1, y2 + h2) - max(y1, y2))
-    overlap_area = x_overlap * y_overlap
-    
-    # 计算两个矩形的面积
-    area1 = w1 * h1
-    area2 = w2 * h2
-    
-    # 返回重叠面积与较小矩形面积的比例
-    if min(area1, area2) == 0:
-        return 0
-    return overlap_area / min(area1, area2)
-
 def recognize_rarity(rarity_img):
     """
     使用模板匹配识别稀有度
@@ -108,15 +88,12 @@ def recognize_rarity(rarity_img):
             print(f"警告: 稀有度模板不存在: {template_path}")
             continue
         
-        # 读取模板
-        template = cv2.imread(template_path)
+        # 从模板缓存读取已调整为稀有度区域大小的模板
+        template = TemplateCache.get(template_path, (rarity_img.shape[1], rarity_img.shape[0]))
         if template is None:
             print(f"无法读取稀有度模板: {template_path}")
             continue
         
-        # 调整模板大小匹配稀有度区域
-        template = cv2.resize(template, (rarity_img.shape[1], rarity_img.shape[0]))
-        
         # 进行模板匹配
         result = cv2.matchTemplate(rarity_img, template, cv2.TM_CCOEFF_NORMED)
         _, max_val, _, _ = cv2.minMaxLoc(result)
@@ -131,20 +108,22 @@ def recognize_rarity(rarity_img):
     
     return best_rarity, best_score
 
-def recognize_all_price_areas(screenshot_path, detect_own_prices=False):
+def recognize_all_price_areas(screenshot_path, detect_own_prices=False, with_prices=False):
     """
     从物品详情页截图中识别所有价格区域
     
     参数:
-        screenshot_path: 物品详情页截图路径
+        screenshot_path: 物品详情页截图路径，或已在内存中的BGR截图数组
         detect_own_prices: 是否检测本人价格（默认False）
+        with_prices: 是否同时识别各价格区域的价格（与出价/上架数量在同一批次中识别）
         
     返回:
         成功时返回: found_areas, bid_count, listing_count, rarity_text
+        with_prices为True时额外返回与found_areas顺序一致的价格文本列表
         失败时返回: [], 0, 0, ""
     """
     # 读取原始截图
-    img = cv2.imread(screenshot_path)
+    img = screenshot_path if isinstance(screenshot_path, np.ndarray) else cv2.imread(screenshot_path)
     if img is None:
         print(f"无法读取截图: {screenshot_path}")
         return [], 0, 0, ""
@@ -163,26 +142,8 @@ def recognize_all_price_areas(screenshot_path, detect_own_prices=False):
     rarity_img = img[RARITY_REGION[1]:RARITY_REGION[1]+RARITY_REGION[3], 
                   RARITY_REGION[0]:RARITY_REGION[0]+RARITY_REGION[2]]
     
-    # 使用OCR识别出价和上架数量
-    bid_count_text = recognize_price(bid_count_img)
-    listing_count_text = recognize_price(listing_count_img)
-    
     # 使用模板匹配识别稀有度
     rarity_text, rarity_score = recognize_rarity(rarity_img)
-    
-    # 转换为整数
-    try:
-        bid_count = int(bid_count_text.replace(',', '').strip()) if bid_count_text else 0
-    except:
-        bid_count = 0
-        
-    try:
-        listing_count = int(listing_count_text.replace(',', '').strip()) if listing_count_text else 0
-    except:
-        listing_count = 0
-    
-    print(f"识别到的出价数量: {bid_count}")
-    print(f"识别到的上架数量: {listing_count}")
     print(f"识别到的稀有度: {rarity_text} (匹配度: {rarity_score:.2f})")
     
     # 存储所有标签位置，用于找到本人价格
@@ -197,7 +158,7 @@ def recognize_all_price_areas(screenshot_path, detect_own_prices=False):
             continue
         
         # 读取标签模板
-        template = cv2.imread(template_path)
+        template = TemplateCache.get(template_path)
         if template is None:
             print(f"无法读取标签模板: {template_path}")
             continue
@@ -208,29 +169,9 @@ def recognize_all_price_areas(screenshot_path, detect_own_prices=False):
         # 进行模板匹配
         result = cv2.matchTemplate(img, template, cv2.TM_CCOEFF_NORMED)
         
-        # 找出所有匹配位置（大于阈值的位置）
-        locations = np.where(result >= MATCH_THRESHOLD)
-        
-        # 转换为坐标列表
-        matches = list(zip(*locations[::-1]))
-        
-        # 去除重叠的匹配
-        filtered_matches = []
-        for match in matches:
-            # 检查与已有结果是否重叠
-            match_rect = (match[0], match[1], w, h)
-            is_overlapping = False
-            
-            for existing_match in filtered_matches:
-                existing_rect = (existing_match[0], existing_match[1], w, h)
-                if calculate_overlap(match_rect, existing_rect) > OVERLAP_THRESHOLD:
-                    is_overlapping = True
-                    break
-            
-            if not is_overlapping:
-                # 添加置信度
-                confidence = result[match[1], match[0]]
-                filtered_matches.append((match[0], match[1], confidence))
+        # 提取匹配峰值并做非极大值抑制去除重叠的匹配，按从上到下的顺序处理
+        filtered_matches = sorted(ImageProc.match_nms(result, w, h, MATCH_THRESHOLD, OVERLAP_THRESHOLD),
+                                  key=lambda m: (m[1], m[0]))
         
         # 处理每个匹配位置
         for match_x, match_y, confidence in filtered_matches:
@@ -257,11 +198,8 @@ def recognize_all_price_areas(screenshot_path, detect_own_prices=False):
             label_type = os.path.splitext(template_name)[0]
             
             # 检查价格区域是否与已有区域重叠
-            is_price_overlapping = False
-            for _, existing_price_region, _, _, _ in found_areas:
-                if calculate_overlap(price_region, existing_price_region) > OVERLAP_THRESHOLD:
-                    is_price_overlapping = True
-                    break
+            is_price_overlapping = bool(found_areas) and \
+                (ImageProc.overlap_ratios(price_region, [area[1] for area in found_areas]) > OVERLAP_THRESHOLD).any()
                     
             if not is_price_overlapping:
                 # 添加到结果列表
@@ -320,6 +258,35 @@ def recognize_all_price_areas(screenshot_path, detect_own_prices=False):
         print(f"使用固定区域方法识别价格区域: ({price_x}, {price_y}, {PRICE_WIDTH}, {PRICE_HEIGHT})")
         found_areas.append((price_img, price_region, "unknown", None, 0))
     
+    # 出价数量、上架数量和所有价格区域在一次批量OCR中完成识别
+    ocr_crops = [bid_count_img, listing_count_img]
+    price_indices = []
+    if with_prices:
+        price_indices = [i for i, area in enumerate(found_areas) if area[2] != "unknown"]
+        ocr_crops += [found_areas[i][0] for i in price_indices]
+    ocr_texts = recognize_prices(ocr_crops)
+    bid_count_text, listing_count_text = ocr_texts[0], ocr_texts[1]
+    
+    # 转换为整数
+    try:
+        bid_count = int(bid_count_text.replace(',', '').strip()) if bid_count_text else 0
+    except:
+        bid_count = 0
+        
+    try:
+        listing_count = int(listing_count_text.replace(',', '').strip()) if listing_count_text else 0
+    except:
+        listing_count = 0
+    
+    print(f"识别到的出价数量: {bid_count}")
+    print(f"识别到的上架数量: {listing_count}")
+    
+    if with_prices:
+        price_texts = [""] * len(found_areas)
+        for i, text in zip(price_indices, ocr_texts[2:]):
+            price_texts[i] = text
+        return found_areas, bid_count, listing_count, rarity_text, price_texts
+    
     return found_areas, bid_count, listing_count, rarity_text
 
 def create_markup_image(img, found_areas, bid_count=0, listing_count=0, rarity=""):
@@ -451,9 +418,25 @@ def save_price_image(price_img, screenshot_path, label_type=None, index=0, with_
     print(f"已保存价格区域图像: {output_path}")
     return output_path
 
+def clean_price_text(price_text):
+    """
+    清理OCR识别结果，只保留数字、逗号和空格
+    
+    参数:
+        price_text: OCR识别出的原始文本
+        
+    返回:
+        清理后的价格文本
+    """
+    # 将小数点替换为逗号
+    price_text = price_text.replace('.', ',')
+    
+    # 清理结果，只保留数字、逗号和空格
+    return ''.join(c for c in price_text if c.isdigit() or c == ',' or c == ' ')
+
 def recognize_price(price_img):
     """
-    使用OCR识别价格区域图像中的价格
+    识别价格区域图像中的价格
     
     参数:
         price_img: 价格区域图像
@@ -461,48 +444,51 @@ def recognize_price(price_img):
     返回:
         识别出的价格文本
     """
-    try:
-        # 导入OCR库
-        try:
-            from cnocr import CnOcr
-        except ImportError:
-            print("未安装cnocr库，正在尝试安装...")
-            import subprocess
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "cnocr"])
-            from cnocr import CnOcr
-        
-        # 保存价格区域图像到临时文件
-        temp_path = f"./cache/temp_price_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.png"
-        os.makedirs("./cache", exist_ok=True)
-        cv2.imwrite(temp_path, price_img)
-        
-        # 初始化OCR模型
-        ocr = CnOcr(rec_model_name='en_PP-OCRv3')  # 使用英文模型，适合识别数字
-        
-        # 识别价格
-        result = ocr.ocr_for_single_line(temp_path)
-        
-        # 删除临时文件
-        try:
-            os.remove(temp_path)
-        except:
-            pass
-        
-        # 处理识别结果
-        price_text = result["text"]
-        
-        # 将小数点替换为逗号
-        price_text = price_text.replace('.', ',')
-        
-        # 清理结果，只保留数字、逗号和空格
-        cleaned_price = ''.join(c for c in price_text if c.isdigit() or c == ',' or c == ' ')
+    return recognize_prices([price_img])[0]
+
+def recognize_prices(price_imgs):
+    """
+    批量识别多个价格区域图像
+    依次尝试：OCR结果缓存（区域画面与之前识别过的完全相同）→ 字形匹配 → OCR，
+    剩余区域一次前向计算交给OCR，OCR结果同时用于扩充字形库
+    
+    参数:
+        price_imgs: 价格区域图像列表
         
-        return cleaned_price
+    返回:
+        与输入顺序一致的价格文本列表
+    """
+    try:
+        keys = [OcrEngine.memo_key(price_img) for price_img in price_imgs]
+        texts = [OcrEngine.memo_get(key) for key in keys]
+        texts = [clean_price_text(text) if text is not None else None for text in texts]
+
+        if USE_GLYPH_OCR:
+            glyph_results = []
+            for i, price_img in enumerate(price_imgs):
+                if texts[i] is not None:
+                    continue
+                text, confidence = GlyphOcr.recognize(price_img)
+                if confidence > 0:
+                    texts[i] = text
+                    glyph_results.append((keys[i], text))
+            # 字形匹配结果只放入内存缓存，误识别不会被写入磁盘缓存后一直重放
+            OcrEngine.memo_put(glyph_results, persist=False)
+
+        fallback = [i for i, text in enumerate(texts) if text is None]
+        if fallback:
+            ocr_results = OcrEngine.recognize_texts([price_imgs[i] for i in fallback], keys=[keys[i] for i in fallback],
+                                                    with_scores=True)
+            for i, (text, score) in zip(fallback, ocr_results):
+                texts[i] = clean_price_text(text)
+                if USE_GLYPH_OCR:
+                    GlyphOcr.learn(price_imgs[i], texts[i], score)
+        return texts
     except Exception as e:
         print(f"识别价格时出错: {str(e)}")
-        return "识别失败"
+        return ["识别失败"] * len(price_imgs)
 
-def save_price_data(item_name, category_name, price_data, csv_file_path=None):
+def save_price_data(item_name, category_name, price_data, csv_file_path=None, timestamp=None):
     """
     保存价格数据到CSV文件
     
@@ -511,6 +497,7 @@ def save_price_data(item_name, category_name, price_data, csv_file_path=None):
         category_name: 物品分类
         price_data: 价格数据字典 {'buying': price, 'selling': price, ...}
         csv_file_path: 可选，指定CSV文件路径
+        timestamp: 可选，记录的时间戳字符串（重新处理历史截图时使用截图时间），默认为当前时间
         
     返回:
         是否成功保存
@@ -519,109 +506,80 @@ def save_price_data(item_name, category_name, price_data, csv_file_path=None):
     if not csv_file_path:
         csv_file_path = PRICE_DATA_FILE
     
-    # 检查CSV文件是否存在，不存在则创建并写入表头
-    file_exists = os.path.exists(csv_file_path)
-    
     try:
-        with open(csv_file_path, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            
-            # 获取当前时间
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            
-            # 收集所有购买和出售价格
-            buying_prices = []
-            selling_prices = []
-            own_buying_price = ""
-            own_selling_price = ""
-            
-            for key, price in price_data.items():
-                if key == '本人购买价格':
-                    own_buying_price = price
-                elif key == '本人售出价格':
-                    own_selling_price = price
-                elif 'buying' in key:
-                    try:
-                        # 将逗号替换为空字符，然后转换为整数
-                        clean_price = price.replace(',', '').replace(' ', '')
-                        buying_prices.append(int(clean_price))
-                    except:
-                        print(f"无法解析购买价格: {price}")
-                elif 'selling' in key:
-                    try:
-                        # 将逗号替换为空字符，然后转换为整数
-                        clean_price = price.replace(',', '').replace(' ', '')
-                        selling_prices.append(int(clean_price))
-                    except:
-                        print(f"无法解析出售价格: {price}")
-            
-            # 计算低买低卖溢价，确保使用整数
-            spread = "N/A"
-            if buying_prices and selling_prices:
+        # 获取当前时间
+        timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        # 收集所有购买和出售价格
+        buying_prices = []
+        selling_prices = []
+        own_buying_price = ""
+        own_selling_price = ""
+        
+        for key, price in price_data.items():
+            if key == '本人购买价格':
+                own_buying_price = price
+            elif key == '本人售出价格':
+                own_selling_price = price
+            elif 'buying' in key:
                 try:
-                    max_buying = max(buying_prices)
-                    min_selling = min(selling_prices)
-                    # 修改计算方式：(最低出售价格*0.8-1) - (最高购买价格+1)
-                    spread = int((min_selling * 0.8 - 1) - (max_buying + 1))  # 转换为整数
-                except Exception as e:
-                    print(f"计算低买低卖溢价时出错: {str(e)}")
-            
-            # 合并多个价格为一个字符串，用分号分隔，并添加逗号分隔符
-            buying_price_str = '; '.join(format_price_with_commas(p) for p in buying_prices) if buying_prices else ''
-            selling_price_str = '; '.join(format_price_with_commas(p) for p in selling_prices) if selling_prices else ''
-            
-            # 获取额外信息
-            bid_count = price_data.get('bid_count', 0)
-            listing_count = price_data.get('listing_count', 0)
-            rarity = price_data.get('rarity', '')
-            
-            # 检查是否是报价追踪文件
-            is_bid_tracker_file = csv_file_path and '报价追踪.csv' in csv_file_path
-            
-            # 根据文件类型决定表头和数据行格式
-            if is_bid_tracker_file:
-                # 报价追踪文件：始终使用包含所有本人价格列的固定格式
-                if not file_exists:
-                    writer.writerow(['物品名称', '物品分类', '购买价格', '出售价格', '本人购买价格', '本人售出价格', '低买低卖溢价', '时间戳', '出价数量', '上架数量', '稀有度'])
-                
-                # 数据行：所有列都有值，本人价格列如果没有就用空字符串
-                writer.writerow([
-                    item_name, 
-                    category_name, 
-                    buying_price_str, 
-                    selling_price_str,
-                    own_buying_price if own_buying_price else '',  # 本人购买价格，没有则为空
-                    own_selling_price if own_selling_price else '',  # 本人售出价格，没有则为空
-                    spread,
-                    timestamp,
-                    bid_count,
-                    listing_count,
-                    rarity
-                ])
-            elif own_buying_price or own_selling_price:
-                # 普通文件且有本人价格时的动态格式
-                if not file_exists:
-                    if own_buying_price and own_selling_price:
-                        writer.writerow(['物品名称', '物品分类', '购买价格', '出售价格', '本人购买价格', '本人售出价格', '低买低卖溢价', '时间戳', '出价数量', '上架数量', '稀有度'])
-                    elif own_buying_price:
-                        writer.writerow(['物品名称', '物品分类', '购买价格', '出售价格', '本人购买价格', '低买低卖溢价', '时间戳', '出价数量', '上架数量', '稀有度'])
-                    elif own_selling_price:
-                        writer.writerow(['物品名称', '物品分类', '购买价格', '出售价格', '本人售出价格', '低买低卖溢价', '时间戳', '出价数量', '上架数量', '稀有度'])
-                
-                # 数据行
-                if own_buying_price and own_selling_price:
-                    writer.writerow([item_name, category_name, buying_price_str, selling_price_str, own_buying_price, own_selling_price, spread, timestamp, bid_count, listing_count, rarity])
-                elif own_buying_price:
-                    writer.writerow([item_name, category_name, buying_price_str, selling_price_str, own_buying_price, spread, timestamp, bid_count, listing_count, rarity])
-                elif own_selling_price:
-                    writer.writerow([item_name, category_name, buying_price_str, selling_price_str, own_selling_price, spread, timestamp, bid_count, listing_count, rarity])
-            else:
-                # 普通文件且没有本人价格时的标准格式
-                if not file_exists:
-                    writer.writerow(['物品名称', '物品分类', '购买价格', '出售价格', '低买低卖溢价', '时间戳', '出价数量', '上架数量', '稀有度'])
-                
-                writer.writerow([item_name, category_name, buying_price_str, selling_price_str, spread, timestamp, bid_count, listing_count, rarity])
+                    # 将逗号替换为空字符，然后转换为整数
+                    clean_price = price.replace(',', '').replace(' ', '')
+                    buying_prices.append(int(clean_price))
+                except:
+                    print(f"无法解析购买价格: {price}")
+            elif 'selling' in key:
+                try:
+                    # 将逗号替换为空字符，然后转换为整数
+                    clean_price = price.replace(',', '').replace(' ', '')
+                    selling_prices.append(int(clean_price))
+                except:
+                    print(f"无法解析出售价格: {price}")
         
+        # 计算低买低卖溢价，确保使用整数
+        spread = "N/A"
+        if buying_prices and selling_prices:
+            try:
+                max_buying = max(buying_prices)
+                min_selling = min(selling_prices)
+                # 修改计算方式：(最低出售价格*0.8-1) - (最高购买价格+1)
+                spread = int((min_selling * 0.8 - 1) - (max_buying + 1))  # 转换为整数
+            except Exception as e:
+                print(f"计算低买低卖溢价时出错: {str(e)}")
+        
+        # 合并多个价格为一个字符串，用分号分隔，并添加逗号分隔符
+        buying_price_str = '; '.join(format_price_with_commas(p) for p in buying_prices) if buying_prices else ''
+        selling_price_str = '; '.join(format_price_with_commas(p) for p in selling_prices) if selling_prices else ''
+        
+        # 获取额外信息
+        bid_count = price_data.get('bid_count', 0)
+        listing_count = price_data.get('listing_count', 0)
+        rarity = price_data.get('rarity', '')
+        
+        # 所有文件使用同一固定表头（PriceWriter.PRICE_COLUMNS），本人价格列没有值时为空
+        record = {
+            '物品名称': item_name,
+            '物品分类': category_name,
+            '购买价格': buying_price_str,
+            '出售价格': selling_price_str,
+            '本人购买价格': own_buying_price or '',
+            '本人售出价格': own_selling_price or '',
+            '低买低卖溢价': spread,
+            '时间戳': timestamp,
+            '出价数量': bid_count,
+            '上架数量': listing_count,
+            '稀有度': rarity
+        }
+        
+        # 同时写入价格数据库（带类型的列，供筛选查询使用）
+        is_bid_tracker_file = '报价追踪.csv' in csv_file_path
+        source = PriceStore.TRACKER_SOURCE if is_bid_tracker_file else PriceStore.source_from_path(csv_file_path)
+        store_row = PriceStore.build_row(source, item_name, category_name, buying_prices, selling_prices,
+                                         own_buying=own_buying_price, own_selling=own_selling_price, spread=spread,
+                                         bid_count=bid_count, listing_count=listing_count, rarity=rarity, timestamp=timestamp)
+        
+        # 写入服务运行时放入队列由写入线程批量写出，否则直接写入；写出后增量更新物品属性索引
+        PriceWriter.write(csv_file_path, record, store_row, (item_name, category_name, {'rarity': rarity}))
         print(f"价格数据已保存到: {csv_file_path}")
         return True
     except Exception as e:
@@ -630,7 +588,7 @@ def save_price_data(item_name, category_name, price_data, csv_file_path=None):
 
 def get_rarity_from_history(item_name, category_name):
     """
-    从历史CSV文件中查找物品的稀有度
+    从物品属性索引中查找物品的稀有度（索引由历史价格数据建立并随写入增量更新）
     
     参数:
         item_name: 物品名称
@@ -640,29 +598,12 @@ def get_rarity_from_history(item_name, category_name):
         找到的稀有度，如果未找到则返回"未知"
     """
     try:
-        # 获取当前目录下的所有CSV文件
-        csv_files = [f for f in os.listdir("./market_data") if f.startswith("price_data_") and f.endswith(".csv")]
-        
-        # 按时间倒序排序，优先使用最新的数据
-        csv_files.sort(reverse=True)
-        
-        for csv_file in csv_files:
-            csv_path = os.path.join("./market_data", csv_file)
-            try:
-                with open(csv_path, 'r', encoding='utf-8') as f:
-                    reader = csv.DictReader(f)
-                    for row in reader:
-                        if row['物品名称'] == item_name and row['物品分类'] == category_name:
-                            rarity = row['稀有度']
-                            if rarity and rarity != "未知":
-                                print(f"从历史数据中找到稀有度: {rarity}")
-                                return rarity
-            except Exception as e:
-                print(f"读取历史CSV文件时出错: {str(e)}")
-                continue
-        
-        print("未在历史数据中找到稀有度")
-        return "未知"
+        rarity = ItemAttributes.get(item_name, category_name, 'rarity')
+        if rarity != "未知":
+            print(f"从历史数据中找到稀有度: {rarity}")
+        else:
+            print("未在历史数据中找到稀有度")
+        return rarity
     except Exception as e:
         print(f"查找历史稀有度时出错: {str(e)}")
         return "未知"
@@ -689,31 +630,63 @@ def process_screenshot(screenshot_path, item_name="未知物品", category_name=
         print(f"无法读取截图: {screenshot_path}")
         return [], None, {}
     
-    # 识别所有价格区域和额外信息
-    result = recognize_all_price_areas(screenshot_path, detect_own_prices)
+    result = process_frame(img, item_name, category_name, detect_own_prices, auto_save,
+                           keep_images=True, image_name=screenshot_path)
+    return result['price_img_paths'], result['markup_img_path'], result['price_data']
+
+def process_frame(img, item_name="未知物品", category_name="未知分类", detect_own_prices=False, auto_save=True,
+                  keep_images=None, image_name="frame.png"):
+    """
+    在内存中处理一帧物品详情页截图，不读取也不写入任何图像文件（keep_images为True时除外）
+    
+    参数:
+        img: BGR截图数组
+        item_name: 物品名称
+        category_name: 物品分类
+        detect_own_prices: 是否检测本人价格（默认False）
+        auto_save: 是否自动保存数据到CSV（默认True）
+        keep_images: 是否保存价格区域图像和带标记的原图，默认为KEEP_DEBUG_IMAGES
+        image_name: 保存图像时用于生成文件名的截图名称
+        
+    返回:
+        结果字典:
+            price_data: 价格数据字典（与process_screenshot返回的相同）
+            areas: 每个价格区域的 {'label', 'region', 'label_region', 'confidence', 'price'}
+            price_img_paths: 保存的价格区域图像路径列表（未保存时为空）
+            markup_img_path: 保存的带标记原图路径（未保存时为None）
+    """
+    if keep_images is None:
+        keep_images = KEEP_DEBUG_IMAGES
+    empty_result = {'price_data': {}, 'areas': [], 'price_img_paths': [], 'markup_img_path': None}
     
-    if not result or len(result) < 3:
+    # 识别所有价格区域、额外信息以及价格（一次批量OCR）
+    result = recognize_all_price_areas(img, detect_own_prices, with_prices=True)
+    
+    if not result or len(result) < 5:
         print("未找到任何价格区域")
-        return [], None, {}
+        return empty_result
     
-    found_areas, bid_count, listing_count, rarity_text = result
+    found_areas, bid_count, listing_count, rarity_text, price_texts = result
     
     if not found_areas:
         print("未找到任何价格区域")
-        return [], None, {}
+        return empty_result
     
     # 如果稀有度识别失败，尝试从历史数据中获取
     if rarity_text == "未知":
         rarity_text = get_rarity_from_history(item_name, category_name)
     
-    # 在原图上标记所有区域
-    img_with_markup = create_markup_image(img, found_areas, bid_count, listing_count, rarity_text)
-    
-    # 保存带标记的原图
-    markup_img_path = save_price_image(img_with_markup, screenshot_path, "all", 0, with_markup=True)
+    # 在原图上标记所有区域并保存（仅在需要保留图像时）
+    markup_img_path = None
+    if keep_images:
+        img_with_markup = create_markup_image(img, found_areas, bid_count, listing_count, rarity_text)
+        markup_img_path = save_price_image(img_with_markup, image_name, "all", 0, with_markup=True)
     
-    # 保存每个价格区域图像并进行OCR识别
+    # 整理每个价格区域的识别结果
     price_img_paths = []
+    areas = [{'label': label_type, 'region': price_region, 'label_region': label_region,
+              'confidence': float(confidence), 'price': price}
+             for (_, price_region, label_type, label_region, confidence), price in zip(found_areas, price_texts)]
     label_counts = {}  # 用于同类型标签计数
     price_data = {
         'bid_count': bid_count,
@@ -721,21 +694,19 @@ def process_screenshot(screenshot_path, item_name="未知物品", category_name=
         'rarity': rarity_text
     }
     
-    for price_img, _, label_type, _, _ in found_areas:
+    for (price_img, _, label_type, _, _), price in zip(found_areas, price_texts):
         # 获取该类型的索引
         if label_type in label_counts:
             label_counts[label_type] += 1
         else:
             label_counts[label_type] = 0
         
-        # 保存价格区域图像
-        price_img_path = save_price_image(price_img, screenshot_path, label_type, label_counts[label_type])
-        price_img_paths.append(price_img_path)
+        # 保存价格区域图像（仅在需要保留图像时）
+        if keep_images:
+            price_img_paths.append(save_price_image(price_img, image_name, label_type, label_counts[label_type]))
         
         # 识别价格
         if label_type in ['buying', 'selling', 'own_buying', 'own_selling']:
-            price = recognize_price(price_img)
-            
             # 处理本人价格：替换对应的普通价格字段
             if label_type == 'own_buying':
                 # 本人购买价格替换购买价格
@@ -793,11 +764,11 @@ def process_screenshot(screenshot_path, item_name="未知物品", category_name=
         if price_data:
             save_price_data(item_name, category_name, price_data)
     
-    return price_img_paths, markup_img_path, price_data
+    return {'price_data': price_data, 'areas': areas, 'price_img_paths': price_img_paths, 'markup_img_path': markup_img_path}
 
 def process_dir(screenshots_dir, item_names=None):
     """
-    处理目录中的所有截图
+    处理目录中的所有截图（逐张处理并保存图像，用于调试；批量重新识别存档截图请使用ReprocessArchive.py）
     
     参数:
         screenshots_dir: 截图目录路径
@@ -934,15 +905,12 @@ def detect_edit_button(img):
             print(f"警告: 编辑按钮模板不存在: {template_path}")
             return False
         
-        # 读取编辑按钮模板
-        template = cv2.imread(template_path)
+        # 从模板缓存读取已调整为编辑按钮区域大小的模板
+        template = TemplateCache.get(template_path, (w, h))
         if template is None:
             print(f"无法读取编辑按钮模板: {template_path}")
             return False
         
-        # 调整模板大小匹配编辑按钮区域
-        template = cv2.resize(template, (w, h))
-        
         # 进行模板匹配
         result = cv2.matchTemplate(edit_region, template, cv2.TM_CCOEFF_NORMED)
         _, max_val, _, _ = cv2.minMaxLoc(result)
@@ -10,6 +10,13 @@ import SimpleScroll as scroll
 import threading
 import concurrent.futures
 import MarketPriceRecognizer as mpr
+import MarketPipeline
+import RecognitionPool
+import PriceWriter
+import TemplateCache
+import OcrEngine
+import ImageProc
+import settings as st
 import json
 import argparse
 import numpy as np
@@ -26,6 +33,9 @@ START_ITEM_INDEX = 0     # 起始物品索引（0=该分类的第一个物品）
 # 预设物品文件路径（默认为None，表示处理所有物品）
 PRESET_FILE = None
 
+# 只处理指定的分类（英文代码集合，默认为None表示处理所有分类），多设备分片采集时由协调脚本传入
+CATEGORY_FILTER = None
+
 # 导入分类和物品映射
 sys.path.append("./templates/modern_warship/")
 try:
@@ -60,17 +70,39 @@ DEFAULT_DELAY = 0.1  # 默认延时时间(秒)
 BACK_DELAY = 0.3  # 从物品详情页返回时的更快延迟(秒)
 SCROLL_AFTER_DELAY = 0.1  # 滑动后等待时间
 SCREENSHOT_DELAY = 0.5  # 截图前的等待时间(秒)，确保界面完全加载
+ADAPTIVE_WAIT = True  # 自适应等待：轮询画面，不再变化时提前结束上面的固定延时（最多等待固定延时，不会更慢）
 MAX_COMPENSATION_ATTEMPTS = 3  # 物品识别失败后的最大补偿移动尝试次数
 
+# 物品定位设置
+SCREEN_SIZE = (2412, 1080)  # 目标设备分辨率 (宽, 高)，与 templates/home_screen.png 一致，脚本中的坐标均基于此分辨率
+# 左侧分类栏右边界：物品列表的滑动中线在 x=1400（SimpleScroll.MARKET_DOWN），列表右边缘为屏幕右边缘2412，
+# 对称得到列表左边缘约 2*1400-2412=388；分类栏本身在 x=220~320 处点击和滑动，留出少量余量取380
+CATEGORY_BAR_RIGHT = 380
+# 顶部标题栏下边界：第一个分类标签点击位置为 y=163（main中的click_point((220, 163))），分类图标模板高约50，
+# 标签上沿约 y=138，取100保证第一行物品不被裁掉
+TITLE_BAR_BOTTOM = 100
+MARKET_GRID_REGION = (CATEGORY_BAR_RIGHT, TITLE_BAR_BOTTOM,
+                      SCREEN_SIZE[0] - CATEGORY_BAR_RIGHT, SCREEN_SIZE[1] - TITLE_BAR_BOTTOM)  # 物品列表区域 (x, y, w, h)
+ITEM_MATCH_SCALE = 0.5  # 物品定位的粗匹配缩放比例（1.0表示只在原分辨率匹配）
+BATCH_LOCATE_ITEMS = True  # 不需要滑动的第一页只截图一次，批量定位该页所有物品的位置（返回列表后第一页位置不变，坐标可直接复用）
+LOADING_ROI = (1207, 627, 1327, 668)  # loading图标区域 (x1, y1, x2, y2)
+LOADING_THRESHOLD = 0.6  # loading图标匹配度或中灰色占比达到该值视为加载中
+LOADING_SAMPLE_STEP = 16  # 估计中灰色占比时的采样步长
+
 # 价格识别相关设置
 ENABLE_PRICE_RECOGNITION = True  # 是否启用价格识别
 MAX_RECOGNITION_WORKERS = 4     # 最大同时运行的价格识别线程数
 KEEP_TEMP_IMAGES = False        # 是否保留临时价格图像
+PIPELINE_MODE = True            # 流水线模式：截图解码、loading检测、识别和保存在后台进行，导航不等待
+RECOGNITION_BACKEND = "thread"  # 价格识别后端："thread" 在线程中识别，"process" 在多个识别进程中识别
+RECOGNITION_PROCESSES = RecognitionPool.RECOGNITION_PROCESSES  # 多进程后端的识别进程数
 # 按小时生成价格数据文件
 PRICE_DATA_FILE = f"./market_data/price_data_{datetime.now().strftime('%Y%m%d_%H')}.csv"
 
 # 创建线程池
 price_executor = None  # 将在main函数中初始化
+pipeline = None  # 流水线模式下在main函数中初始化
+recognition_pool = None  # 多进程识别后端，在main函数中初始化
 
 # 确保所需目录存在
 for directory in [TEMPLATE_DIR, OUTPUT_DIR, SCREENSHOT_DIR]:
@@ -125,15 +157,18 @@ def take_stable_screenshot(filename_prefix):
     """
     获取稳定的屏幕截图（确保没有loading图标）
     
+    截图通过exec-out直接读取到内存中进行loading检测，只有稳定的截图才会写入磁盘
+    
     参数:
         filename_prefix: 文件名前缀
     
     返回:
-        稳定截图的路径或None
+        稳定截图的路径，多次尝试后仍在加载时返回None
     """
     try:
         max_attempts = 5  # 最大尝试次数
         attempt = 0
+        screen = None
         
         while attempt < max_attempts:
             attempt += 1
@@ -142,25 +177,31 @@ def take_stable_screenshot(filename_prefix):
             # 获取截图
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
             screenshot_path = f"{SCREENSHOT_DIR}{filename_prefix}_{timestamp}.png"
-            rsh.ADBHelper.screenCapture(rsh.deviceID, screenshot_path)
+            screen = rsh.ADBHelper.screenCaptureArray(rsh.deviceID)
+            if screen is None:
+                # 内存截图失败时退回到文件截图
+                rsh.ADBHelper.screenCapture(rsh.deviceID, screenshot_path)
+                screen = cv2.imread(screenshot_path)
             
             # 检查是否有loading图标
-            if not check_loading_indicator(screenshot_path):
+            if screen is not None and not check_loading_indicator(screen):
+                cv2.imwrite(screenshot_path, screen)
                 print(f"获取到稳定截图: {screenshot_path}")
                 return screenshot_path
             
             print(f"截图还在加载中，将重试...")
             # 删除不稳定的截图
             try:
-                os.remove(screenshot_path)
+                if os.path.exists(screenshot_path):
+                    os.remove(screenshot_path)
             except:
                 pass
             
             # 额外等待一段时间再尝试
             time.sleep(0.05)
         
-        print(f"达到最大尝试次数({max_attempts})，使用最后一次截图")
-        return screenshot_path
+        print(f"达到最大尝试次数({max_attempts})，截图仍处于加载状态")
+        return None
     except Exception as e:
         print(f"获取稳定截图失败: {str(e)}")
         return None
@@ -206,21 +247,21 @@ def open_market():
         print(f"打开市场时出错: {str(e)}，继续执行")
         return True  # 出错也继续执行
 
-def go_back():
-    """返回上一级界面"""
+def go_back(settle_delay=BACK_DELAY):
+    """返回上一级界面，settle_delay为关闭自适应等待时返回后的固定延时"""
     try:
         print("正在返回上一级界面...")
         # 直接使用Android系统返回键，不再尝试图像识别
         try:
-            os.system(f"adb -s {rsh.deviceID} shell input keyevent 4")
-            rsh.delay(BACK_DELAY)
+            rsh.ADBHelper.keyEvent(rsh.deviceID, 4)
+            wait_for_screen(settle_delay)
         except Exception as e:
             print(f"使用Android返回键出错: {str(e)}，继续执行")
             
             # 图像识别作为备选方案
             if retry_operation(center_click, 2, f"{TEMPLATE_DIR}back_button.png"):
                 print("已点击返回按钮")
-                rsh.delay(BACK_DELAY)
+                wait_for_screen(settle_delay)
         return True
     except Exception as e:
         print(f"返回上一级界面时出错: {str(e)}，继续执行")
@@ -271,14 +312,38 @@ def get_item_templates(category_name):
         print(f"获取物品模板时出错: {str(e)}")
         return []
 
-def access_item(item_info, item_number):
-    """访问特定物品的详情页面，item_number是当前物品在分类中的序号(从1开始)"""
+def locate_page_items(item_templates):
+    """
+    截取一次物品列表画面，批量定位分类中所有物品图标的位置
+    
+    参数:
+        item_templates: get_item_templates返回的物品模板列表
+    
+    返回:
+        {物品名: 左上角坐标}，只包含在当前画面中找到的物品
+    """
+    try:
+        screen = rsh.capture_screen()
+        positions = ImageProc.locate_batch(screen, [item['path'] for item in item_templates],
+                                           st.accuracy, MARKET_GRID_REGION, ITEM_MATCH_SCALE)
+        page_positions = {item['name']: pos for item, pos in zip(item_templates, positions) if pos is not None}
+        print(f"批量定位: 当前画面中找到 {len(page_positions)}/{len(item_templates)} 个物品")
+        return page_positions
+    except Exception as e:
+        print(f"批量定位物品时出错: {str(e)}")
+        return {}
+
+def access_item(item_info, item_number, known_left_top=None):
+    """
+    访问特定物品的详情页面，item_number是当前物品在分类中的序号(从1开始)
+    known_left_top为批量定位得到的图标左上角坐标，提供时直接点击，不再截图识别
+    """
     try:
         print(f"正在访问物品: {item_info['display_name']} (分类: {item_info['display_category']}, 序号: {item_number})")
         
         # 获取图像尺寸用于计算中心点
         try:
-            img = cv2.imread(item_info['path'])
+            img = TemplateCache.get(item_info['path'])
             if img is not None:
                 h, w = img.shape[:2]
                 
@@ -286,13 +351,13 @@ def access_item(item_info, item_number):
                 normal_scroll_times = calculate_scroll_times(item_number)
                 
                 # 尝试识别物品，如果失败则使用补偿移动重试
-                left_top = None
+                left_top = known_left_top
                 compensation_attempts = 0
                 max_compensation_cycles = 3  # 最多进行3个完整的补偿循环(每个循环包含4次尝试)
                 
                 while not left_top and compensation_attempts < MAX_COMPENSATION_ATTEMPTS * max_compensation_cycles:
-                    # 使用safe_find_pic查找图标并返回左上角坐标
-                    left_top = safe_find_pic(item_info['path'])
+                    # 使用safe_find_pic在物品列表区域内查找图标并返回左上角坐标
+                    left_top = safe_find_pic(item_info['path'], region=MARKET_GRID_REGION, scale=ITEM_MATCH_SCALE)
                     
                     if left_top:
                         # 成功识别，跳出循环
@@ -317,28 +382,28 @@ def access_item(item_info, item_number):
                         center_y = y + h // 2
                         center_pos = (center_x, center_y)
                         
-                        print(f"找到物品图标，中心位置：{center_pos}" + (f"（补偿移动后识别成功）" if compensation_attempts > 0 else ""))
+                        print(f"找到物品图标，中心位置：{center_pos}" + (f"（补偿移动后识别成功）" if compensation_attempts > 0 else "") + (f"（使用批量定位结果）" if known_left_top else ""))
                         rsh.touch(center_pos)
                         
                         # 点击物品后等待界面初始加载
                         print(f"等待物品界面初始加载 {DEFAULT_DELAY} 秒...")
                         rsh.delay(DEFAULT_DELAY)
                         
-                        # 额外等待界面完全加载稳定，确保截图时界面不再模糊
-                        print(f"等待界面完全稳定 {SCREENSHOT_DELAY} 秒...")
-                        time.sleep(SCREENSHOT_DELAY)
+                        # 等待界面完全加载稳定，确保截图时界面不再模糊
+                        stable_raw = wait_for_detail_page()
+                        
+                        # 流水线模式：截图字节交给后台处理，立即返回列表
+                        pipeline_result = capture_to_pipeline(item_info, item_number, stable_raw)
+                        if pipeline_result:
+                            return pipeline_result
                         
                         # 获取稳定的物品详情页截图
+                        # take_stable_screenshot已在内存中完成loading检测，始终处于加载状态时返回None
                         screenshot_path = take_stable_screenshot(f"item_detail_{item_info['name']}")
                         if screenshot_path:
                             print(f"已保存物品详情页截图: {screenshot_path}")
                         else:
-                            print("无法获取稳定的物品详情页截图")
-                            screenshot_path = take_screenshot(f"item_detail_{item_info['name']}")  # 退回到普通截图
-                        
-                        # 检查loading图标
-                        if check_loading_indicator(screenshot_path):
-                            print("检测到loading图标，需要重新截图")
+                            print("检测到loading图标，无法获取稳定的物品详情页截图")
                             return {
                                 'success': False,
                                 'screenshot': None
@@ -394,25 +459,24 @@ def access_item(item_info, item_number):
                     print(f"等待物品界面初始加载 {DEFAULT_DELAY} 秒...")
                     rsh.delay(DEFAULT_DELAY)
                     
-                    # 额外等待界面完全加载稳定，确保截图时界面不再模糊
-                    print(f"等待界面完全稳定 {SCREENSHOT_DELAY} 秒...")
-                    time.sleep(SCREENSHOT_DELAY)
+                    # 等待界面完全加载稳定，确保截图时界面不再模糊
+                    stable_raw = wait_for_detail_page()
                     
-                    # 检查loading图标
-                    if check_loading_indicator(f"{SCREENSHOT_DIR}item_detail_{item_info['name']}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.png"):
-                        print("检测到loading图标，需要重新截图")
-                        return {
-                            'success': False,
-                            'screenshot': None
-                        }
+                    # 流水线模式：截图字节交给后台处理，立即返回列表
+                    pipeline_result = capture_to_pipeline(item_info, item_number, stable_raw)
+                    if pipeline_result:
+                        return pipeline_result
                     
-                    # 获取稳定的物品详情页截图
+                    # 获取稳定的物品详情页截图（take_stable_screenshot已在内存中完成loading检测）
                     screenshot_path = take_stable_screenshot(f"item_detail_{item_info['name']}")
                     if screenshot_path:
                         print(f"已保存物品详情页截图: {screenshot_path}")
                     else:
-                        print("无法获取稳定的物品详情页截图")
-                        screenshot_path = take_screenshot(f"item_detail_{item_info['name']}")  # 退回到普通截图
+                        print("检测到loading图标，无法获取稳定的物品详情页截图")
+                        return {
+                            'success': False,
+                            'screenshot': None
+                        }
                     
                     # 启动非阻塞价格识别
                     if ENABLE_PRICE_RECOGNITION and price_executor is not None:
@@ -456,6 +520,10 @@ def parse_arguments():
     parser.add_argument('--preset', type=str, default=None, help='预设文件路径')
     parser.add_argument('--output', type=str, default=None, help='自定义输出CSV文件名（不含扩展名）')
     parser.add_argument('--price_output', type=str, default=None, help='自定义价格数据CSV文件名（不含扩展名）')
+    parser.add_argument('--device', type=str, default=None, help='指定设备ID（默认使用第一个已连接设备）')
+    parser.add_argument('--categories', type=str, default=None, help='只处理指定分类，英文代码以逗号分隔')
+    parser.add_argument('--backend', type=str, choices=['thread', 'process'], default=RECOGNITION_BACKEND, help='价格识别后端')
+    parser.add_argument('--workers', type=int, default=None, help='多进程后端的识别进程数')
     return parser.parse_args()
 
 def generate_output_filename(custom_name=None, file_type="access"):
@@ -532,7 +600,7 @@ def click_category_icon(category_name):
         print(f"点击分类 [{get_category_name(category_name)}] 图标")
         if retry_operation(center_click, 3, icon_path):
             print(f"成功进入 {get_category_name(category_name)} 分类")
-            rsh.delay(DEFAULT_DELAY)
+            wait_for_screen(DEFAULT_DELAY)
             return True
         else:
             print(f"无法点击分类图标: {category_name}，继续执行")
@@ -558,46 +626,80 @@ def calculate_scroll_times(item_number):
 
 def wait_after_scroll():
     """滑动后的额外等待，确保滑动完全稳定后再继续操作"""
-    print(f"等待滑动稳定 {SCROLL_AFTER_DELAY} 秒...")
-    time.sleep(SCROLL_AFTER_DELAY)
+    wait_for_screen(SCROLL_AFTER_DELAY)
 
-def process_item_price(screenshot_path, item_name, category_name, delete_after=True):
+def wait_for_screen(fallback_delay, is_loading=None):
+    """
+    等待界面稳定：画面不再变化（且不在加载中）时立即返回，最多等待fallback_delay秒；关闭自适应等待时使用固定延时
+    
+    参数:
+        fallback_delay: 固定延时(秒)，也是自适应等待的上限
+        is_loading: 可选，loading检测函数，接收BGR图像
+    
+    返回:
+        最后一帧完整截图的原始字节，使用固定延时或没有截取完整帧时返回None
+    """
+    if ADAPTIVE_WAIT:
+        start = time.time()
+        _, raw = rsh.wait_until_stable(fallback_delay, is_loading)
+        print(f"自适应等待用时 {time.time() - start:.2f} 秒（固定延时为 {fallback_delay} 秒）")
+        return raw
+    print(f"等待界面稳定 {fallback_delay} 秒...")
+    time.sleep(fallback_delay)
+    return None
+
+def wait_for_detail_page():
+    """
+    等待物品详情页加载完成
+    流水线模式下loading检测由后台解码线程完成，这里只等待画面静止；普通模式下同时等待loading消失
+    
+    返回:
+        最后一帧完整截图的原始字节，使用固定延时或没有截取完整帧时返回None
+    """
+    return wait_for_screen(SCREENSHOT_DELAY, None if pipeline is not None else check_loading_indicator)
+
+def process_item_price(screenshot, item_name, category_name, delete_after=True, auto_save=True, image_name=None):
     """
     处理物品价格识别（用于线程池）
     
     参数:
-        screenshot_path: 物品详情页截图路径
+        screenshot: 物品详情页截图路径，或已在内存中的BGR截图数组
         item_name: 物品名称
         category_name: 物品分类名称
-        delete_after: 处理后是否删除临时图像文件
+        delete_after: 是否不保留价格区域图像（为True时识别全程在内存中进行，不产生任何图像文件）
+        auto_save: 是否在识别后直接保存到CSV（流水线模式下由保存线程统一保存）
+        image_name: 保留图像时用于生成文件名的截图名称，默认为截图路径
+    
+    返回:
+        价格数据字典，出错时返回None
     """
     try:
         print(f"[价格识别] 开始处理 {item_name} ({category_name})")
         
-        # 使用全局的价格数据文件路径
-        global PRICE_DATA_FILE
-        mpr.PRICE_DATA_FILE = PRICE_DATA_FILE
-        
-        # 设置不保存临时图像
-        if not KEEP_TEMP_IMAGES:
-            # 临时改变输出目录到临时文件夹
-            original_output_dir = mpr.OUTPUT_DIR
-            mpr.OUTPUT_DIR = "./cache/temp_price_images/"
-            
-            # 确保临时目录存在
-            if not os.path.exists(mpr.OUTPUT_DIR):
-                os.makedirs(mpr.OUTPUT_DIR)
+        # 读取截图（内存中的截图直接使用）
+        if isinstance(screenshot, np.ndarray):
+            img = screenshot
+        else:
+            img = cv2.imread(screenshot)
+            image_name = image_name or screenshot
+        if img is None:
+            print(f"[价格识别] 无法读取截图: {screenshot}")
+            return None
         
         # 执行价格识别
-        price_img_paths, markup_img_path, price_data = mpr.process_screenshot(
-            screenshot_path, 
-            item_name, 
-            category_name
-        )
-        
-        # 恢复原始输出目录
-        if not KEEP_TEMP_IMAGES:
-            mpr.OUTPUT_DIR = original_output_dir
+        if recognition_pool is not None:
+            # 多进程后端：识别进程只返回结果，保存在本进程中完成
+            result = recognition_pool.recognize(img, item_name, category_name,
+                                                keep_images=not delete_after, image_name=image_name or "frame.png")
+            price_data = result['price_data']
+            if auto_save and price_data:
+                mpr.save_price_data(item_name, category_name, price_data, PRICE_DATA_FILE)
+        else:
+            # 使用全局的价格数据文件路径
+            mpr.PRICE_DATA_FILE = PRICE_DATA_FILE
+            result = mpr.process_frame(img, item_name, category_name, auto_save=auto_save,
+                                       keep_images=not delete_after, image_name=image_name or "frame.png")
+            price_data = result['price_data']
         
         # 打印识别结果
         if price_data:
@@ -608,27 +710,95 @@ def process_item_price(screenshot_path, item_name, category_name, delete_after=T
         else:
             print(f"[价格识别] {item_name} 未识别到价格数据")
         
-        # 删除临时文件
-        if delete_after:
-            # 删除价格区域图像
-            for path in price_img_paths:
-                try:
-                    if os.path.exists(path):
-                        os.remove(path)
-                except Exception as e:
-                    print(f"[价格识别] 删除临时文件失败: {path}, 错误: {str(e)}")
-            
-            # 删除带标记的原图
-            if markup_img_path and os.path.exists(markup_img_path):
-                try:
-                    os.remove(markup_img_path)
-                except Exception as e:
-                    print(f"[价格识别] 删除临时文件失败: {markup_img_path}, 错误: {str(e)}")
-        
-        return True
+        return price_data
     except Exception as e:
         print(f"[价格识别] 处理出错: {str(e)}")
-        return False
+        return None
+
+def capture_to_pipeline(item_info, item_number, raw=None):
+    """
+    流水线模式下读取物品详情页截图的原始字节并提交给流水线，随后立即返回列表
+    
+    参数:
+        item_info: 物品信息
+        item_number: 物品在分类中的序号(从1开始)，loading重试时用于重新滑动
+        raw: 可选，等待画面稳定时已经取得的截图原始字节，提供时不再重新截图
+    
+    返回:
+        访问结果字典，未启用流水线或截图失败时返回None（由调用方走普通截图流程）
+    """
+    if pipeline is None:
+        return None
+    
+    if raw is None:
+        raw = rsh.ADBHelper.screenCaptureRaw(rsh.deviceID)
+    if raw is None:
+        print("读取截图原始数据失败，改用普通截图流程")
+        return None
+    
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    screenshot_path = f"{SCREENSHOT_DIR}item_detail_{item_info['name']}_{timestamp}.png"
+    pipeline.submit(raw, {'item': item_info, 'item_number': item_number, 'screenshot': screenshot_path})
+    print(f"已提交物品详情页截图到流水线: {screenshot_path}")
+    
+    # 返回到市场列表
+    go_back()
+    
+    return {
+        'success': True,
+        'screenshot': screenshot_path
+    }
+
+def recognize_pipeline_frame(screen, context):
+    """流水线识别阶段：保存稳定截图，直接在内存中的截图上识别价格，不写入CSV"""
+    cv2.imwrite(context['screenshot'], screen)
+    if not ENABLE_PRICE_RECOGNITION:
+        return None
+    item = context['item']
+    price_data = process_item_price(screen, item['display_name'], item['display_category'],
+                                    not KEEP_TEMP_IMAGES, auto_save=False, image_name=context['screenshot'])
+    return price_data or None
+
+def persist_pipeline_result(context, price_data):
+    """流水线保存阶段：由单个线程按顺序写入价格数据CSV"""
+    item = context['item']
+    mpr.save_price_data(item['display_name'], item['display_category'], price_data, PRICE_DATA_FILE)
+
+def retry_pipeline_items(results, max_rounds=2):
+    """
+    重新访问流水线中检测到仍在加载的物品（需要在切换分类前调用）
+    
+    参数:
+        results: 访问记录列表，重试结果追加到其中
+        max_rounds: 最大重试轮数
+    """
+    if pipeline is None:
+        return
+    
+    for round_index in range(max_rounds):
+        retries = pipeline.take_retries()
+        if not retries:
+            return
+        print(f"第 {round_index + 1} 轮重新访问 {len(retries)} 个截图仍在加载的物品")
+        for context in retries:
+            item = context['item']
+            scroll_times = calculate_scroll_times(context['item_number'])
+            if scroll_times > 0:
+                scroll.market_down(scroll_times, SCROLL_AFTER_DELAY)
+                wait_after_scroll()
+            access_result = access_item(item, context['item_number'])
+            results.append({
+                'category': item['category'],
+                'category_display': item['display_category'],
+                'name': item['name'],
+                'name_display': item['display_name'],
+                'success': access_result['success'],
+                'screenshot': access_result['screenshot'],
+                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+    
+    for context in pipeline.take_retries():
+        print(f"物品 {context['item']['display_name']} 多次截图仍在加载，放弃本次识别")
 
 def load_preset_items():
     """加载预设物品列表"""
@@ -657,16 +827,24 @@ def load_preset_items():
 def main():
     """主函数"""
     try:
-        global price_executor, OUTPUT_FILE, PRICE_DATA_FILE
+        global price_executor, pipeline, recognition_pool, OUTPUT_FILE, PRICE_DATA_FILE
         
         # 解析命令行参数
         args = parse_arguments()
         
         # 更新起始位置设置
-        global START_CATEGORY_INDEX, START_ITEM_INDEX, PRESET_FILE
+        global START_CATEGORY_INDEX, START_ITEM_INDEX, PRESET_FILE, CATEGORY_FILTER
         START_CATEGORY_INDEX = args.start_category
         START_ITEM_INDEX = args.start_item
         PRESET_FILE = args.preset
+        if args.categories:
+            CATEGORY_FILTER = set(args.categories.split(','))
+        if args.device:
+            rsh.deviceID = args.device
+        global RECOGNITION_BACKEND, RECOGNITION_PROCESSES
+        RECOGNITION_BACKEND = args.backend
+        if args.workers:
+            RECOGNITION_PROCESSES = args.workers
         
         # 生成输出文件名
         OUTPUT_FILE = generate_output_filename(args.output, "access")
@@ -702,6 +880,9 @@ def main():
         if preset_items:
             print(f"\n注意: 脚本将只处理预设的 {len(preset_items)} 个物品")
         
+        if CATEGORY_FILTER:
+            print(f"\n注意: 脚本将只处理以下分类: {', '.join(get_category_name(c) for c in CATEGORY_FILTER)}")
+        
         # 检查设备ID是否已设置
         if not rsh.deviceID:
             try:
@@ -724,6 +905,9 @@ def main():
             except Exception as e:
                 print(f"设置滚动工具的设备ID时出错: {str(e)}")
         
+        # 预加载所有模板图片，之后的匹配不再读取磁盘
+        TemplateCache.preload()
+        
         # 准备结果记录
         results = []
         total_items_processed = 0
@@ -741,10 +925,31 @@ def main():
         
         start_time = time.time()
         
+        # 初始化多进程识别后端，识别线程只负责把截图交给识别进程并等待结果
+        recognition_threads = MAX_RECOGNITION_WORKERS
+        if ENABLE_PRICE_RECOGNITION and RECOGNITION_BACKEND == "process":
+            print("初始化多进程价格识别后端...")
+            recognition_pool = RecognitionPool.RecognitionPool(RECOGNITION_PROCESSES, settings={
+                'OUTPUT_DIR': mpr.OUTPUT_DIR,
+                'KEEP_DEBUG_IMAGES': mpr.KEEP_DEBUG_IMAGES,
+                'USE_GLYPH_OCR': mpr.USE_GLYPH_OCR,
+            })
+            recognition_threads = recognition_pool.processes
+        
+        # 启动价格数据写入服务，所有识别线程的价格数据由一个写入线程批量写出
+        if ENABLE_PRICE_RECOGNITION:
+            PriceWriter.start()
+        
         # 初始化价格识别线程池
         if ENABLE_PRICE_RECOGNITION:
             print("初始化价格识别线程池...")
-            price_executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_RECOGNITION_WORKERS)
+            price_executor = concurrent.futures.ThreadPoolExecutor(max_workers=recognition_threads)
+        
+        # 初始化截图处理流水线
+        if PIPELINE_MODE:
+            print("初始化截图处理流水线...")
+            pipeline = MarketPipeline.CrawlPipeline(recognize_pipeline_frame, persist_pipeline_result,
+                                                    check_loading_indicator, recognition_threads).start()
         
         # 转换字典为列表以支持索引访问
         category_items = list(CATEGORY_DICT.items())
@@ -756,6 +961,12 @@ def main():
             if category_index < START_CATEGORY_INDEX:
                 print(f"跳过分类 [{category_index+1}/{len(category_items)}]: {category_display}")
                 continue
+            
+            # 跳过未分配给本设备的分类（分类栏的滑动状态仍需保持一致）
+            if CATEGORY_FILTER is not None and category_name not in CATEGORY_FILTER:
+                if category_name == "aa_weapons":
+                    need_scroll_category = True
+                continue
                 
             try:
                 print(f"\n{'='*30}")
@@ -787,6 +998,10 @@ def main():
                 
                 print(f"分类 {category_display} 下找到 {len(item_templates)} 个物品")
                 
+                # 第一页的批量定位结果：返回列表后列表回到顶部，第一页的物品位置不变，可直接复用；
+                # 需要滑动的物品每次都从顶部重新滑动，落点每次不完全相同，仍逐个截图识别
+                page_positions = None
+                
                 # 内层循环：遍历该分类下的所有物品
                 for item_index, item in enumerate(item_templates):
                     # 如果是起始分类，则跳过起始物品索引之前的物品
@@ -817,8 +1032,19 @@ def main():
                             except Exception as e:
                                 print(f"滑动列表时出错: {str(e)}，继续执行")
                         
+                        # 第一页第一次访问时截图一次，批量定位本分类所有物品
+                        known_left_top = None
+                        if BATCH_LOCATE_ITEMS and scroll_times == 0:
+                            if page_positions is None:
+                                page_positions = locate_page_items(item_templates)
+                            known_left_top = page_positions.get(item['name'])
+                        
                         # 访问物品
-                        access_result = access_item(item, item_number)
+                        access_result = access_item(item, item_number, known_left_top)
+                        
+                        # 访问失败时页面位置可能已偏移，下次重新定位第一页
+                        if not access_result['success'] and scroll_times == 0:
+                            page_positions = None
                         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                         
                         # 记录结果
@@ -846,6 +1072,9 @@ def main():
                         print(f"处理物品时出错: {str(e)}，继续处理下一个物品")
                         continue
                 
+                # 切换分类前重新访问截图仍在加载的物品
+                retry_pipeline_items(results)
+                
                 # 该分类下的所有物品处理完毕，直接处理下一个分类，不需要返回
                 print(f"分类 {category_display} 下的所有物品处理完毕")
                 # 删除此处的go_back()调用，不需要返回上一级界面
@@ -854,11 +1083,21 @@ def main():
                 continue
         
         # 所有分类和物品处理完毕
+        # 等待流水线中的截图全部识别并保存
+        if pipeline is not None:
+            print("等待流水线处理剩余截图...")
+            pipeline.close()
+            pipeline = None
+        
         # 等待所有价格识别任务完成
         if ENABLE_PRICE_RECOGNITION and price_executor is not None:
             print("等待所有价格识别任务完成...")
             price_executor.shutdown(wait=True)
             print("所有价格识别任务已完成")
+        if recognition_pool is not None:
+            recognition_pool.close()
+            recognition_pool = None
+        PriceWriter.stop()
         
         # 保存最终结果
         save_results(results)
@@ -872,6 +1111,7 @@ def main():
         print(f"脚本执行完毕")
         print(f"共访问了 {len(results)} 个物品")
         print(f"总耗时: {int(hours)}小时 {int(minutes)}分钟 {seconds:.1f}秒")
+        print(OcrEngine.memo_summary())
         print(f"结果已保存至: {OUTPUT_FILE}")
         print("="*50 + "\n")
     except Exception as e:
@@ -934,63 +1174,66 @@ def is_item_in_preset(item_name, item_category, preset_items):
     
     return False
 
-def check_loading_indicator(image_path):
+def same_size_match_score(a, b):
+    """
+    计算两张同尺寸图像的归一化相关系数，结果与cv2.matchTemplate的TM_CCOEFF_NORMED相同
+    图像与模板尺寸相同时matchTemplate仍会走完整的卷积流程，这里直接用均值、方差和点积计算
+    """
+    mean_a, std_a = cv2.meanStdDev(a)
+    mean_b, std_b = cv2.meanStdDev(b)
+    n = a.shape[0] * a.shape[1]
+    denom = n * np.sqrt(float((std_a ** 2).sum()) * float((std_b ** 2).sum()))
+    if denom == 0:
+        return 0.0
+    dot = float(np.dot(a.astype(np.float32).ravel(), b.astype(np.float32).ravel()))
+    return (dot - n * float((mean_a * mean_b).sum())) / denom
+
+def loading_confidence(img):
+    """
+    估计截图处于加载状态的置信度（0-1），只处理loading图标区域和降采样后的画面，耗时远低于1毫秒
+    
+    参数:
+        img: BGR截图数组
+        
+    返回:
+        置信度，loading图标匹配度与中灰色像素占比中的较大值
+    """
+    # 先匹配loading图标区域 (1207, 627) 到 (1327, 668)，匹配成功直接返回，不再计算灰色占比
+    roi = img[LOADING_ROI[1]:LOADING_ROI[3], LOADING_ROI[0]:LOADING_ROI[2]]
+    match_score = 0.0
+    if roi.size:
+        # 从模板缓存读取已调整为目标区域尺寸的模板
+        template = TemplateCache.get(f"{TEMPLATE_DIR}loading.png", (roi.shape[1], roi.shape[0]))
+        if template is not None and template.shape == roi.shape:
+            match_score = same_size_match_score(roi, template)
+            if match_score >= LOADING_THRESHOLD:
+                return match_score
+    
+    # 在最近邻降采样的画面上估计80-180灰度值的像素占比（加载遮罩下画面大面积呈中灰色）
+    h, w = img.shape[:2]
+    small = cv2.resize(img, (max(1, w // LOADING_SAMPLE_STEP), max(1, h // LOADING_SAMPLE_STEP)),
+                       interpolation=cv2.INTER_NEAREST)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+    gray_ratio = cv2.countNonZero(cv2.inRange(gray, 80, 180)) / float(gray.size)
+    return max(match_score, gray_ratio)
+
+def check_loading_indicator(image):
     """
     检查图像中是否处于加载状态
     
     参数:
-        image_path: 截图路径
+        image: 截图路径，或已在内存中的截图数组
         
     返回:
         True: 存在loading状态（需要重新截图）
         False: 不存在loading状态
     """
     try:
-        # 读取图像
-        img = cv2.imread(image_path)
+        img = image if isinstance(image, np.ndarray) else cv2.imread(image)
         if img is None:
             print("无法读取截图")
             return True
-        
-        # 使用模板匹配检测loading图标
-        template_path = f"{TEMPLATE_DIR}loading.png"
-        if os.path.exists(template_path):
-            template = cv2.imread(template_path)
-            if template is not None:
-                # 提取目标区域 (1207, 627) 到 (1327, 668)
-                roi = img[627:668, 1207:1327]
-                
-                # 调整尺寸
-                if roi.shape[0] != template.shape[0] or roi.shape[1] != template.shape[1]:
-                    template = cv2.resize(template, (roi.shape[1], roi.shape[0]))
-                
-                # 执行模板匹配
-                result = cv2.matchTemplate(roi, template, cv2.TM_CCOEFF_NORMED)
-                _, max_val, _, _ = cv2.minMaxLoc(result)
-                
-                # 关键修改：直接打印小数点后2位，不使用格式化字符串
-                print(f"loading图标匹配度: {float(max_val):.2f}")
-                
-                if float(max_val) >= 0.6:
-                    return True
-        
-        # 检查灰色状态（避免使用直方图）
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        # 计算80-180灰度值的像素数量（不使用直方图）
-        mid_gray_mask = cv2.inRange(gray, 80, 180)
-        mid_gray_pixels = cv2.countNonZero(mid_gray_mask)
-        total_pixels = gray.size
-        
-        # 计算占比 - 关键修改：转换为Python类型
-        gray_ratio = float(mid_gray_pixels) / float(total_pixels)
-        print("灰色区域占比: %.2f" % gray_ratio)  # 使用%格式化而不是f-string
-        
-        # 60%以上是中灰色认为是加载状态
-        if gray_ratio > 0.6:
-            return True
-            
-        return False
+        return loading_confidence(img) >= LOADING_THRESHOLD
     except Exception as e:
         print(f"检查loading状态时出错: {str(e)}")
         return True  # 出错时默认返回True
@@ -1010,4 +1253,9 @@ if __name__ == "__main__":
         # 确保线程池关闭
         if 'price_executor' in globals() and price_executor is not None:
             price_executor.shutdown(wait=False)
+        if pipeline is not None:
+            pipeline.close()
+        if recognition_pool is not None:
+            recognition_pool.close()
+        PriceWriter.stop()
         print("脚本退出") 
\ No newline at end of file
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+多设备分片市场普查
+将CATEGORY_DICT中的分类（或预设清单中的物品所在分类）按物品数量均衡分配给多台已连接的设备/模拟器，
+每台设备启动一个独立的ModernWarshipMarket.py进程（各自拥有自己的ADB会话），
+运行过程中按设备汇报进度，全部完成后把各设备的价格数据合并为一个 price_data_*.csv。
+"""
+
+import os
+import re
+import sys
+import csv
+import glob
+import json
+import time
+import argparse
+import threading
+import subprocess
+from datetime import datetime
+import ADBHelper
+import PriceStore
+
+# 配置参数
+MARKET_DATA_DIR = "./market_data/"
+MARKET_ITEMS_DIR = "./templates/modern_warship/market_items/"
+PROGRESS_INTERVAL = 30  # 汇总进度的打印间隔(秒)
+KEEP_SHARD_FILES = False  # 合并后是否保留各设备的分片CSV
+
+sys.path.append("./templates/modern_warship/")
+try:
+    from category_mapping import get_category_name, CATEGORY_DICT
+except ImportError:
+    print("无法导入分类映射模块，请确保category_mapping.py文件存在")
+    CATEGORY_DICT = {}
+
+    def get_category_name(category_key):
+        return category_key
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='现代战舰市场多设备分片普查')
+    parser.add_argument('--devices', type=str, nargs='*', default=None, help='参与采集的设备ID（默认使用所有已连接设备）')
+    parser.add_argument('--preset', type=str, default=None, help='预设文件路径，只采集预设物品')
+    parser.add_argument('--output', type=str, default=None, help='访问日志CSV文件名前缀（不含扩展名）')
+    parser.add_argument('--price_output', type=str, default=None, help='合并后的价格数据CSV文件名（不含扩展名）')
+    return parser.parse_args()
+
+def device_tag(device_id):
+    """设备ID转换为可用于文件名的标签（模拟器ID中包含冒号）"""
+    return re.sub(r'[^\w]', '_', device_id)
+
+def count_category_items(preset_file=None):
+    """
+    统计每个分类需要处理的物品数量
+
+    参数:
+        preset_file: 预设文件路径，提供时只统计预设中的物品
+
+    返回:
+        {分类英文代码: 物品数量}，只包含数量大于0的分类，保持CATEGORY_DICT的顺序
+    """
+    if preset_file:
+        with open(preset_file, 'r', encoding='utf-8') as f:
+            preset_items = json.load(f).get('items', [])
+        reverse_category = {name: code for code, name in CATEGORY_DICT.items()}
+        counts = {}
+        for item in preset_items:
+            code = reverse_category.get(item['category'], item['category'])
+            counts[code] = counts.get(code, 0) + 1
+    else:
+        counts = {code: len(glob.glob(f"{MARKET_ITEMS_DIR}{code}/*.png")) for code in CATEGORY_DICT}
+    return {code: counts[code] for code in CATEGORY_DICT if counts.get(code, 0) > 0}
+
+def split_categories(category_counts, devices):
+    """
+    按物品数量均衡分配分类：物品多的分类优先分配给当前负载最小的设备
+
+    返回:
+        {设备ID: [分类英文代码, ...]}，每台设备的分类保持CATEGORY_DICT中的原始顺序
+    """
+    loads = {device: 0 for device in devices}
+    shards = {device: [] for device in devices}
+    for code, count in sorted(category_counts.items(), key=lambda kv: kv[1], reverse=True):
+        device = min(devices, key=lambda d: loads[d])
+        shards[device].append(code)
+        loads[device] += count
+    order = list(category_counts)
+    return {device: sorted(codes, key=order.index) for device, codes in shards.items() if codes}
+
+class DeviceWorker:
+    """单台设备上的采集进程，读取其输出并统计已处理的物品数量"""
+
+    def __init__(self, device_id, categories, total, price_output, access_output, preset_file=None):
+        self.device_id = device_id
+        self.categories = categories
+        self.total = total
+        self.processed = 0
+        self.price_file = f"{MARKET_DATA_DIR}{price_output}.csv"
+        cmd = [sys.executable, "-u", "ModernWarshipMarket.py",
+               "--device", device_id,
+               "--categories", ",".join(categories),
+               "--price_output", price_output,
+               "--output", access_output]
+        if preset_file:
+            cmd += ["--preset", preset_file]
+        env = dict(os.environ, PYTHONIOENCODING="utf-8")
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        text=True, encoding='utf-8', errors='replace', env=env)
+        self.reader = threading.Thread(target=self._read_output, daemon=True)
+        self.reader.start()
+
+    def _read_output(self):
+        prefix = f"[{self.device_id}] "
+        log_path = f"{MARKET_DATA_DIR}survey_{device_tag(self.device_id)}.log"
+        with open(log_path, 'w', encoding='utf-8') as log:
+            for line in self.process.stdout:
+                log.write(line)
+                if line.startswith("访问结果"):
+                    self.processed += 1
+                if line.startswith(("访问结果", "开始处理分类", "主函数发生错误", "脚本执行完毕")):
+                    print(prefix + line.rstrip())
+
+    def running(self):
+        return self.process.poll() is None
+
+    def progress_text(self):
+        percent = self.processed / self.total * 100 if self.total else 100
+        state = "运行中" if self.running() else f"已结束(返回码 {self.process.returncode})"
+        return f"设备 {self.device_id}: [{self.processed}/{self.total}] {percent:.1f}% {state}"
+
+def merge_price_files(shard_files, merged_file):
+    """
+    合并各设备的价格数据CSV，表头取所有分片的并集（按首次出现顺序）
+
+    参数:
+        shard_files: 分片CSV路径列表
+        merged_file: 合并输出路径，已存在时保留其中原有的数据
+
+    返回:
+        合并的数据行数
+    """
+    header = []
+    rows = []
+    for path in ([merged_file] if os.path.exists(merged_file) else []) + shard_files:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for column in reader.fieldnames or []:
+                if column not in header:
+                    header.append(column)
+            rows.extend(reader)
+
+    if not header:
+        return 0
+
+    with open(merged_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=header, restval='')
+        writer.writeheader()
+        writer.writerows(rows)
+
+    # 价格数据库中各设备的数据以分片文件名为来源，合并后改为以合并文件为来源，
+    # 使latest_source和GUI的数据库查询看到完整的普查数据
+    try:
+        PriceStore.import_csv(merged_file, replaces=[PriceStore.source_from_path(path) for path in shard_files])
+    except Exception as e:
+        print(f"更新价格数据库失败: {str(e)}")
+
+    if not KEEP_SHARD_FILES:
+        for path in shard_files:
+            try:
+                if os.path.exists(path):
+                    os.remove(path)
+            except OSError as e:
+                print(f"删除分片文件失败: {path}, 错误: {str(e)}")
+    return len(rows)
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    os.makedirs(MARKET_DATA_DIR, exist_ok=True)
+
+    devices = args.devices or ADBHelper.getDevicesList()
+    if not devices:
+        print("错误：未检测到连接的安卓设备，请检查ADB连接")
+        return False
+
+    category_counts = count_category_items(args.preset)
+    if not category_counts:
+        print("没有需要采集的分类")
+        return False
+
+    shards = split_categories(category_counts, devices)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    price_output = args.price_output or f"price_data_{datetime.now().strftime('%Y%m%d_%H')}"
+    access_output = args.output or f"market_access_log_{timestamp}"
+
+    print("="*60)
+    print(f"        多设备分片普查：{len(shards)} 台设备，{sum(category_counts.values())} 个物品")
+    print("="*60)
+
+    workers = []
+    for device_id, categories in shards.items():
+        total = sum(category_counts[code] for code in categories)
+        print(f"设备 {device_id}: {total} 个物品，分类 {', '.join(get_category_name(c) for c in categories)}")
+        tag = device_tag(device_id)
+        workers.append(DeviceWorker(device_id, categories, total,
+                                    f"{price_output}_{tag}", f"{access_output}_{tag}", args.preset))
+
+    start_time = time.time()
+    last_report = start_time
+    while any(worker.running() for worker in workers):
+        time.sleep(1)
+        if time.time() - last_report < PROGRESS_INTERVAL:
+            continue
+        last_report = time.time()
+        print(f"\n---- 普查进度 ({time.time() - start_time:.0f}秒) ----")
+        for worker in workers:
+            print(worker.progress_text())
+
+    for worker in workers:
+        worker.reader.join()
+
+    merged_file = f"{MARKET_DATA_DIR}{price_output}.csv"
+    row_count = merge_price_files([worker.price_file for worker in workers], merged_file)
+
+    elapsed = time.time() - start_time
+    print("\n" + "="*60)
+    for worker in workers:
+        print(worker.progress_text())
+    print(f"已合并 {row_count} 条价格数据到: {merged_file}")
+    print(f"总耗时: {elapsed / 60:.1f} 分钟")
+    print("="*60)
+    return all(worker.process.returncode == 0 for worker in workers)
+
+if __name__ == "__main__":
+    try:
+        success = main()
+        sys.exit(0 if success else 1)
+    except KeyboardInterrupt:
+        print("\n脚本被用户中断")
+        sys.exit(1)
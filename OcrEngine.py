@@ -0,0 +1,212 @@
+"""
+进程内共享的OCR引擎
+
+CnOcr模型在第一次识别时加载一次，之后所有识别复用同一个实例。
+识别函数直接接受OpenCV的BGR图像数组，不再经过临时文件；
+同一张截图中的多个区域可以通过recognize_texts在一次前向计算中批量识别。
+
+识别结果按二值化后区域图像的哈希值缓存（内存LRU + 可选的磁盘SQLite），
+同一个区域画面没有变化时直接返回上次的识别结果，不再经过OCR模型。
+"""
+
+import os
+import sys
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+import cv2
+import numpy as np
+
+OCR_MODEL_NAME = 'en_PP-OCRv3'  # 使用英文模型，适合识别数字
+OCR_BATCH_SIZE = 16  # 批量识别时每次前向计算的最大图像数
+MEMO_SIZE = 4096  # 内存中缓存的识别结果数量
+MEMO_DB_FILE = "./cache/ocr_memo.db"  # 磁盘缓存文件，为None时只使用内存缓存
+MEMO_KEY_VERSION = 1  # 缓存键的预处理版本，修改memo_key的二值化方式或识别前的预处理时加1，使旧的缓存结果失效
+
+_ocr = None
+_ocr_lock = threading.Lock()
+
+_memo = OrderedDict()  # 区域哈希 -> 识别文本，按最近使用排序
+_memo_db = None
+_memo_lock = threading.Lock()
+_memo_stats = {'hits': 0, 'disk_hits': 0, 'misses': 0}
+
+def get_ocr():
+    """
+    获取共享的OCR模型实例，首次调用时加载
+
+    返回:
+        CnOcr实例
+    """
+    global _ocr
+    if _ocr is None:
+        with _ocr_lock:
+            if _ocr is None:
+                try:
+                    from cnocr import CnOcr
+                except ImportError:
+                    print("未安装cnocr库，正在尝试安装...")
+                    import subprocess
+                    subprocess.check_call([sys.executable, "-m", "pip", "install", "cnocr"])
+                    from cnocr import CnOcr
+                print(f"加载OCR模型: {OCR_MODEL_NAME}")
+                _ocr = CnOcr(rec_model_name=OCR_MODEL_NAME)
+    return _ocr
+
+def _to_rgb(img):
+    """CnOcr要求RGB格式，OpenCV截图为BGR"""
+    if img.ndim == 3 and img.shape[2] == 3:
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return img
+
+def memo_key(img):
+    """
+    计算区域图像的缓存键：Otsu二值化后按位打包再取哈希，截图压缩和轻微的亮度抖动不影响结果
+    哈希中包含OCR模型名称和预处理版本，更换模型或修改预处理后不会命中旧的识别结果
+
+    参数:
+        img: BGR或灰度图像
+
+    返回:
+        16字节哈希值
+    """
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    _, binary = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{OCR_MODEL_NAME}:{MEMO_KEY_VERSION}".encode("utf-8"))
+    digest.update(np.array(binary.shape, dtype=np.int32).tobytes())
+    digest.update(np.packbits(binary).tobytes())
+    return digest.digest()
+
+def _get_memo_db():
+    """打开磁盘缓存，首次调用时创建数据表；打开失败时只使用内存缓存"""
+    global _memo_db, MEMO_DB_FILE
+    if _memo_db is None and MEMO_DB_FILE:
+        try:
+            os.makedirs(os.path.dirname(MEMO_DB_FILE) or ".", exist_ok=True)
+            _memo_db = sqlite3.connect(MEMO_DB_FILE, timeout=5, check_same_thread=False)
+            _memo_db.execute("CREATE TABLE IF NOT EXISTS memo (key BLOB PRIMARY KEY, text TEXT)")
+            _memo_db.commit()
+        except sqlite3.Error as e:
+            print(f"打开OCR缓存文件失败: {str(e)}，只使用内存缓存")
+            _memo_db = None
+            MEMO_DB_FILE = None
+    return _memo_db
+
+def _memo_store(key, text):
+    _memo[key] = text
+    _memo.move_to_end(key)
+    while len(_memo) > MEMO_SIZE:
+        _memo.popitem(last=False)
+
+def memo_get(key):
+    """
+    查询缓存的识别结果
+
+    参数:
+        key: memo_key返回的哈希值
+
+    返回:
+        缓存的文本，未命中时返回None
+    """
+    with _memo_lock:
+        text = _memo.get(key)
+        if text is not None:
+            _memo.move_to_end(key)
+            _memo_stats['hits'] += 1
+            return text
+        db = _get_memo_db()
+        if db is not None:
+            try:
+                row = db.execute("SELECT text FROM memo WHERE key = ?", (key,)).fetchone()
+            except sqlite3.Error:
+                row = None
+            if row is not None:
+                _memo_store(key, row[0])
+                _memo_stats['disk_hits'] += 1
+                return row[0]
+        _memo_stats['misses'] += 1
+        return None
+
+def memo_put(items, persist=True):
+    """
+    保存识别结果到缓存
+
+    参数:
+        items: [(哈希值, 文本), ...]
+        persist: 是否同时写入磁盘缓存；未经OCR确认的结果（如字形匹配）只放入内存，避免误识别被永久重放
+    """
+    if not items:
+        return
+    with _memo_lock:
+        for key, text in items:
+            _memo_store(key, text)
+        db = _get_memo_db() if persist else None
+        if db is not None:
+            try:
+                db.executemany("INSERT OR REPLACE INTO memo (key, text) VALUES (?, ?)", items)
+                db.commit()
+            except sqlite3.Error as e:
+                print(f"写入OCR缓存失败: {str(e)}")
+
+def memo_stats():
+    """
+    返回缓存命中统计
+
+    返回:
+        {'hits': 内存命中, 'disk_hits': 磁盘命中, 'misses': 未命中, 'size': 内存中的条目数, 'hit_rate': 命中率}
+    """
+    with _memo_lock:
+        stats = dict(_memo_stats, size=len(_memo))
+    total = stats['hits'] + stats['disk_hits'] + stats['misses']
+    stats['hit_rate'] = (stats['hits'] + stats['disk_hits']) / total if total else 0.0
+    return stats
+
+def memo_summary():
+    """缓存命中统计的单行文本，用于打印"""
+    stats = memo_stats()
+    return (f"OCR缓存: 命中 {stats['hits']} 次，磁盘命中 {stats['disk_hits']} 次，"
+            f"未命中 {stats['misses']} 次，命中率 {stats['hit_rate'] * 100:.1f}%")
+
+def recognize_text(img):
+    """
+    识别单行文本
+
+    参数:
+        img: BGR图像数组
+
+    返回:
+        识别出的原始文本
+    """
+    return recognize_texts([img])[0]
+
+def recognize_texts(imgs, keys=None, with_scores=False):
+    """
+    批量识别多张单行文本图像，缓存未命中的图像在一次前向计算中完成识别
+
+    参数:
+        imgs: BGR图像数组列表
+        keys: 可选，调用方已经计算好的memo_key列表；提供时视为调用方已查询过缓存，直接识别所有图像
+        with_scores: 是否同时返回OCR模型给出的置信度（缓存命中的结果置信度为None）
+
+    返回:
+        与输入顺序一致的原始文本列表；with_scores为True时为[(文本, 置信度), ...]
+    """
+    if not imgs:
+        return []
+    if keys is None:
+        keys = [memo_key(img) for img in imgs]
+        texts = [memo_get(key) for key in keys]
+    else:
+        texts = [None] * len(imgs)
+    scores = [None] * len(imgs)
+
+    pending = [i for i, text in enumerate(texts) if text is None]
+    if pending:
+        results = get_ocr().ocr_for_single_lines([_to_rgb(imgs[i]) for i in pending], batch_size=OCR_BATCH_SIZE)
+        for i, result in zip(pending, results):
+            texts[i] = result.get("text", "")
+            scores[i] = float(result.get("score", 0.0))
+        memo_put([(keys[i], texts[i]) for i in pending])
+    return list(zip(texts, scores)) if with_scores else texts
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+价格数据库（与CSV文件并存）
+
+CSV中的价格以 "1,234; 5,678" 这样的字符串保存，每个读取方都要重新解析。
+这里把每一行价格数据以带类型的列保存到SQLite中：购买/出售价格数组（JSON）及其最高/最低值、
+出价/上架数量、溢价、利润率、时间戳，并在物品名称和时间上建立索引，筛选整次普查只需一次查询。
+save_price_data 和 save_bid_tracker_data 写CSV的同时写入这里；需要CSV时可以用export_csv导出。
+
+每行数据带有来源（source）：普查数据为价格CSV的文件名（不含扩展名，如 price_data_20250101_10），
+报价追踪数据为 "报价追踪"。
+"""
+
+import os
+import csv
+import sys
+import json
+import glob
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+STORE_FILE = "./market_data/price_store.db"  # 数据库文件
+TRACKER_SOURCE = "报价追踪"  # 报价追踪数据的来源名称
+
+_local = threading.local()
+_schema_ready = set()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prices (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    category TEXT,
+    ts TEXT NOT NULL,
+    buy_prices TEXT,
+    sell_prices TEXT,
+    max_buy INTEGER,
+    min_buy INTEGER,
+    min_sell INTEGER,
+    max_sell INTEGER,
+    own_buy INTEGER,
+    own_sell INTEGER,
+    spread INTEGER,
+    profit_rate REAL,
+    bid_count INTEGER,
+    listing_count INTEGER,
+    rarity TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_prices_item_ts ON prices (item_name, ts);
+CREATE INDEX IF NOT EXISTS idx_prices_source_ts ON prices (source, ts);
+CREATE INDEX IF NOT EXISTS idx_prices_ts ON prices (ts);
+"""
+
+# 导出CSV和to_csv_record使用的列
+CSV_COLUMNS = ['物品名称', '物品分类', '购买价格', '出售价格', '本人购买价格', '本人售出价格',
+               '低买低卖溢价', '利润率', '时间戳', '出价数量', '上架数量', '稀有度']
+
+COLUMNS = ['source', 'item_name', 'category', 'ts', 'buy_prices', 'sell_prices', 'max_buy', 'min_buy',
+           'min_sell', 'max_sell', 'own_buy', 'own_sell', 'spread', 'profit_rate', 'bid_count',
+           'listing_count', 'rarity']
+
+def connect():
+    """
+    获取当前线程的数据库连接，首次使用时创建数据表
+
+    返回:
+        sqlite3连接
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or getattr(_local, 'path', None) != STORE_FILE:
+        os.makedirs(os.path.dirname(STORE_FILE) or ".", exist_ok=True)
+        conn = sqlite3.connect(STORE_FILE, timeout=10)
+        conn.row_factory = sqlite3.Row
+        # WAL模式下读取不阻塞写入，多个采集进程可以同时写入
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        if STORE_FILE not in _schema_ready:
+            conn.executescript(SCHEMA)
+            _schema_ready.add(STORE_FILE)
+        _local.conn, _local.path = conn, STORE_FILE
+    return conn
+
+def source_from_path(csv_file_path):
+    """CSV文件路径转换为来源名称"""
+    return os.path.splitext(os.path.basename(csv_file_path))[0]
+
+def parse_price_list(price_str):
+    """
+    解析CSV中的价格字符串
+
+    参数:
+        price_str: 如 "1,234; 5,678"
+
+    返回:
+        整数价格列表
+    """
+    if price_str is None:
+        return []
+    prices = []
+    for part in str(price_str).split(';'):
+        clean = part.strip().strip('"').replace(',', '').replace(' ', '')
+        if not clean or clean.lower() == 'nan':
+            continue
+        try:
+            prices.append(int(float(clean)))
+        except ValueError:
+            continue
+    return prices
+
+def _to_int(value):
+    if value is None:
+        return None
+    try:
+        return int(float(str(value).replace(',', '').replace(' ', '')))
+    except ValueError:
+        return None
+
+def _to_rate(value):
+    if value is None:
+        return None
+    try:
+        return float(str(value).replace('%', '').strip())
+    except ValueError:
+        return None
+
+def build_row(source, item_name, category, buying_prices, selling_prices, own_buying=None, own_selling=None,
+              spread=None, profit_rate=None, bid_count=None, listing_count=None, rarity=None, timestamp=None):
+    """
+    生成一行数据库记录，价格可以是整数列表或CSV价格字符串；没有利润率时按 溢价/(最高购买价+1) 计算
+
+    返回:
+        与COLUMNS顺序一致的元组
+    """
+    if not isinstance(buying_prices, (list, tuple)):
+        buying_prices = parse_price_list(buying_prices)
+    if not isinstance(selling_prices, (list, tuple)):
+        selling_prices = parse_price_list(selling_prices)
+    max_buy = max(buying_prices) if buying_prices else None
+    spread = _to_int(spread)
+    rate = _to_rate(profit_rate)
+    if rate is None and spread is not None and max_buy is not None:
+        rate = spread / (max_buy + 1) * 100
+    return (source, item_name, category, timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            json.dumps(buying_prices), json.dumps(selling_prices),
+            max_buy, min(buying_prices) if buying_prices else None,
+            min(selling_prices) if selling_prices else None, max(selling_prices) if selling_prices else None,
+            _to_int(own_buying), _to_int(own_selling), spread, rate,
+            _to_int(bid_count), _to_int(listing_count), rarity or None)
+
+def record(source, item_name, category, buying_prices, selling_prices, **fields):
+    """
+    写入一行价格数据，参数同build_row
+
+    返回:
+        是否写入成功（数据库出错时只打印错误，不影响CSV写入）
+    """
+    return record_rows([build_row(source, item_name, category, buying_prices, selling_prices, **fields)])
+
+def record_rows(rows):
+    """
+    批量写入build_row生成的记录（一个事务）
+
+    返回:
+        是否写入成功
+    """
+    if not rows:
+        return True
+    try:
+        conn = connect()
+        with conn:
+            _insert(conn, rows)
+        return True
+    except sqlite3.Error as e:
+        print(f"写入价格数据库失败: {str(e)}")
+        return False
+
+def _insert(conn, rows):
+    conn.executemany(f"INSERT INTO prices ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", rows)
+
+def delete_item(item_name, category=None, source=None):
+    """
+    删除物品的记录（例如从报价追踪文件中删除物品后同步删除数据库中的记录）
+
+    参数:
+        item_name: 物品名称
+        category: 可选，只删除该分类的记录
+        source: 可选，只删除该来源的记录
+
+    返回:
+        删除的行数
+    """
+    conditions, params = ["item_name = ?"], [item_name]
+    for column, value in [('category', category), ('source', source)]:
+        if value is not None:
+            conditions.append(f"{column} = ?")
+            params.append(value)
+    conn = connect()
+    with conn:
+        return conn.execute(f"DELETE FROM prices WHERE {' AND '.join(conditions)}", params).rowcount
+
+def count_rows(source):
+    """返回某个来源的记录数"""
+    return connect().execute("SELECT COUNT(*) FROM prices WHERE source = ?", (source,)).fetchone()[0]
+
+def latest_source(prefix="price_data_"):
+    """返回以prefix开头的最新来源名称（来源名称中包含时间，按名称排序即按时间排序）"""
+    row = connect().execute("SELECT MAX(source) FROM prices WHERE source LIKE ?", (prefix + "%",)).fetchone()
+    return row[0] if row else None
+
+def query(source=None, item_name=None, since=None, until=None, max_buy_price=None, min_spread=None,
+          min_profit_rate=None, min_bid_count=None, latest_per_item=False, order_by="ts"):
+    """
+    按条件查询价格数据
+
+    参数:
+        source: 来源名称
+        item_name: 物品名称
+        since / until: 时间范围（"YYYY-mm-dd HH:MM:SS"，包含边界）
+        max_buy_price: 最高购买价格上限
+        min_spread: 溢价下限
+        min_profit_rate: 利润率(%)下限
+        min_bid_count: 出价数量下限
+        latest_per_item: 每个物品只返回时间最新的一行
+        order_by: 排序的SQL表达式
+
+    返回:
+        sqlite3.Row列表，buy_prices/sell_prices为JSON字符串
+    """
+    conditions, params = [], []
+    for column, op, value in [('source', '=', source), ('item_name', '=', item_name), ('ts', '>=', since),
+                              ('ts', '<=', until), ('max_buy', '<=', max_buy_price), ('spread', '>=', min_spread),
+                              ('profit_rate', '>=', min_profit_rate), ('bid_count', '>=', min_bid_count)]:
+        if value is not None:
+            conditions.append(f"{column} {op} ?")
+            params.append(value)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    if latest_per_item:
+        sql = (f"SELECT * FROM (SELECT *, ROW_NUMBER() OVER (PARTITION BY item_name ORDER BY ts DESC, id DESC) AS rn "
+               f"FROM prices {where}) WHERE rn = 1 ORDER BY {order_by}")
+    else:
+        sql = f"SELECT * FROM prices {where} ORDER BY {order_by}"
+    return connect().execute(sql, params).fetchall()
+
+def format_prices(prices_json):
+    """价格数组转换回CSV中的价格字符串"""
+    prices = json.loads(prices_json) if prices_json else []
+    return '; '.join(f"{p:,}" for p in prices)
+
+def to_csv_record(row):
+    """
+    数据库记录转换为CSV格式的字典（列名与价格CSV一致），额外带有数值列'最高购买价格'
+
+    参数:
+        row: query返回的记录
+    """
+    return {
+        '物品名称': row['item_name'],
+        '物品分类': row['category'] or '',
+        '购买价格': format_prices(row['buy_prices']),
+        '出售价格': format_prices(row['sell_prices']),
+        '本人购买价格': row['own_buy'] if row['own_buy'] is not None else '',
+        '本人售出价格': row['own_sell'] if row['own_sell'] is not None else '',
+        '低买低卖溢价': row['spread'] if row['spread'] is not None else 'N/A',
+        '利润率': row['profit_rate'] if row['profit_rate'] is not None else 0.0,
+        '时间戳': row['ts'],
+        '出价数量': row['bid_count'] if row['bid_count'] is not None else 0,
+        '上架数量': row['listing_count'] if row['listing_count'] is not None else 0,
+        '稀有度': row['rarity'] or '',
+        '最高购买价格': row['max_buy'] or 0,
+    }
+
+def export_csv(csv_file_path, **conditions):
+    """
+    导出CSV，参数同query
+
+    返回:
+        导出的行数
+    """
+    rows = query(**conditions)
+    with open(csv_file_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_COLUMNS, extrasaction='ignore')
+        writer.writeheader()
+        for row in rows:
+            record_dict = to_csv_record(row)
+            if row['profit_rate'] is not None:
+                record_dict['利润率'] = f"{row['profit_rate']:.2f}%"
+            writer.writerow(record_dict)
+    return len(rows)
+
+def import_csv(csv_file_path, source=None, replaces=()):
+    """
+    导入已有的价格CSV（同一来源已导入过时先删除再导入）
+    删除和导入在同一个事务中完成，导入失败时抛出sqlite3.Error，原有数据保持不变
+
+    参数:
+        csv_file_path: CSV路径
+        source: 来源名称，默认由文件名得到
+        replaces: 被该文件取代的其他来源（例如合并前的多设备分片），与导入在同一个事务中删除
+
+    返回:
+        导入的行数
+    """
+    source = source or (TRACKER_SOURCE if '报价追踪' in csv_file_path else source_from_path(csv_file_path))
+    rows = []
+    with open(csv_file_path, 'r', newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if not row.get('物品名称'):
+                continue
+            rows.append(build_row(source, row['物品名称'], row.get('物品分类'), row.get('购买价格'), row.get('出售价格'),
+                                  own_buying=row.get('本人购买价格'), own_selling=row.get('本人售出价格'),
+                                  spread=row.get('低买低卖溢价'), profit_rate=row.get('利润率'),
+                                  bid_count=row.get('出价数量'), listing_count=row.get('上架数量'),
+                                  rarity=row.get('稀有度'), timestamp=row.get('时间戳')))
+    sources = [source] + [s for s in replaces if s != source]
+    conn = connect()
+    with conn:
+        conn.execute(f"DELETE FROM prices WHERE source IN ({', '.join('?' * len(sources))})", sources)
+        _insert(conn, rows)
+    return len(rows)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='价格数据库导入导出')
+    parser.add_argument('--import', dest='import_files', type=str, nargs='*', default=None,
+                        help='导入价格CSV文件（默认导入market_data下所有价格数据和报价追踪文件）')
+    parser.add_argument('--export', type=str, default=None, help='导出CSV文件路径')
+    parser.add_argument('--source', type=str, default=None, help='导出的来源名称，默认为最新的普查数据')
+    args = parser.parse_args()
+
+    if args.import_files is not None:
+        files = args.import_files or sorted(glob.glob("./market_data/price_data_*.csv")) + glob.glob("./market_data/报价追踪.csv")
+        for path in files:
+            print(f"已导入 {import_csv(path)} 行: {path}")
+    if args.export:
+        source = args.source or latest_source()
+        print(f"已导出 {export_csv(args.export, source=source)} 行到: {args.export}")
+    if args.import_files is None and not args.export:
+        parser.print_help()
+        sys.exit(1)
@@ -0,0 +1,264 @@
+"""
+价格数据写入服务
+
+多个识别线程不再各自打开CSV追加一行，而是把记录放入队列，由唯一的写入线程批量写出：
+积累到一定行数或距离上次写出超过一定时间时写出一批（CSV与价格数据库各一次），
+CSV文件句柄在运行期间保持打开，定期以及结束时fsync，保证中断后已确认的数据在磁盘上。
+新文件统一使用PRICE_COLUMNS表头；已存在的文件缺少PRICE_COLUMNS中的列时先改写为新表头（保留原有数据和多余的列）。
+CSV写出成功后才写入价格数据库和物品属性索引，写出失败的记录留在队列中，下次写出时重试。
+没有启动写入服务时，write会在调用线程中直接同步写入，表头规则相同。
+"""
+
+import os
+import csv
+import queue
+import threading
+import time
+import PriceStore
+import ItemAttributes
+
+# 价格CSV的固定表头
+PRICE_COLUMNS = ['物品名称', '物品分类', '购买价格', '出售价格', '本人购买价格', '本人售出价格',
+                 '低买低卖溢价', '时间戳', '出价数量', '上架数量', '稀有度']
+FLUSH_ROWS = 32  # 积累到该行数时写出
+FLUSH_INTERVAL = 2.0  # 距离上次写出超过该时间(秒)时写出
+CHECKPOINT_INTERVAL = 30.0  # fsync间隔(秒)
+FLUSH_TIMEOUT = 30.0  # flush等待写入线程的最长时间(秒)
+
+_sync_lock = threading.Lock()
+
+def _read_header(path):
+    """读取已存在文件的表头，文件不存在或为空时返回None"""
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        return next(csv.reader(f), None)
+
+def _upgrade_header(path, header):
+    """
+    改写已存在文件的表头为PRICE_COLUMNS（原有的多余列保留在后面），按列名搬移原有数据
+
+    返回:
+        新表头
+    """
+    new_header = PRICE_COLUMNS + [column for column in header if column not in PRICE_COLUMNS]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(path, 'r', newline='', encoding='utf-8') as src, \
+            open(tmp_path, 'w', newline='', encoding='utf-8') as dst:
+        reader = csv.reader(src)
+        next(reader, None)
+        writer = csv.writer(dst)
+        writer.writerow(new_header)
+        for values in reader:
+            row = dict(zip(header, values))
+            writer.writerow([row.get(column, '') for column in new_header])
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp_path, path)
+    # 行的字节位置已经改变，物品属性索引需要重新读取该文件
+    ItemAttributes.forget_file(path)
+    print(f"[写入服务] {path} 的表头缺少新列，已改写为新表头")
+    return new_header
+
+def _open_csv(path):
+    """
+    以追加方式打开CSV，新文件写入固定表头，已存在文件的表头缺少PRICE_COLUMNS中的列时先改写表头
+
+    返回:
+        (文件对象, csv.DictWriter)
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    header = _read_header(path)
+    if header is not None and any(column not in header for column in PRICE_COLUMNS):
+        header = _upgrade_header(path, header)
+    f = open(path, 'a', newline='', encoding='utf-8')
+    writer = csv.DictWriter(f, fieldnames=header or PRICE_COLUMNS, extrasaction='ignore', restval='')
+    if header is None:
+        writer.writeheader()
+    return f, writer
+
+def _after_write(entries):
+    """CSV写出后写入价格数据库并更新物品属性索引"""
+    PriceStore.record_rows([store_row for _, _, store_row, _ in entries if store_row is not None])
+    for _, _, _, attributes in entries:
+        if attributes:
+            item_name, category_name, attrs = attributes
+            ItemAttributes.update(item_name, category_name, **attrs)
+
+class PriceWriter:
+    """
+    单线程批量写入服务
+
+    参数:
+        flush_rows: 积累到该行数时写出
+        flush_interval: 距离上次写出超过该时间(秒)时写出
+        checkpoint_interval: fsync间隔(秒)
+    """
+
+    def __init__(self, flush_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL, checkpoint_interval=CHECKPOINT_INTERVAL):
+        self.flush_rows = max(1, flush_rows)
+        self.flush_interval = flush_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.queue = queue.Queue()
+        self.files = {}  # 路径 -> (文件对象, DictWriter)
+        self.pending = []
+        self.written = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="price-writer", daemon=True)
+        self.thread.start()
+        return self
+
+    def submit(self, path, record, store_row=None, attributes=None):
+        """
+        提交一条记录（不阻塞）
+
+        参数:
+            path: CSV路径
+            record: {列名: 值}
+            store_row: 可选，PriceStore.build_row生成的数据库记录
+            attributes: 可选，(物品名称, 分类, {属性名: 值})，写出后更新物品属性索引
+        """
+        self.queue.put((path, record, store_row, attributes))
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        """
+        等待队列中已提交的记录全部写出并fsync
+
+        返回:
+            是否全部写出（写入线程已退出、等待超时或有记录写出失败时为False）
+        """
+        if self.thread is None or not self.thread.is_alive():
+            print("[写入服务] 写入线程已退出，无法写出记录")
+            return False
+        done = threading.Event()
+        self.queue.put(done)
+        if not done.wait(timeout):
+            print(f"[写入服务] 等待写出超时({timeout}秒)")
+            return False
+        return not self.pending
+
+    def close(self):
+        """写出剩余记录、fsync并关闭所有文件"""
+        self.queue.put(None)
+        self.thread.join()
+
+    def _write_pending(self):
+        if not self.pending:
+            return
+        entries, self.pending = self.pending, []
+        written = 0
+        try:
+            for path, record, _, _ in entries:
+                if path not in self.files:
+                    self.files[path] = _open_csv(path)
+                self.files[path][1].writerow(record)
+                written += 1
+            for f, _ in self.files.values():
+                f.flush()
+        except Exception as e:
+            # 已写入的行之后的记录放回队列等待重试；出错的文件关闭后下次重新打开
+            print(f"[写入服务] 写入价格数据时出错: {str(e)}，{len(entries) - written} 条记录将在下次写出时重试")
+            if written < len(entries):
+                self.pending = entries[written:] + self.pending
+                path = entries[written][0]
+                if path in self.files:
+                    try:
+                        self.files.pop(path)[0].close()
+                    except OSError:
+                        pass
+        self.written += written
+        try:
+            _after_write(entries[:written])
+        except Exception as e:
+            print(f"[写入服务] 更新价格数据库时出错: {str(e)}")
+
+    def _checkpoint(self):
+        for f, _ in self.files.values():
+            try:
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError as e:
+                print(f"[写入服务] fsync失败: {str(e)}")
+
+    def _run(self):
+        last_flush = last_checkpoint = time.time()
+        while True:
+            try:
+                task = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                task = False
+
+            if task is None or isinstance(task, threading.Event):
+                self._write_pending()
+                self._checkpoint()
+                last_flush = last_checkpoint = time.time()
+                if task is None:
+                    for f, _ in self.files.values():
+                        f.close()
+                    self.files.clear()
+                    if self.pending:
+                        print(f"[写入服务] {len(self.pending)} 条价格数据未能写出")
+                    print(f"[写入服务] 共写入 {self.written} 条价格数据")
+                    return
+                task.set()
+                continue
+
+            if task:
+                self.pending.append(task)
+            now = time.time()
+            if len(self.pending) >= self.flush_rows or now - last_flush >= self.flush_interval:
+                self._write_pending()
+                last_flush = now
+            if now - last_checkpoint >= self.checkpoint_interval:
+                self._checkpoint()
+                last_checkpoint = now
+
+_writer = None
+
+def start(**kwargs):
+    """启动全局写入服务，参数同PriceWriter"""
+    global _writer
+    if _writer is None:
+        _writer = PriceWriter(**kwargs).start()
+    return _writer
+
+def is_running():
+    return _writer is not None
+
+def write(path, record, store_row=None, attributes=None):
+    """
+    写入一条价格记录：写入服务运行时放入队列，否则在当前线程中同步写入
+
+    参数同PriceWriter.submit
+    """
+    if _writer is not None:
+        _writer.submit(path, record, store_row, attributes)
+        return
+    entry = (path, record, store_row, attributes)
+    with _sync_lock:
+        f, writer = _open_csv(path)
+        try:
+            writer.writerow(record)
+        finally:
+            f.close()
+    _after_write([entry])
+
+def flush(timeout=FLUSH_TIMEOUT):
+    """
+    等待写入服务写出所有已提交的记录
+
+    返回:
+        是否全部写出，没有启动写入服务时为True
+    """
+    if _writer is not None:
+        return _writer.flush(timeout)
+    return True
+
+def stop():
+    """停止全局写入服务"""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
@@ -1,4 +1,4 @@
-import ImageProc, ADBHelper, random, time, cv2
+import ImageProc, ADBHelper, TemplateCache, random, time, cv2
 import settings as st
 
 deviceType = 1
@@ -13,6 +13,11 @@ def delay(t):
     print("【主动延时】延时 {0} 秒".format(t))
     time.sleep(t)
 
+# 等待画面稳定：画面不再变化（且is_loading判断不在加载中）时立即返回，代替固定时长的延时
+# 返回(是否稳定, 最后一帧截图的原始字节)
+def wait_until_stable(timeout=None, is_loading=None):
+    return ADBHelper.waitForStableScreen(deviceID, timeout, is_loading)
+
 def random_pos(pos):
     x, y = pos
     rand = random.randint(1, 10000)
@@ -48,24 +53,32 @@ def slide(vector):
     print("【模拟滑屏】使用 {0} 毫秒从坐标 {1} 滑动到坐标 {2}".format(randTime, _startPos, _stopPos))
     ADBHelper.slide(deviceID, _startPos, _stopPos, randTime)
 
-# 截屏，识图，返回坐标
-def find_pic(target, returnCenter = False):
+# 截屏，优先通过exec-out直接获取内存中的截图，失败时退回到截图文件方式
+def capture_screen():
+    screen = ADBHelper.screenCaptureArray(deviceID)
+    if screen is not None:
+        return screen
+    print("【截图】内存截图失败，退回到文件截图")
     ADBHelper.screenCapture(deviceID, st.cache_path + "screenCap.png")
     time.sleep(0.1)
+    return st.cache_path + "screenCap.png"
+
+# 截屏，识图，返回坐标；region为搜索区域(x, y, w, h)，scale小于1时先在缩小的图像上粗匹配
+def find_pic(target, returnCenter = False, region = None, scale = 1.0):
+    screen = capture_screen()
     if returnCenter == True:
-        leftTopPos = ImageProc.locate(st.cache_path + "screenCap.png", target, st.accuracy)
-        img = cv2.imread(target)
+        leftTopPos = ImageProc.locate(screen, target, st.accuracy, region, scale)
+        img = TemplateCache.get(target)
         centerPos = ImageProc.centerOfTouchArea(img.shape, leftTopPos)
         return centerPos
     else:
-        leftTopPos = ImageProc.locate(st.cache_path + "screenCap.png", target, st.accuracy)
+        leftTopPos = ImageProc.locate(screen, target, st.accuracy, region, scale)
         return leftTopPos
 
 # 截屏，识图，返回所有坐标
 def find_pic_all(target):
-    ADBHelper.screenCapture(deviceID, st.cache_path + "screenCap.png")
-    time.sleep(0.1)
-    leftTopPos = ImageProc.locate_all(st.cache_path + "screenCap.png", target, st.accuracy)
+    screen = capture_screen()
+    leftTopPos = ImageProc.locate_all(screen, target, st.accuracy)
     return leftTopPos
 
 # 寻找目标区块并在其范围内随机点击
@@ -75,7 +88,7 @@ def find_pic_touch(target):
         print("【识图】识别 {0} 失败".format(target))
         return False
     print("【识图】识别 {0} 成功，图块左上角坐标 {1}".format(target, leftTopPos))
-    img = cv2.imread(target)
+    img = TemplateCache.get(target)
     tlx, tly = leftTopPos
     h_src, w_src, tongdao = img.shape
     x = random.randint(tlx, tlx + w_src)
@@ -90,7 +103,7 @@ def find_pic_slide(target,pos):
         print("【识图】识别 {0} 失败".format(target))
         return False
     print("【识图】识别 {0} 成功，图块左上角坐标 {1}".format(target, leftTopPos))
-    img = cv2.imread(target)
+    img = TemplateCache.get(target)
     centerPos = ImageProc.centerOfTouchArea(img.shape,leftTopPos)
     slide((centerPos, pos))
     return True
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+多进程价格识别后端
+
+线程池中的识别线程会在OpenCV与OCR之间的Python代码上争抢GIL，多个线程还会同时修改mpr的模块级设置。
+这里改为每个CPU核心一个识别进程：进程启动时加载一次OCR模型和模板缓存，
+截图写入共享内存环形缓冲区（FrameRing）后只把槽位号传给识别进程（不经过PNG编码和磁盘），
+识别进程只返回结构化的识别结果，保存仍由调用方完成。
+识别进程新学习的字形样本随结果一起返回，由主进程并入字形库并在退出时保存，识别进程不写字形库文件。
+同时等待识别的截图数量有上限（即环形缓冲区的槽位数），识别跟不上时提交方会等待。
+"""
+
+import os
+import threading
+import multiprocessing
+import concurrent.futures
+from multiprocessing import shared_memory
+import numpy as np
+import FrameRing
+import GlyphOcr
+
+RECOGNITION_PROCESSES = max(1, (os.cpu_count() or 2) - 1)  # 默认识别进程数，留一个核心给导航和截图
+MAX_PENDING_FRAMES = None  # 同时等待识别的最大截图数，为None时取进程数的2倍
+
+def init_worker(settings):
+    """识别进程初始化：应用mpr设置，预加载模板和OCR模型"""
+    import MarketPriceRecognizer as mpr
+    import TemplateCache
+    import OcrEngine
+    for name, value in settings.items():
+        setattr(mpr, name, value)
+    TemplateCache.preload()
+    OcrEngine.get_ocr()
+
+def _recognize_in_worker(frame, item_name, category_name, detect_own_prices, keep_images, image_name):
+    """
+    识别进程中执行：从共享内存读取截图并识别，返回 (可序列化的识别结果, 新学习的字形样本)
+    frame为 ('ring', 缓冲区名称, 槽位字节数, 槽位号, 形状, dtype) 或 ('block', 共享内存名称, 形状, dtype)
+    """
+    import MarketPriceRecognizer as mpr
+    import GlyphOcr
+    # 识别进程与创建方共用同一个resource_tracker，共享内存由创建方在识别完成后释放
+    if frame[0] == 'ring':
+        _, name, slot_bytes, slot, shape, dtype = frame
+        shm = FrameRing.attach(name)
+        img = FrameRing.frame_view(shm, slot_bytes, slot, shape, dtype)
+    else:
+        _, name, shape, dtype = frame
+        shm = shared_memory.SharedMemory(name=name)
+        img = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+    try:
+        result = mpr.process_frame(img, item_name, category_name, detect_own_prices, auto_save=False,
+                                   keep_images=keep_images, image_name=image_name)
+    finally:
+        del img
+        if frame[0] == 'block':
+            try:
+                shm.close()
+            except BufferError:
+                pass
+    return result, GlyphOcr.take_learned()
+
+class RecognitionPool:
+    """
+    多进程价格识别池
+
+    参数:
+        processes: 识别进程数
+        max_pending: 同时等待识别的最大截图数（背压上限）
+        settings: 需要在识别进程中设置的mpr模块变量，如 {'USE_GLYPH_OCR': True}
+    """
+
+    def __init__(self, processes=RECOGNITION_PROCESSES, max_pending=MAX_PENDING_FRAMES, settings=None):
+        self.processes = max(1, processes)
+        self.max_pending = max_pending or self.processes * 2
+        self.slots = threading.BoundedSemaphore(self.max_pending)
+        self.ring = None  # 第一次提交时按截图大小创建
+        self.ring_lock = threading.Lock()
+        # Windows只支持spawn，这里统一使用spawn，避免fork出带有ADB会话和线程的父进程状态
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+            initargs=(settings or {},))
+        print(f"已启动 {self.processes} 个价格识别进程")
+
+    def submit(self, img, item_name, category_name, detect_own_prices=False, keep_images=False, image_name="frame.png"):
+        """
+        提交一帧截图，等待识别的截图已达上限时阻塞
+
+        参数:
+            img: BGR截图
+            item_name: 物品名称
+            category_name: 物品分类
+            detect_own_prices: 是否检测本人价格
+            keep_images: 是否保存价格区域图像和带标记的原图
+            image_name: 保存图像时用于生成文件名的截图名称
+
+        返回:
+            Future，结果为mpr.process_frame的返回值
+        """
+        self.slots.acquire()
+        shm = None
+        slot = None
+
+        def release(_=None):
+            if slot is not None:
+                self.ring.release(slot)
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            self.slots.release()
+
+        try:
+            with self.ring_lock:
+                if self.ring is None:
+                    self.ring = FrameRing.FrameRing(self.max_pending, max(1, img.nbytes))
+            if self.ring.fits(img):
+                # 槽位数与等待上限相同，拿到信号量后总有空闲槽位
+                slot, shape, dtype = self.ring.publish(img)
+                frame = ('ring', self.ring.name, self.ring.slot_bytes, slot, shape, dtype)
+            else:
+                # 比槽位大的截图（如切换了分辨率）单独放入一块共享内存
+                img = np.ascontiguousarray(img)
+                shm = shared_memory.SharedMemory(create=True, size=max(1, img.nbytes))
+                np.ndarray(img.shape, dtype=img.dtype, buffer=shm.buf)[:] = img
+                frame = ('block', shm.name, img.shape, img.dtype.str)
+            worker_future = self.executor.submit(_recognize_in_worker, frame, item_name, category_name,
+                                                 detect_own_prices, keep_images, image_name)
+        except Exception:
+            release()
+            raise
+
+        future = concurrent.futures.Future()
+        future.set_running_or_notify_cancel()
+
+        def finish(done):
+            release()
+            try:
+                result, learned = done.result()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            GlyphOcr.add_samples(learned)
+            future.set_result(result)
+
+        worker_future.add_done_callback(finish)
+        return future
+
+    def recognize(self, img, item_name, category_name, detect_own_prices=False, keep_images=False, image_name="frame.png"):
+        """提交一帧截图并等待识别结果，参数同submit"""
+        return self.submit(img, item_name, category_name, detect_own_prices, keep_images, image_name).result()
+
+    def close(self):
+        """等待所有已提交的截图识别完毕并结束识别进程"""
+        self.executor.shutdown(wait=True)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+截图存档批量重新识别（process_dir 第二版）
+
+识别算法改进后，用它把存档的物品详情页截图重新识别一遍：
+截图分发给多个识别进程并行处理（每个进程只加载一次OCR模型和模板），
+物品名称和分类直接从截图文件名中的物品键名查表得到，记录时间使用截图文件名中的时间；
+识别结果由写入服务批量写入价格数据CSV，写出后才把截图记入清单文件，中断后再次运行会跳过这些截图。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import glob
+import argparse
+import multiprocessing
+import concurrent.futures
+from datetime import datetime
+import cv2
+import RecognitionPool
+import PriceWriter
+import GlyphOcr
+
+MARKET_ITEMS_DIR = "./templates/modern_warship/market_items/"
+DEFAULT_MANIFEST_FILE = "./market_data/reprocess_manifest.jsonl"  # 已处理截图清单
+REPROCESS_WORKERS = RecognitionPool.RECOGNITION_PROCESSES  # 默认识别进程数
+TASKS_PER_WORKER = 4  # 每个识别进程最多排队的截图数
+PROGRESS_INTERVAL = 10  # 进度打印间隔(秒)
+
+# 截图文件名：[bid_]item_detail_<物品键名>_<YYYYmmdd>_<HHMMSS>[_<微秒>].png
+SCREENSHOT_NAME_PATTERN = re.compile(r'item_detail_(?P<key>.+)_(?P<date>\d{8})_(?P<time>\d{6})(?:_\d+)?\.png$', re.IGNORECASE)
+
+sys.path.append("./templates/modern_warship/")
+try:
+    from category_mapping import CATEGORY_DICT, ITEM_DICT
+except ImportError:
+    print("无法导入分类映射模块，请确保category_mapping.py文件存在")
+    CATEGORY_DICT = {}
+    ITEM_DICT = {}
+
+def build_item_index():
+    """
+    建立物品键名到 (物品名称, 分类名称) 的索引，分类取自物品图片所在的分类目录
+
+    返回:
+        {物品键名: (物品名称, 分类名称)}
+    """
+    index = {key: (name, "未知分类") for key, name in ITEM_DICT.items()}
+    for code, category_name in CATEGORY_DICT.items():
+        for path in glob.glob(f"{MARKET_ITEMS_DIR}{code}/*.png"):
+            key = os.path.splitext(os.path.basename(path))[0]
+            index[key] = (ITEM_DICT.get(key, key), category_name)
+    return index
+
+def parse_screenshot_name(filename, item_index):
+    """
+    从截图文件名解析物品信息和截图时间
+
+    参数:
+        filename: 截图文件名
+        item_index: build_item_index返回的索引
+
+    返回:
+        (物品名称, 分类名称, 时间戳字符串)，文件名不符合格式时返回None
+    """
+    match = SCREENSHOT_NAME_PATTERN.search(filename)
+    if not match:
+        return None
+    key = match.group('key')
+    item_name, category_name = item_index.get(key, (key, "未知分类"))
+    try:
+        timestamp = datetime.strptime(match.group('date') + match.group('time'), "%Y%m%d%H%M%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        timestamp = None
+    return item_name, category_name, timestamp
+
+def file_signature(path):
+    """文件大小和修改时间，用于判断清单中的记录是否仍对应同一个文件"""
+    stat = os.stat(path)
+    return stat.st_size, int(stat.st_mtime)
+
+def load_manifest(manifest_file):
+    """
+    读取已处理截图清单
+
+    返回:
+        {截图绝对路径: (文件大小, 修改时间)}
+    """
+    done = {}
+    if not os.path.exists(manifest_file):
+        return done
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+                done[entry['file']] = (entry['size'], entry['mtime'])
+            except (ValueError, KeyError):
+                continue  # 中断时可能留下不完整的最后一行
+    return done
+
+def collect_screenshots(dirs, recursive=False):
+    """收集目录中的物品详情页截图，按文件名排序（文件名中包含时间，即按时间顺序）"""
+    paths = []
+    for directory in dirs:
+        pattern = os.path.join(directory, "**", "*.png") if recursive else os.path.join(directory, "*.png")
+        paths.extend(p for p in glob.glob(pattern, recursive=recursive) if 'item_detail' in os.path.basename(p).lower())
+    return sorted(set(os.path.abspath(p) for p in paths), key=os.path.basename)
+
+def _reprocess_worker(path, item_name, category_name, detect_own_prices):
+    """识别进程中执行：读取截图并识别，不保存任何图像和数据，返回 (价格数据, 新学习的字形样本)"""
+    import MarketPriceRecognizer as mpr
+    import GlyphOcr
+    img = cv2.imread(path)
+    if img is None:
+        return None, None
+    price_data = mpr.process_frame(img, item_name, category_name, detect_own_prices, auto_save=False,
+                                   keep_images=False, image_name=path)['price_data']
+    return price_data, GlyphOcr.take_learned()
+
+def reprocess(paths, price_file, manifest_file=DEFAULT_MANIFEST_FILE, workers=REPROCESS_WORKERS,
+              force=False, detect_own_prices=False):
+    """
+    并行重新识别截图，结果写入价格数据CSV
+
+    参数:
+        paths: 截图路径列表
+        price_file: 价格数据CSV路径
+        manifest_file: 已处理截图清单路径
+        workers: 识别进程数
+        force: 为True时忽略清单，重新处理所有截图
+        detect_own_prices: 是否检测本人价格
+
+    返回:
+        统计信息字典
+    """
+    import MarketPriceRecognizer as mpr
+
+    item_index = build_item_index()
+    done = {} if force else load_manifest(manifest_file)
+    stats = {'total': len(paths), 'skipped': 0, 'unnamed': 0, 'processed': 0, 'saved': 0, 'failed': 0}
+
+    tasks = []
+    for path in paths:
+        if done.get(path) == file_signature(path):
+            stats['skipped'] += 1
+            continue
+        info = parse_screenshot_name(os.path.basename(path), item_index)
+        if info is None:
+            stats['unnamed'] += 1
+            continue
+        tasks.append((path, info))
+
+    print(f"共 {stats['total']} 张截图，跳过已处理 {stats['skipped']} 张，无法解析文件名 {stats['unnamed']} 张，"
+          f"待处理 {len(tasks)} 张，使用 {workers} 个识别进程")
+    if not tasks:
+        return stats
+
+    for path in [price_file, manifest_file]:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    start_time = time.time()
+    last_report = start_time
+    max_in_flight = max(1, workers) * TASKS_PER_WORKER
+    unconfirmed = []  # 数据已提交给写入服务、尚未记入清单的截图
+
+    def confirm(manifest):
+        # 先等待数据写出再记入清单：中断时最多重复一批数据，不会漏掉；没有全部写出时下次再记入
+        if not PriceWriter.flush():
+            return
+        for entry in unconfirmed:
+            manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        manifest.flush()
+        unconfirmed.clear()
+
+    PriceWriter.start()
+    try:
+        settings = {'OUTPUT_DIR': mpr.OUTPUT_DIR, 'USE_GLYPH_OCR': mpr.USE_GLYPH_OCR}
+        with open(manifest_file, 'a', encoding='utf-8') as manifest, \
+                concurrent.futures.ProcessPoolExecutor(max_workers=max(1, workers),
+                                                       mp_context=multiprocessing.get_context("spawn"),
+                                                       initializer=RecognitionPool.init_worker,
+                                                       initargs=(settings,)) as executor:
+            pending = {}
+            task_iter = iter(tasks)
+            while True:
+                # 保持固定数量的截图在处理中，避免一次性提交所有任务
+                for path, info in task_iter:
+                    future = executor.submit(_reprocess_worker, path, info[0], info[1], detect_own_prices)
+                    pending[future] = (path, info)
+                    if len(pending) >= max_in_flight:
+                        break
+                if not pending:
+                    break
+
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    path, (item_name, category_name, timestamp) = pending.pop(future)
+                    try:
+                        price_data, learned = future.result()
+                    except Exception as e:
+                        print(f"处理截图时出错: {path}, 错误: {str(e)}")
+                        stats['failed'] += 1
+                        continue
+                    stats['processed'] += 1
+                    GlyphOcr.add_samples(learned)
+                    if price_data and mpr.save_price_data(item_name, category_name, price_data, price_file, timestamp):
+                        stats['saved'] += 1
+                    size, mtime = file_signature(path)
+                    unconfirmed.append({'file': path, 'size': size, 'mtime': mtime, 'saved': bool(price_data)})
+                if len(unconfirmed) >= PriceWriter.FLUSH_ROWS:
+                    confirm(manifest)
+
+                if time.time() - last_report >= PROGRESS_INTERVAL:
+                    last_report = time.time()
+                    elapsed = last_report - start_time
+                    done_count = stats['processed'] + stats['failed']
+                    print(f"[进度] {done_count}/{len(tasks)}，{done_count / elapsed:.1f} 帧/秒")
+            confirm(manifest)
+            os.fsync(manifest.fileno())
+    finally:
+        PriceWriter.stop()
+
+    elapsed = time.time() - start_time
+    stats['elapsed'] = elapsed
+    stats['fps'] = (stats['processed'] + stats['failed']) / elapsed if elapsed > 0 else 0.0
+    return stats
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='截图存档批量重新识别')
+    parser.add_argument('dirs', type=str, nargs='+', help='截图目录')
+    parser.add_argument('--recursive', action='store_true', help='包含子目录')
+    parser.add_argument('--workers', type=int, default=REPROCESS_WORKERS, help='识别进程数')
+    parser.add_argument('--price_output', type=str, default=None, help='价格数据CSV文件名（不含扩展名）')
+    parser.add_argument('--manifest', type=str, default=DEFAULT_MANIFEST_FILE, help='已处理截图清单文件')
+    parser.add_argument('--force', action='store_true', help='忽略清单，重新处理所有截图')
+    parser.add_argument('--detect-own-prices', action='store_true', help='检测本人价格')
+    return parser.parse_args()
+
+def main():
+    """主函数"""
+    args = parse_arguments()
+    price_output = args.price_output or f"reprocessed_price_data_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    price_file = f"./market_data/{price_output}.csv"
+
+    paths = collect_screenshots(args.dirs, args.recursive)
+    stats = reprocess(paths, price_file, args.manifest, args.workers, args.force, args.detect_own_prices)
+
+    print("\n" + "="*50)
+    print(f"处理 {stats['processed']} 张，保存 {stats['saved']} 条，失败 {stats['failed']} 张，跳过 {stats['skipped']} 张")
+    if 'elapsed' in stats:
+        print(f"耗时 {stats['elapsed']:.1f} 秒，{stats['fps']:.1f} 帧/秒")
+        print(f"价格数据已保存至: {price_file}")
+    print("="*50 + "\n")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n已中断，再次运行将跳过已处理的截图")
+        sys.exit(1)
@@ -58,6 +58,7 @@ FRICTION_POINT = (2320, 617)  # 市场物品阻力点坐标
 DEFAULT_DURATION = 100  # 默认滑动时间(毫秒)，减少为100毫秒使滑动更快
 AFTER_SLIDE_DELAY = 0.05  # 滑动后的默认等待时间(秒)
 FRICTION_DELAY = 0.05  # 点击阻力点后的等待时间(秒)
+ADAPTIVE_WAIT = True  # 自适应等待：滑动后轮询画面，不再变化时提前结束滑动后的等待（最多等待after_delay秒）
 
 #######################
 # 脚本函数 #
@@ -95,40 +96,51 @@ def slide(start_pos, end_pos, duration=DEFAULT_DURATION, after_delay=AFTER_SLIDE
             return False
     
     print(f"滑动: 从 {start_pos} 到 {end_pos}")
-    result = ADBHelper.slide(DEVICE_ID, start_pos, end_pos, duration)
+    ADBHelper.slide(DEVICE_ID, start_pos, end_pos, duration)
     
-    # 滑动后等待指定时间，确保滑动动画完成
-    if result and after_delay > 0:
+    # 滑动后等待，确保滑动动画完成
+    if after_delay > 0:
+        wait_stable(after_delay)
+    
+    return True
+
+def wait_stable(after_delay=AFTER_SLIDE_DELAY):
+    """等待滑动动画结束：画面不再变化时立即返回，最多等待after_delay秒；关闭自适应等待时固定等待after_delay秒"""
+    if ADAPTIVE_WAIT:
+        ADBHelper.waitForStableScreen(DEVICE_ID, after_delay)
+    else:
         print(f"滑动后等待: {after_delay}秒")
         time.sleep(after_delay)
-    
-    return result
 
 def market_down(times=1, after_delay=AFTER_SLIDE_DELAY):
     """市场物品列表向下滑动"""
     for i in range(times):
         print(f"物品列表向下滑动 ({i+1}/{times})")
-        slide(MARKET_DOWN[0], MARKET_DOWN[1], DEFAULT_DURATION, 
-              after_delay if i == times-1 else 0.2)  # 最后一次滑动使用完整延时
+        slide(MARKET_DOWN[0], MARKET_DOWN[1], DEFAULT_DURATION, 0)
         
         # 点击阻力点阻止滚动惯性
         click_friction_point()
         
         if i < times - 1:
             time.sleep(0.04)  # 连续滑动间隔减少到0.04秒
+    
+    # 阻力点停住惯性后等待画面稳定
+    wait_stable(after_delay)
 
 def market_up(times=1, after_delay=AFTER_SLIDE_DELAY):
     """市场物品列表向上滑动"""
     for i in range(times):
         print(f"物品列表向上滑动 ({i+1}/{times})")
-        slide(MARKET_UP[0], MARKET_UP[1], DEFAULT_DURATION,
-              after_delay if i == times-1 else 0.2)
+        slide(MARKET_UP[0], MARKET_UP[1], DEFAULT_DURATION, 0)
         
         # 点击阻力点阻止滚动惯性
         click_friction_point()
         
         if i < times - 1:
             time.sleep(0.1)  # 连续滑动间隔减少到0.1秒
+    
+    # 阻力点停住惯性后等待画面稳定
+    wait_stable(after_delay)
 
 def compensation_move(times=1, after_delay=AFTER_SLIDE_DELAY, attempt_number=1, normal_scroll_times=0):
     """
@@ -146,18 +158,21 @@ def compensation_move(times=1, after_delay=AFTER_SLIDE_DELAY, attempt_number=1,
     if actual_attempt == 1:
         # 第一次补偿尝试: 上滑一次
         print(f"补偿移动 (尝试 {actual_attempt}/5) - 上滑一次")
-        slide(COMPENSATION_MOVE_UP[0], COMPENSATION_MOVE_UP[1], DEFAULT_DURATION, after_delay)
+        slide(COMPENSATION_MOVE_UP[0], COMPENSATION_MOVE_UP[1], DEFAULT_DURATION, 0)
         click_friction_point()
+        wait_stable(after_delay)
     elif actual_attempt == 2:
         # 第二次补偿尝试: 更长距离下滑一次
         print(f"补偿移动 (尝试 {actual_attempt}/5) - 更长距离下滑")
-        slide(COMPENSATION_MOVE_DOWN_LONG[0], COMPENSATION_MOVE_DOWN_LONG[1], DEFAULT_DURATION, after_delay)
+        slide(COMPENSATION_MOVE_DOWN_LONG[0], COMPENSATION_MOVE_DOWN_LONG[1], DEFAULT_DURATION, 0)
         click_friction_point()
+        wait_stable(after_delay)
     elif actual_attempt == 3:
         # 第三次补偿尝试: 标准距离下滑一次
         print(f"补偿移动 (尝试 {actual_attempt}/5) - 标准下滑")
-        slide(COMPENSATION_MOVE_DOWN[0], COMPENSATION_MOVE_DOWN[1], DEFAULT_DURATION, after_delay)
+        slide(COMPENSATION_MOVE_DOWN[0], COMPENSATION_MOVE_DOWN[1], DEFAULT_DURATION, 0)
         click_friction_point()
+        wait_stable(after_delay)
     elif actual_attempt == 4:
         # 第四次补偿尝试: 连续向上正常滑动多次
         # 比正常的寻找滑动多2次
@@ -170,14 +185,16 @@ def compensation_move(times=1, after_delay=AFTER_SLIDE_DELAY, attempt_number=1,
         for i in range(up_times):
             print(f"  - 向上滑动 ({i+1}/{up_times})")
             # 使用正常的向上滑动，不是补偿滑动
-            slide(MARKET_UP[0], MARKET_UP[1], DEFAULT_DURATION, 
-                  after_delay if i == up_times-1 else 0.2)  # 最后一次滑动使用完整延时
+            slide(MARKET_UP[0], MARKET_UP[1], DEFAULT_DURATION, 0)
             
             # 每次滑动后点击阻力点
             click_friction_point()
             
             if i < up_times - 1:
                 time.sleep(0.1)  # 连续滑动间隔减少到0.1秒
+        
+        # 最后一次滑动后等待画面稳定
+        wait_stable(after_delay)
     else:  # actual_attempt == 5
         # 第五次补偿尝试: 模拟日常找物品时的下滑操作
         down_times = normal_scroll_times
@@ -189,14 +206,16 @@ def compensation_move(times=1, after_delay=AFTER_SLIDE_DELAY, attempt_number=1,
         for i in range(down_times):
             print(f"  - 向下滑动 ({i+1}/{down_times})")
             # 使用正常的向下滑动
-            slide(MARKET_DOWN[0], MARKET_DOWN[1], DEFAULT_DURATION, 
-                  after_delay if i == down_times-1 else 0.2)  # 最后一次滑动使用完整延时
+            slide(MARKET_DOWN[0], MARKET_DOWN[1], DEFAULT_DURATION, 0)
             
             # 每次滑动后点击阻力点
             click_friction_point()
             
             if i < down_times - 1:
                 time.sleep(0.1)  # 连续滑动间隔减少到0.1秒
+        
+        # 最后一次滑动后等待画面稳定
+        wait_stable(after_delay)
 
 def category_down(times=1, after_delay=AFTER_SLIDE_DELAY):
     """分类栏向下滑动"""
@@ -0,0 +1,100 @@
+"""
+模板图片缓存
+
+所有模板图片只从磁盘解码一次，之后的匹配直接使用内存中的图像。
+缓存按 (路径, 目标尺寸, 色彩空间) 保存解码后和缩放后的版本，
+每次取用时检查文件修改时间，模板文件被替换后自动重新加载。
+"""
+
+import os
+import threading
+import cv2
+
+TEMPLATE_ROOTS = ["./templates/"]  # preload()默认预加载的模板目录
+TEMPLATE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+_cache = {}   # (路径, 尺寸, 色彩空间) -> 图像
+_mtimes = {}  # 路径 -> 缓存时的文件修改时间
+_lock = threading.Lock()
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+def _invalidate(key_path):
+    for key in [k for k in _cache if k[0] == key_path]:
+        del _cache[key]
+    _mtimes.pop(key_path, None)
+
+def get(path, size=None, colorspace="bgr"):
+    """
+    获取模板图像
+
+    参数:
+        path: 模板文件路径
+        size: 目标尺寸 (宽, 高)，为None时返回原始尺寸
+        colorspace: "bgr" 或 "gray"
+
+    返回:
+        模板图像，文件不存在或无法读取时返回None
+        返回的图像为缓存共享对象，调用方不应原地修改
+    """
+    key_path = _normalize(path)
+    try:
+        mtime = os.path.getmtime(key_path)
+    except OSError:
+        with _lock:
+            _invalidate(key_path)
+        return None
+
+    key = (key_path, tuple(size) if size is not None else None, colorspace)
+    with _lock:
+        if _mtimes.get(key_path) != mtime:
+            _invalidate(key_path)
+            _mtimes[key_path] = mtime
+        img = _cache.get(key)
+    if img is not None:
+        return img
+
+    if size is None and colorspace == "bgr":
+        img = cv2.imread(path)
+    else:
+        img = get(path, size, "bgr") if colorspace != "bgr" else get(path)
+        if img is None:
+            return None
+        if colorspace == "gray":
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        elif size is not None and (img.shape[1], img.shape[0]) != tuple(size):
+            img = cv2.resize(img, tuple(size))
+    if img is None:
+        return None
+
+    with _lock:
+        if _mtimes.get(key_path) == mtime:
+            _cache[key] = img
+    return img
+
+def preload(roots=None):
+    """
+    预加载目录下的所有模板图片
+
+    参数:
+        roots: 模板目录列表，默认为TEMPLATE_ROOTS
+
+    返回:
+        加载的模板数量
+    """
+    count = 0
+    for root in roots or TEMPLATE_ROOTS:
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if filename.lower().endswith(TEMPLATE_EXTENSIONS):
+                    if get(os.path.join(dirpath, filename)) is not None:
+                        count += 1
+    print(f"已预加载 {count} 个模板图片")
+    return count
+
+def clear():
+    """清空模板缓存"""
+    with _lock:
+        _cache.clear()
+        _mtimes.clear()
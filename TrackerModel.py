@@ -0,0 +1,235 @@
+"""
+报价追踪数据模型
+
+自动化购入竞价页面的数据来源。模型从上次读取的位置继续读取报价追踪CSV，只解析新增的行，
+并增量更新每个物品的统计信息（总被竞价次数、最新被竞价次数、溢价/利润率趋势）。
+每次刷新的耗时只与新增行数有关，与历史记录总量无关。
+模型不依赖Qt，可以在工作线程中调用poll，再把有变化的物品交给界面线程。
+"""
+
+import os
+import csv
+import threading
+
+TRACKER_FILE = "./market_data/报价追踪.csv"
+
+def parse_numeric_value(value):
+    """解析数值（支持百分比和逗号分隔的数字），无法解析时返回None"""
+    try:
+        # 处理百分比
+        if isinstance(value, str) and '%' in value:
+            return float(value.replace('%', ''))
+        # 处理逗号分隔的数字
+        if isinstance(value, str):
+            value = value.replace(',', '').replace(' ', '')
+        return float(value)
+    except:
+        return None
+
+def _parse_count(value):
+    number = parse_numeric_value(value)
+    return int(number) if number is not None else 0
+
+def _parse_prices(price_data, label):
+    prices = []
+    for price in str(price_data or '').split(';'):
+        clean_price = price.strip().replace(',', '')
+        if clean_price and clean_price.lower() != 'nan':
+            try:
+                prices.append(int(float(clean_price)))
+            except ValueError:
+                print(f"无法解析{label}: {price}")
+    return sorted(prices)
+
+def parse_price_record(row):
+    """
+    解析一行报价追踪数据
+
+    参数:
+        row: {列名: 值}（csv.DictReader的行或pandas的行）
+
+    返回:
+        记录字典，价格为排序后的整数列表，出价/上架数量为整数
+    """
+    def text(column, default=''):
+        value = row.get(column, default)
+        value = '' if value is None else str(value).strip()
+        return default if value in ('', 'nan') else value
+
+    return {
+        'category': text('物品分类'),
+        'timestamp': text('时间戳'),
+        'spread': text('低买低卖溢价', 'N/A'),
+        'profit_rate': text('利润率', 'N/A'),
+        'bid_count': _parse_count(row.get('出价数量', 0)),
+        'listing_count': _parse_count(row.get('上架数量', 0)),
+        'buying_prices': _parse_prices(row.get('购买价格', ''), '购买价格'),
+        'selling_prices': _parse_prices(row.get('出售价格', ''), '出售价格'),
+        'own_buying_price': text('本人购买价格'),
+        'own_selling_price': text('本人售出价格')
+    }
+
+def _competing_prices(record):
+    """本人购买价格之上的购买价格集合，没有本人购买价格时返回None"""
+    own_price = parse_numeric_value(record.get('own_buying_price', '') or '')
+    if own_price is None:
+        return None
+    return {price for price in record.get('buying_prices', []) if price > own_price}
+
+def calculate_row_competition(record, previous_record=None):
+    """
+    计算单行的被竞价次数：相比上一行新增的、高于本人购买价格的出价数量
+
+    参数:
+        record: 当前记录
+        previous_record: 上一行记录，没有时为None
+
+    返回:
+        被竞价次数
+    """
+    current = _competing_prices(record)
+    if current is None:
+        return 0
+    previous = _competing_prices(previous_record) if previous_record else None
+    if previous is None:
+        return len(current)
+    return len(current - previous)
+
+def _trend(current_value, previous_value):
+    current = parse_numeric_value(current_value)
+    previous = parse_numeric_value(previous_value)
+    if current is None or previous is None or current == previous:
+        return 'stable'
+    return 'up' if current > previous else 'down'
+
+def calculate_competition_stats(item_records):
+    """
+    计算一个物品全部记录的竞争统计信息
+
+    返回:
+        {'latest_competitions', 'spread_trend', 'profit_trend', 'total_competitions'}
+    """
+    stats = {'latest_competitions': 0, 'spread_trend': 'stable', 'profit_trend': 'stable', 'total_competitions': 0}
+    previous = None
+    for record in item_records:
+        _add_to_stats(stats, record, previous)
+        previous = record
+    return stats
+
+def _add_to_stats(stats, record, previous):
+    """把一条新记录计入统计信息"""
+    competitions = calculate_row_competition(record, previous)
+    stats['total_competitions'] += competitions
+    stats['latest_competitions'] = competitions
+    if previous is not None:
+        stats['spread_trend'] = _trend(record['spread'], previous['spread'])
+        stats['profit_trend'] = _trend(record['profit_rate'], previous['profit_rate'])
+    else:
+        stats['spread_trend'] = stats['profit_trend'] = 'stable'
+
+class TrackerModel:
+    """
+    报价追踪数据模型
+
+    参数:
+        path: 报价追踪CSV路径
+    """
+
+    def __init__(self, path=TRACKER_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.header = None
+        self.file_id = None
+        self.items = {}  # {物品名称: {'category', 'records', 'stats'}}
+
+    def reset(self):
+        """丢弃已读取的数据，下次poll时重新读取整个文件（文件被改写后调用）"""
+        with self.lock:
+            self._reset()
+
+    def snapshot(self, item_name):
+        """
+        返回一个物品的卡片数据（与界面卡片使用的结构一致）
+
+        返回:
+            {'item_name', 'category', 'latest_record', 'all_records', 'competition_stats', 'record_count'}
+        """
+        entry = self.items[item_name]
+        records = list(entry['records'])
+        return {
+            'item_name': item_name,
+            'category': entry['category'],
+            'latest_record': records[-1] if records else None,
+            'all_records': records,
+            'competition_stats': dict(entry['stats']),
+            'record_count': len(records)
+        }
+
+    def _ingest(self, row):
+        """把一行新数据计入对应物品，返回物品名称"""
+        item_name = (row.get('物品名称') or '').strip()
+        if not item_name:
+            return None
+        record = parse_price_record(row)
+        entry = self.items.get(item_name)
+        if entry is None:
+            entry = self.items[item_name] = {'category': record['category'], 'records': [],
+                                             'stats': calculate_competition_stats([])}
+        records = entry['records']
+        if records and record['timestamp'] < records[-1]['timestamp']:
+            # 时间早于最新记录（很少出现）：按时间插入并重新计算该物品的统计信息
+            position = len(records)
+            while position > 0 and records[position - 1]['timestamp'] > record['timestamp']:
+                position -= 1
+            records.insert(position, record)
+            entry['stats'] = calculate_competition_stats(records)
+        else:
+            _add_to_stats(entry['stats'], record, records[-1] if records else None)
+            records.append(record)
+        return item_name
+
+    def poll(self):
+        """
+        读取文件中新增的行并更新统计信息
+
+        返回:
+            (有变化的物品卡片数据列表, 是否为完整重新加载)
+            完整重新加载时列表包含全部物品，不在列表中的物品卡片应当删除
+        """
+        with self.lock:
+            if not os.path.exists(self.path):
+                reloaded = bool(self.items) or self.file_id is None
+                self._reset()
+                return [], reloaded
+
+            stat = os.stat(self.path)
+            file_id = (stat.st_dev, stat.st_ino)
+            reloaded = self.file_id is None or file_id != self.file_id or stat.st_size < self.offset
+            if reloaded:
+                self._reset()
+                self.file_id = file_id
+
+            changed = set()
+            if stat.st_size > self.offset:
+                with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                    if self.header is None:
+                        self.header = next(csv.reader([f.readline()]), [])
+                        self.offset = f.tell()
+                    f.seek(self.offset)
+                    while True:
+                        line = f.readline()
+                        if not line.endswith("\n"):
+                            break  # 最后一行可能正在写入，下次再读
+                        self.offset = f.tell()
+                        values = next(csv.reader([line]), [])
+                        if values:
+                            item_name = self._ingest(dict(zip(self.header, values)))
+                            if item_name:
+                                changed.add(item_name)
+
+            names = sorted(self.items) if reloaded else sorted(changed)
+            return [self.snapshot(name) for name in names], reloaded